@@ -0,0 +1,45 @@
+import sys
+import json
+import argparse
+
+from run import case_id
+
+
+def load(path: str) -> dict:
+    with open(path, "r") as f:
+        data = json.load(f)
+    return {case_id(r): r for r in data["results"]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files.")
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=1.10, help="slowdown ratio reported as a regression")
+    parser.add_argument("--fail", action="store_true", help="exit non-zero if any case regressed")
+    args = parser.parse_args()
+
+    old, new = load(args.baseline), load(args.candidate)
+    regressions = 0
+    print(f"{'case':<60} {'old ms':>10} {'new ms':>10} {'ratio':>7} {'rss old':>8} {'rss new':>8}")
+    for name in sorted(set(old) & set(new)):
+        a, b = old[name], new[name]
+        ratio = b["median_s"] / a["median_s"] if a["median_s"] > 0 else float("inf")
+        flag = ""
+        if ratio > args.threshold:
+            flag = "  SLOWER"
+            regressions += 1
+        elif ratio < 1.0 / args.threshold:
+            flag = "  faster"
+        print(
+            f"{name:<60} {a['median_s'] * 1000:10.2f} {b['median_s'] * 1000:10.2f} {ratio:7.2f} "
+            f"{a['peak_rss_mb']:8.1f} {b['peak_rss_mb']:8.1f}{flag}"
+        )
+    for name in sorted(set(old) ^ set(new)):
+        print(f"{name:<60} only in {'baseline' if name in old else 'candidate'}")
+    print(f"{regressions} regressions above {args.threshold:.2f}x")
+    return 1 if args.fail and regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
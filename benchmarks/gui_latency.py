@@ -0,0 +1,347 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+
+# Must be set before Qt is imported; a GPU-less box has no display.
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+import numpy as np
+
+from synthetic import fits_file, random_boxes, make_project
+from run import metadata, _peak_rss_mb, _list
+
+SCENARIOS = ["load", "stretch", "boxes", "relabel", "paging"]
+STRETCH_LABELS = ["Linear", "Log", "Hist. Eq.", "Z-Scale"]
+RELABELS = ["star", "galaxy", "artifact"]
+HEARTBEAT_MS = 16
+
+
+def link_frames(source: str, directory: str, count: int) -> list:
+    # Hard links give every frame its own path, so caches treat them as
+    # distinct files, without writing the image count times.
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for i in range(count):
+        path = os.path.join(directory, f"frame_{i:04d}.fits")
+        try:
+            os.link(source, path)
+        except OSError:
+            shutil.copyfile(source, path)
+        paths.append(path)
+    return paths
+
+
+class GuiHarness:
+    # Drives a real MainWindow and Controller on the offscreen platform.
+    # Latency runs from dispatching an input to the window having handled
+    # it; frame time is a synchronous repaint of the affected views. While
+    # a load is in flight a heartbeat timer ticks every HEARTBEAT_MS; the
+    # longest gap between ticks is how long the GUI thread was blocked.
+    def __init__(self, project, timeout: float):
+        from PySide6.QtWidgets import QApplication
+        from PySide6.QtCore import QTimer
+
+        self.app = QApplication.instance() or QApplication([])
+        self.project = project
+        self.timeout = timeout
+        self.window = None
+        self.controller = None
+        self._shown = {}
+        self._previews = {}
+        self._loop = None
+        self._waiting = None
+        self._gaps = []
+        self._last_tick = None
+        self._heartbeat = QTimer()
+        self._heartbeat.setInterval(HEARTBEAT_MS)
+        self._heartbeat.timeout.connect(self._tick)
+
+    def start(self):
+        from slicer.ui.main_window import MainWindow
+        from slicer.controller import Controller
+
+        self.window = MainWindow()
+        self.window.resize(1280, 900)
+        self.window.show()
+        start = time.perf_counter()
+        self.controller = Controller(self.window, self.project)
+        # Queued from the loader thread, so these run after the controller's
+        # own slots have put the image on screen.
+        self.controller.image_loader.image_ready.connect(self._on_image_ready)
+        self.controller.image_loader.preview_ready.connect(self._on_preview_ready)
+        return self._wait_shown(self.project.files[0], start)
+
+    def close(self):
+        if self.controller:
+            self.controller.shutdown()
+        if self.window:
+            self.window.close()
+
+    def _tick(self):
+        now = time.perf_counter()
+        self._gaps.append(now - self._last_tick)
+        self._last_tick = now
+
+    def take_gaps(self) -> list:
+        gaps, self._gaps = self._gaps, []
+        return gaps
+
+    def _on_image_ready(self, generation, file_path, model, levels):
+        if self.controller.image_loader.is_stale(generation):
+            return
+        self._shown[file_path] = time.perf_counter()
+        if self._loop and self._waiting == file_path:
+            self._loop.quit()
+
+    def _on_preview_ready(self, generation, file_path, model, preview, step):
+        if not self.controller.image_loader.is_stale(generation):
+            self._previews.setdefault(file_path, time.perf_counter())
+
+    def _wait_shown(self, file_path: str, start: float):
+        from PySide6.QtCore import QEventLoop, QTimer
+
+        if file_path not in self._shown:
+            self._loop = QEventLoop()
+            self._waiting = file_path
+            timer = QTimer()
+            timer.setSingleShot(True)
+            timer.timeout.connect(self._loop.quit)
+            timer.start(int(self.timeout * 1000))
+            self._last_tick = time.perf_counter()
+            self._heartbeat.start()
+            self._loop.exec()
+            self._heartbeat.stop()
+            timer.stop()
+            self._loop = self._waiting = None
+        if file_path not in self._shown:
+            raise RuntimeError(f"{os.path.basename(file_path)} was not shown within {self.timeout} s")
+        preview = self._previews.get(file_path)
+        return self._shown[file_path] - start, (preview - start if preview else None)
+
+    def load(self, trigger, file_path: str):
+        self._shown.pop(file_path, None)
+        self._previews.pop(file_path, None)
+        start = time.perf_counter()
+        trigger()
+        return self._wait_shown(file_path, start)
+
+    def frame(self, *views) -> float:
+        start = time.perf_counter()
+        for view in views:
+            view.viewport().repaint()
+        return time.perf_counter() - start
+
+    def draw_box(self, x0, y0, x1, y1):
+        from PySide6.QtCore import Qt, QPointF
+        from PySide6.QtTest import QTest
+
+        view = self.window.image_view
+        a = view.mapFromScene(QPointF(x0, y0))
+        b = view.mapFromScene(QPointF(x1, y1))
+        QTest.mousePress(view.viewport(), Qt.LeftButton, Qt.NoModifier, a)
+        QTest.mouseMove(view.viewport(), b)
+        QTest.mouseRelease(view.viewport(), Qt.LeftButton, Qt.NoModifier, b)
+        self.app.processEvents()
+
+
+def _samples():
+    return {"latency": [], "frame": [], "preview": []}
+
+
+def scenario_load(harness, args, first):
+    # Cold loads: the project opening on its first frame, then jumps to
+    # frames that were never shown or prefetched.
+    samples = _samples()
+    latency, preview = first
+    samples["latency"].append(latency)
+    samples["preview"].append(preview)
+    files = harness.project.files
+    for index in range(args.files, len(files)):
+        latency, preview = harness.load(lambda: harness.controller.jump_to_file(index), files[index])
+        samples["latency"].append(latency)
+        samples["preview"].append(preview)
+        samples["frame"].append(harness.frame(harness.window.image_view))
+    harness.load(lambda: harness.controller.jump_to_file(0), files[0])
+    return samples
+
+
+def scenario_stretch(harness, args, first):
+    samples = _samples()
+    path = harness.project.files[harness.controller.current_file_index]
+    combo = harness.window.stretch_combo
+    for i in range(args.repeat * len(STRETCH_LABELS)):
+        label = STRETCH_LABELS[i % len(STRETCH_LABELS)]
+        latency, preview = harness.load(lambda: combo.setCurrentText(label), path)
+        samples["latency"].append(latency)
+        samples["preview"].append(preview)
+        samples["frame"].append(harness.frame(harness.window.image_view))
+    return samples
+
+
+def scenario_boxes(harness, args, first):
+    samples = _samples()
+    view = harness.window.image_view
+    shape = harness.controller.fits_image_model.shape
+    for x0, y0, x1, y1 in random_boxes(shape, args.boxes, seed=1).tolist():
+        start = time.perf_counter()
+        harness.draw_box(x0, y0, x1, y1)
+        samples["latency"].append(time.perf_counter() - start)
+        samples["frame"].append(harness.frame(view))
+    harness.controller.patch_writer.drain()
+    return samples
+
+
+def scenario_relabel(harness, args, first):
+    from slicer.ui.patch_table_view import COLUMNS
+
+    samples = _samples()
+    table = harness.window.patch_table_view
+    rows = table.proxy.rowCount()
+    if not rows:
+        raise RuntimeError("the patch table is empty; run the boxes scenario or pass --patches")
+    column = COLUMNS.index("label")
+    for i in range(args.relabels):
+        index = table.proxy.index(i % rows, column)
+        current = index.data()
+        label = RELABELS[(RELABELS.index(current) + 1) % len(RELABELS)] if current in RELABELS else RELABELS[0]
+        start = time.perf_counter()
+        table.proxy.setData(index, label)
+        harness.app.processEvents()
+        samples["latency"].append(time.perf_counter() - start)
+        samples["frame"].append(harness.frame(table, harness.window.image_view))
+    return samples
+
+
+def scenario_paging(harness, args, first):
+    samples = _samples()
+    files = harness.project.files
+    if harness.controller.current_file_index != 0:
+        harness.load(lambda: harness.controller.jump_to_file(0), files[0])
+    harness.take_gaps()
+    for index in range(1, args.files):
+        latency, preview = harness.load(harness.window.next_action.trigger, files[index])
+        samples["latency"].append(latency)
+        samples["preview"].append(preview)
+        samples["frame"].append(harness.frame(harness.window.image_view))
+    return samples
+
+
+def _stats(prefix: str, values: list) -> dict:
+    values = [v for v in values if v is not None]
+    if not values:
+        return {}
+    return {
+        f"{prefix}median_s": float(np.median(values)),
+        f"{prefix}p95_s": float(np.percentile(values, 95)),
+        f"{prefix}max_s": float(max(values)),
+    }
+
+
+def summarize(name: str, samples: dict, gaps: list, args) -> dict:
+    result = {
+        "stage": f"gui_{name}", "size": args.size, "dtype": args.dtype,
+        "ops": len(samples["latency"]), "seconds": samples["latency"],
+    }
+    result.update(_stats("", samples["latency"]))
+    result.update(_stats("frame_", samples["frame"]))
+    result.update(_stats("preview_", samples["preview"]))
+    if gaps:
+        result["max_gap_s"] = max(gaps)
+    result["peak_rss_mb"] = round(_peak_rss_mb(), 1)
+    return result
+
+
+def _budget(text):
+    name, _, value = text.partition("=")
+    if name not in SCENARIOS or not value:
+        raise argparse.ArgumentTypeError(f"expected SCENARIO=MS with SCENARIO one of {','.join(SCENARIOS)}")
+    return name, float(value)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Drive the slicer window offscreen and time each interaction.")
+    parser.add_argument("--scenarios", type=_list(str), default=SCENARIOS,
+                        help=f"comma-separated subset of {','.join(SCENARIOS)}")
+    parser.add_argument("--size", type=int, default=2048, help="side of the synthetic frames in pixels")
+    parser.add_argument("--dtype", default="float32")
+    parser.add_argument("--files", type=int, default=200, help="frames paged through")
+    parser.add_argument("--boxes", type=int, default=1000, help="boxes drawn on the first frame")
+    parser.add_argument("--relabels", type=int, default=200, help="labels changed in the patch table")
+    parser.add_argument("--patches", type=int, default=0, help="patches already in the project, spread over the frames")
+    parser.add_argument("--repeat", type=int, default=3, help="cold loads, and passes over the stretch modes")
+    parser.add_argument("--backend", choices=["json", "sqlite"], default="json")
+    parser.add_argument("--budget", type=_budget, action="append", default=[], metavar="SCENARIO=MS",
+                        help="fail if the scenario's p95 latency exceeds MS; may be repeated")
+    parser.add_argument("--data-dir", default=os.path.join(tempfile.gettempdir(), "fits-slicer-bench"),
+                        help="where synthetic FITS files are generated and reused")
+    parser.add_argument("--out", default="gui-latency.json", help="JSON results file")
+    parser.add_argument("--trace", help="also record stage timings and write them as a Chrome trace")
+    parser.add_argument("--timeout", type=float, default=120.0, help="seconds to wait for any one frame")
+    args = parser.parse_args()
+
+    unknown = [s for s in args.scenarios if s not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)}")
+    # Run in the fixed order: relabel works on the boxes just drawn.
+    scenarios = [s for s in SCENARIOS if s in args.scenarios]
+
+    from slicer.profiler import profiler
+
+    source = fits_file(args.data_dir, args.size, args.dtype)
+    work = tempfile.mkdtemp(prefix="slicer-gui-bench-")
+    harness = None
+    results = []
+    try:
+        frames = link_frames(source, os.path.join(work, "frames"), args.files + args.repeat)
+        project = make_project(work, frames, args.patches, args.backend, image_size=args.size)
+        # No modal dialogs: without labels nothing asks for one, and a box
+        # overlapping an earlier one is merged instead of prompting.
+        project.config.labels = []
+        project.config.duplicate_action = "merge"
+        if args.trace:
+            profiler.enable()
+        harness = GuiHarness(project, args.timeout)
+        first = harness.start()
+        harness.take_gaps()
+        for name in scenarios:
+            samples = globals()[f"scenario_{name}"](harness, args, first)
+            result = summarize(name, samples, harness.take_gaps(), args)
+            results.append(result)
+            frame = result.get("frame_median_s")
+            gap = result.get("max_gap_s")
+            print(
+                f"{name:<8} n={result['ops']:<5} median {result['median_s'] * 1000:8.2f} ms  "
+                f"p95 {result['p95_s'] * 1000:8.2f} ms  "
+                f"frame {frame * 1000 if frame is not None else float('nan'):7.2f} ms  "
+                f"max gap {gap * 1000 if gap is not None else float('nan'):8.2f} ms",
+                flush=True,
+            )
+    finally:
+        if harness:
+            harness.close()
+        shutil.rmtree(work, ignore_errors=True)
+
+    if args.trace:
+        count = profiler.write_trace(args.trace)
+        print(f"Wrote {count} timing events to {args.trace}")
+
+    budgets = dict(args.budget)
+    failures = [
+        r for r in results
+        if r["stage"][len("gui_"):] in budgets and r["p95_s"] * 1000 > budgets[r["stage"][len("gui_"):]]
+    ]
+    with open(args.out, "w") as f:
+        json.dump({"metadata": metadata(), "budgets_ms": budgets, "results": results}, f, indent=2)
+    print(f"Wrote {len(results)} results to {args.out}")
+    for r in failures:
+        name = r["stage"][len("gui_"):]
+        print(f"FAIL: {name} p95 {r['p95_s'] * 1000:.2f} ms exceeds the budget of {budgets[name]} ms", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,312 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import resource
+import tempfile
+import statistics
+import subprocess
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+
+from synthetic import ROOT, fits_file, random_boxes, make_project
+
+PRESETS = {
+    "quick": {
+        "sizes": [1024, 4096],
+        "dtypes": ["int16", "float32", "float64"],
+        "patches": [10, 1000, 10000],
+    },
+    "full": {
+        "sizes": [1024, 4096, 8192, 16384],
+        "dtypes": ["int16", "float32", "float64"],
+        "patches": [10, 1000, 10000, 100000],
+    },
+}
+IMAGE_STAGES = ["open", "preview", "stretch", "save_patch", "undo"]
+PROJECT_STAGES = ["project_save", "project_record_patch", "project_load"]
+STRETCH_MODES = ["zscale", "linear", "log", "histeq"]
+BACKENDS = ["json", "sqlite"]
+
+
+# Each stage takes the case and a scratch directory and returns
+# (setup, run): setup is called untimed before every repeat, run is timed.
+
+def stage_open(case, work):
+    from slicer.models import FitsImageModel
+    path = case["fits_path"]
+    return None, lambda: FitsImageModel(path, memmap=True).close()
+
+
+def stage_preview(case, work):
+    from slicer.models import FitsImageModel
+    state = {}
+
+    def setup():
+        state["model"] = FitsImageModel(case["fits_path"], memmap=True)
+
+    return setup, lambda: state["model"].get_preview_image_data(case["mode"])
+
+
+def stage_stretch(case, work):
+    # A fresh model per repeat, so the limits, histogram and LUT are
+    # computed every time as on a first view.
+    from slicer.models import FitsImageModel
+    state = {}
+
+    def setup():
+        state["model"] = FitsImageModel(case["fits_path"], memmap=True)
+
+    return setup, lambda: state["model"].get_normalized_image_data(case["mode"])
+
+
+def _exporter(case, work, repeat):
+    from config import Config
+    from slicer.models import FitsImageModel, PatchExporter
+    cfg = Config(out_dir=os.path.join(work, f"out{repeat}"))
+    return PatchExporter(cfg, FitsImageModel(case["fits_path"], memmap=True))
+
+
+def stage_save_patch(case, work):
+    state = {"repeat": 0}
+
+    def setup():
+        state["repeat"] += 1
+        state["exporter"] = _exporter(case, work, state["repeat"])
+        state["boxes"] = random_boxes(state["exporter"].fits_image_model.shape, case["ops"], seed=state["repeat"])
+
+    def run():
+        for x0, y0, x1, y1 in state["boxes"]:
+            state["exporter"].save_patch(x0, y0, x1, y1, "star")
+
+    return setup, run
+
+
+def stage_undo(case, work):
+    state = {"repeat": 0}
+
+    def setup():
+        state["repeat"] += 1
+        exporter = _exporter(case, work, state["repeat"])
+        for x0, y0, x1, y1 in random_boxes(exporter.fits_image_model.shape, case["ops"], seed=state["repeat"]):
+            exporter.save_patch(x0, y0, x1, y1, "star")
+        state["exporter"] = exporter
+
+    def run():
+        for _ in range(case["ops"]):
+            state["exporter"].undo_last_patch()
+
+    return setup, run
+
+
+def _project(case, work):
+    frames = [os.path.join(work, f"frame_{i}.fits") for i in range(4)]
+    return make_project(os.path.join(work, "projects"), frames, case["n_patches"], case["backend"])
+
+
+def stage_project_save(case, work):
+    project = _project(case, work)
+    return None, project.save
+
+
+def stage_project_record_patch(case, work):
+    # What every drawn box costs the project store.
+    project = _project(case, work)
+    path = project.files[0]
+    state = {"n": 0}
+
+    def run():
+        state["n"] += 1
+        patch_meta = dict(project.get_patches(path)[0], patch_id=f"new{state['n']}")
+        project.get_patches(path).append(patch_meta)
+        project.record_patch_added(path, patch_meta)
+
+    return None, run
+
+
+def stage_project_load(case, work):
+    from slicer.batch import load_project
+    path = _project(case, work).project_file_path
+
+    def run():
+        project = load_project(path)
+        sum(len(project.get_patches(f)) for f in project.files)
+        project.close()
+
+    return None, run
+
+
+STAGES = {name[len("stage_"):]: fn for name, fn in globals().items() if name.startswith("stage_")}
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS.
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def run_case(case: dict) -> dict:
+    # Runs in its own process so peak RSS belongs to this case alone.
+    work = tempfile.mkdtemp(prefix="slicer-bench-")
+    try:
+        setup, run = STAGES[case["stage"]](case, work)
+        # An untimed warm-up pays for lazy imports and first-touch costs.
+        for _ in range(case.get("warmup", 1)):
+            if setup:
+                setup()
+            run()
+        baseline_rss = _peak_rss_mb()
+        times = []
+        for _ in range(case["repeat"]):
+            if setup:
+                setup()
+            t = time.perf_counter()
+            run()
+            times.append(time.perf_counter() - t)
+        peak_rss = _peak_rss_mb()
+        # One extra traced run for the allocation peak, kept out of the
+        # timings since tracing slows allocation-heavy code.
+        if setup:
+            setup()
+        tracemalloc.start()
+        run()
+        _, peak_alloc = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+    result = dict(case)
+    result.pop("fits_path", None)
+    result.update(
+        seconds=times,
+        min_s=min(times),
+        median_s=statistics.median(times),
+        peak_rss_mb=round(peak_rss, 1),
+        rss_growth_mb=round(peak_rss - baseline_rss, 1),
+        peak_alloc_mb=round(peak_alloc / (1024 * 1024), 2),
+    )
+    if case.get("ops"):
+        result["per_op_s"] = result["median_s"] / case["ops"]
+    return result
+
+
+def case_id(case: dict) -> str:
+    keys = ["stage", "size", "dtype", "mode", "n_patches", "backend", "ops"]
+    return " ".join(f"{k}={case[k]}" for k in keys if case.get(k) is not None)
+
+
+def build_cases(args) -> list:
+    cases = []
+    for stage in args.stages:
+        if stage in IMAGE_STAGES:
+            for size in args.sizes:
+                for dtype in args.dtypes:
+                    base = {"stage": stage, "size": size, "dtype": dtype, "repeat": args.repeat, "warmup": args.warmup}
+                    if stage in ("stretch", "preview"):
+                        cases.extend(dict(base, mode=mode) for mode in args.modes)
+                    elif stage in ("save_patch", "undo"):
+                        cases.append(dict(base, ops=args.ops))
+                    else:
+                        cases.append(base)
+        else:
+            for n in args.patches:
+                for backend in BACKENDS:
+                    cases.append({
+                        "stage": stage, "n_patches": n, "backend": backend,
+                        "repeat": args.repeat, "warmup": args.warmup,
+                    })
+    return cases
+
+
+def metadata() -> dict:
+    import astropy
+
+    def git(*cmd):
+        try:
+            return subprocess.run(["git", *cmd], cwd=ROOT, capture_output=True, text=True, timeout=30).stdout.strip()
+        except (OSError, subprocess.SubprocessError):
+            return ""
+
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "commit": git("rev-parse", "HEAD"),
+        "dirty": bool(git("status", "--porcelain", "--untracked-files=no")),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "astropy": astropy.__version__,
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def _list(kind):
+    return lambda text: [kind(v) for v in text.split(",") if v]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the load, stretch, cut and save hot paths on synthetic data.")
+    parser.add_argument("--preset", choices=sorted(PRESETS), default="quick")
+    parser.add_argument("--stages", type=_list(str), default=IMAGE_STAGES + PROJECT_STAGES,
+                        help=f"comma-separated subset of {','.join(STAGES)}")
+    parser.add_argument("--sizes", type=_list(int), help="image sides in pixels, e.g. 1024,4096")
+    parser.add_argument("--dtypes", type=_list(str), help="int16,float32,float64")
+    parser.add_argument("--patches", type=_list(int), help="project sizes in patches, e.g. 10,1000,100000")
+    parser.add_argument("--modes", type=_list(str), default=STRETCH_MODES)
+    parser.add_argument("--ops", type=int, default=100, help="patches cut or undone per save_patch/undo repeat")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--warmup", type=int, default=1, help="untimed runs before each case")
+    parser.add_argument("--data-dir", default=os.path.join(tempfile.gettempdir(), "fits-slicer-bench"),
+                        help="where synthetic FITS files are generated and reused")
+    parser.add_argument("--out", default="benchmark-results.json", help="JSON results file")
+    parser.add_argument("--timeout", type=float, default=3600.0, help="seconds per case")
+    parser.add_argument("--case", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.case:
+        print(json.dumps(run_case(json.loads(args.case))))
+        return 0
+
+    preset = PRESETS[args.preset]
+    args.sizes = args.sizes or preset["sizes"]
+    args.dtypes = args.dtypes or preset["dtypes"]
+    args.patches = args.patches or preset["patches"]
+    unknown = [s for s in args.stages if s not in STAGES]
+    if unknown:
+        parser.error(f"unknown stages: {', '.join(unknown)}")
+
+    results = []
+    failed = 0
+    for case in build_cases(args):
+        if "size" in case:
+            case["fits_path"] = fits_file(args.data_dir, case["size"], case["dtype"])
+        name = case_id(case)
+        out = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--case", json.dumps(case)],
+            capture_output=True, text=True, timeout=args.timeout,
+        )
+        lines = [line for line in out.stdout.splitlines() if line.startswith("{")]
+        if out.returncode != 0 or not lines:
+            failed += 1
+            print(f"{name}: FAILED\n{out.stderr[-1000:]}", file=sys.stderr)
+            continue
+        result = json.loads(lines[-1])
+        results.append(result)
+        print(
+            f"{name:<60} {result['median_s'] * 1000:10.2f} ms  "
+            f"rss {result['peak_rss_mb']:8.1f} MB  alloc {result['peak_alloc_mb']:8.2f} MB",
+            flush=True,
+        )
+
+    with open(args.out, "w") as f:
+        json.dump({"metadata": metadata(), "results": results}, f, indent=2)
+    print(f"Wrote {len(results)} results to {args.out}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,120 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def make_project(directory: str, size: int) -> str:
+    # Imported here: the child process must not pay for numpy and astropy
+    # before it reaches the wizard.
+    from synthetic import make_fits
+    from slicer.project import Project
+
+    path = make_fits(os.path.join(directory, "startup.fits"), size, "float32")
+    return Project().create("startup", directory, [path]).project_file_path
+
+
+def child(project_path: str, timeout: float) -> None:
+    # Runs in a fresh interpreter; marks are wall-clock seconds since the
+    # parent spawned the process, so interpreter start-up is included.
+    t0 = float(os.environ["STARTUP_T0"])
+    marks = {}
+
+    def mark(name):
+        marks[name] = time.time() - t0
+
+    sys.path.insert(0, ROOT)
+    import main_pyside
+    from PySide6.QtWidgets import QApplication
+    from PySide6.QtCore import QEventLoop, QTimer
+
+    app = QApplication([])
+    wizard = main_pyside.ProjectWizard()
+    wizard.show()
+    app.processEvents()
+    mark("wizard")
+    wizard.close()
+
+    # Same path as "Open Project" in main_pyside.main.
+    project = main_pyside.Project().load(project_path)
+    project.scan_for_new_files()
+    from slicer.ui.main_window import MainWindow
+    from slicer.controller import Controller
+    main_window = MainWindow()
+    loop = QEventLoop()
+    controller = Controller(main_window, project)
+    controller.image_loader.preview_ready.connect(lambda *a: marks.setdefault("first_preview", time.time() - t0))
+    controller.image_loader.image_ready.connect(lambda *a: (mark("first_image"), loop.quit()))
+    main_window.show()
+    QTimer.singleShot(int(timeout * 1000), loop.quit)
+    loop.exec()
+    controller.shutdown()
+    main_window.close()
+    print(json.dumps(marks))
+
+
+def run_once(size: int, timeout: float) -> dict:
+    # Each run gets a fresh project, so no project caches are warm.
+    directory = tempfile.mkdtemp(prefix="startup-bench-")
+    try:
+        project_path = make_project(directory, size)
+        env = dict(os.environ, QT_QPA_PLATFORM=os.environ.get("QT_QPA_PLATFORM", "offscreen"))
+        env["STARTUP_T0"] = repr(time.time())
+        out = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--child", project_path, "--timeout", str(timeout)],
+            env=env, capture_output=True, text=True, timeout=timeout + 60,
+        )
+        lines = [line for line in out.stdout.splitlines() if line.startswith("{")]
+        if out.returncode != 0 or not lines:
+            raise RuntimeError(f"startup run failed:\n{out.stderr[-2000:]}")
+        return json.loads(lines[-1])
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold start-up time of main_pyside: time to wizard and to the first image.")
+    parser.add_argument("--size", type=int, default=4096, help="side of the synthetic image in pixels")
+    parser.add_argument("--repeat", type=int, default=3, help="fresh processes to run; the median is reported")
+    parser.add_argument("--wizard-budget", type=float, default=1.0, help="seconds allowed until the wizard is shown")
+    parser.add_argument("--image-budget", type=float, default=4.0, help="seconds allowed until the full image is shown")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--json", help="also write the result to this file")
+    parser.add_argument("--child", metavar="PROJECT", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child, args.timeout)
+        return 0
+
+    runs = [run_once(args.size, args.timeout) for _ in range(args.repeat)]
+    result = {"benchmark": "startup", "size": args.size, "runs": runs}
+    for name in ("wizard", "first_preview", "first_image"):
+        values = [r[name] for r in runs if name in r]
+        result[f"{name}_s"] = statistics.median(values) if len(values) == len(runs) else None
+    budgets = {"wizard_s": args.wizard_budget, "first_image_s": args.image_budget}
+    failures = [
+        name for name, budget in budgets.items()
+        if result[name] is None or result[name] > budget
+    ]
+    result["budgets"] = budgets
+    result["ok"] = not failures
+
+    print(json.dumps(result, indent=2))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)
+    for name in failures:
+        print(f"FAIL: {name} = {result[name]} exceeds the budget of {budgets[name]} s", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,120 @@
+import os
+import sys
+
+import numpy as np
+from astropy.io import fits
+from astropy.wcs import WCS
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+DTYPES = {"int16": np.int16, "float32": np.float32, "float64": np.float64}
+BAND_ROWS = 1024
+
+
+def make_wcs(size: int, ra: float = 150.0, dec: float = 2.0) -> WCS:
+    # TAN with a slight rotation, so headers exercise the CD matrix path.
+    wcs = WCS(naxis=2)
+    wcs.wcs.ctype = ["RA---TAN", "DEC--TAN"]
+    wcs.wcs.crval = [ra, dec]
+    wcs.wcs.crpix = [size / 2.0 + 0.5, size / 2.0 + 0.5]
+    scale = 0.2 / 3600.0
+    theta = np.radians(3.0)
+    wcs.wcs.cd = scale * np.array([[-np.cos(theta), np.sin(theta)], [np.sin(theta), np.cos(theta)]])
+    wcs.wcs.radesys = "ICRS"
+    return wcs
+
+
+def _band(size: int, y0: int, rows: int, dtype, seed: int) -> np.ndarray:
+    # Sky noise plus a few sources; each band has its own seed so the file
+    # is identical however it is chunked.
+    rng = np.random.default_rng((seed, y0))
+    band = rng.normal(1000.0, 20.0, (rows, size))
+    for _ in range(max(1, rows * size // 200_000)):
+        cx, cy = rng.uniform(0, size), rng.uniform(0, rows)
+        x0, x1 = int(max(cx - 8, 0)), int(min(cx + 8, size))
+        y_lo, y_hi = int(max(cy - 8, 0)), int(min(cy + 8, rows))
+        yy, xx = np.mgrid[y_lo:y_hi, x0:x1]
+        band[y_lo:y_hi, x0:x1] += 5000.0 * np.exp(-((xx - cx) ** 2 + (yy - cy) ** 2) / 8.0)
+    if np.issubdtype(dtype, np.floating) and y0 == 0:
+        band[: min(rows, 16), : size // 8] = np.nan
+    if np.issubdtype(dtype, np.integer):
+        info = np.iinfo(dtype)
+        band = np.clip(band, info.min, info.max)
+    return band.astype(dtype)
+
+
+def make_fits(path: str, size: int, dtype: str = "float32", seed: int = 0) -> str:
+    # Written band by band through a StreamingHDU, so 16k x 16k frames never
+    # need the whole image in memory.
+    np_dtype = DTYPES[dtype]
+    header = fits.Header()
+    header["SIMPLE"] = True
+    header["BITPIX"] = {np.int16: 16, np.float32: -32, np.float64: -64}[np_dtype]
+    header["NAXIS"] = 2
+    header["NAXIS1"] = size
+    header["NAXIS2"] = size
+    header.update(make_wcs(size).to_header())
+    header["OBJECT"] = f"synthetic {size} {dtype}"
+    tmp = path + ".tmp"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    hdu = fits.StreamingHDU(tmp, header)
+    for y0 in range(0, size, BAND_ROWS):
+        hdu.write(_band(size, y0, min(BAND_ROWS, size - y0), np_dtype, seed))
+    hdu.close()
+    os.replace(tmp, path)
+    return path
+
+
+def fits_file(data_dir: str, size: int, dtype: str) -> str:
+    # Cached by size and dtype; generation is deterministic.
+    os.makedirs(data_dir, exist_ok=True)
+    path = os.path.join(data_dir, f"synthetic_{size}_{dtype}.fits")
+    if not os.path.exists(path):
+        make_fits(path, size, dtype)
+    return path
+
+
+def random_boxes(shape, count: int, size: int = 64, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    height, width = shape
+    x0 = rng.integers(0, width - size, count)
+    y0 = rng.integers(0, height - size, count)
+    return np.stack([x0, y0, x0 + size, y0 + size], axis=1)
+
+
+def patch_metas(fits_paths, count: int, image_size: int = 4096, seed: int = 0):
+    # Patch metadata as PatchExporter records it, spread over fits_paths.
+    boxes = random_boxes((image_size, image_size), count, seed=seed)
+    labels = ["star", "galaxy", "artifact", None]
+    patches = {path: [] for path in fits_paths}
+    for i, (x0, y0, x1, y1) in enumerate(boxes.tolist()):
+        path = fits_paths[i % len(fits_paths)]
+        patches[path].append({
+            "patch_id": f"{i + 1:04d}",
+            "timestamp": "2024-01-01T00:00:00",
+            "fits_path": path,
+            "x0": x0, "y0": y0, "x1": x1, "y1": y1,
+            "width": x1 - x0, "height": y1 - y0,
+            "ra_deg_cen": 150.0 + x0 * 1e-5,
+            "dec_deg_cen": 2.0 + y0 * 1e-5,
+            "label": labels[i % len(labels)],
+            "file": f"patch_{i + 1:04d}.fits",
+            "png_file": f"patch_{i + 1:04d}.png",
+        })
+    return patches
+
+
+def make_project(directory: str, fits_paths, n_patches: int = 0, backend: str = "json", image_size: int = 4096):
+    from slicer.project import Project
+    from slicer.sqlite_project import SqliteProject
+
+    project = SqliteProject() if backend == "sqlite" else Project()
+    project.create("bench", directory, list(fits_paths))
+    for path, patches in patch_metas(project.files, n_patches, image_size).items():
+        if patches:
+            project.get_patches(path).extend(patches)
+            project.record_patches_added(path, patches)
+    return project
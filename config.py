@@ -8,10 +8,25 @@ class Config:
     min_size: int = 16 
     png_preview: bool = True
     csv_name: str = "patches.csv"
+    journal_name: str = "patches.journal"
+    patch_id_state_name: str = "next_patch_id"
+    patch_id_block_size: int = 256
+    output_layout: str = "flat"  # flat, hash, label, tar or mef
+    shard_fanout: int = 256
+    shard_max_patches: int = 10000
+    shard_max_mb: int = 1024
+    store_shape: int = 64
+    store_mode: str = "pad"  # pad (centre pad/crop) or resample
+    duplicate_iou: float = 0.7
+    duplicate_action: str = "warn"  # warn, merge or off
     overlay_linewidth: float = 2.0
     overlay_color: str = "lime"
     labels: list[str] = dataclasses.field(default_factory=list)
     stretch_mode: str = "zscale"
+    memmap: bool = True
+    cache_budget_mb: int = 1024
+    prefetch_count: int = 2
+    disk_cache_mb: int = 2048
     # New: Color mapping for labels
     label_colors: Dict[str, str] = dataclasses.field(default_factory=lambda: {
         "default": "lime",
@@ -0,0 +1,32 @@
+import os
+import sys
+import logging
+import argparse
+
+from slicer.batch import load_project
+from slicer.duplicates import find_duplicates, write_report, remove_duplicates
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Find (and optionally remove) duplicate patches across a project.")
+    parser.add_argument("project", help="project.json or project.sqlite")
+    parser.add_argument("--iou", type=float, default=None, help="overlap at which two boxes are duplicates (default: project setting)")
+    parser.add_argument("--same-file-only", action="store_true", help="do not compare patches across overlapping frames")
+    parser.add_argument("--report", help="CSV report path (default: duplicates.csv in the project directory)")
+    parser.add_argument("--delete", action="store_true", help="remove the duplicates, keeping the oldest patch of each group")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    project = load_project(args.project)
+    threshold = args.iou if args.iou is not None else project.config.duplicate_iou
+    duplicates = find_duplicates(project, threshold, cross_frame=not args.same_file_only)
+    report = args.report or os.path.join(project.directory, "duplicates.csv")
+    write_report(duplicates, report)
+    logging.info(f"Wrote {report}")
+    if args.delete and duplicates:
+        remove_duplicates(project, duplicates)
+    project.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
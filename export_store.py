@@ -0,0 +1,29 @@
+import sys
+import logging
+import argparse
+
+from slicer.array_store import ArrayStore, export_patches
+from slicer.batch import load_project
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pack a project's patches into a memory-mappable array store.")
+    parser.add_argument("project", help="project.json or project.sqlite")
+    parser.add_argument("store", help="store directory; created, or appended to if it exists")
+    parser.add_argument("--shape", type=int, default=None, help="side of the fixed patch shape (new stores only)")
+    parser.add_argument("--mode", choices=["pad", "resample"], default=None, help="how patches are fitted (new stores only)")
+    parser.add_argument("-j", "--workers", type=int, default=8, help="threads reading patch files")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    project = load_project(args.project)
+    cfg = project.config
+    shape = args.shape or cfg.store_shape
+    store = ArrayStore(args.store, (shape, shape), args.mode or cfg.store_mode)
+    patches = [p for file_patches in project.patches.values() for p in file_patches]
+    export_patches(store, cfg.out_dir, patches, workers=args.workers)
+    project.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
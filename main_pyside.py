@@ -1,9 +1,8 @@
 
 import sys
 from PySide6.QtWidgets import QApplication, QFileDialog, QMessageBox
-from slicer.ui.main_window import MainWindow
-from slicer.controller import Controller
 from slicer.project import Project
+from slicer.sqlite_project import SqliteProject
 from slicer.ui.project_wizard import ProjectWizard
 from slicer.ui.new_project_dialog import NewProjectDialog
 from slicer.ui.add_files_dialog import AddFilesDialog
@@ -34,12 +33,16 @@ def main():
         if not new_project_dialog.exec():
             sys.exit(0)
         details = new_project_dialog.get_project_details()
+        if details["backend"] == "sqlite":
+            project = SqliteProject()
         project.create(details["name"], details["directory"], details["files"])
     
     elif wizard.choice == "open":
-        path, _ = QFileDialog.getOpenFileName(None, "Open Project", "", "Project Files (*.json)")
+        path, _ = QFileDialog.getOpenFileName(None, "Open Project", "", "Project Files (*.json *.sqlite)")
         if not path:
             sys.exit(0)
+        if path.endswith(".sqlite"):
+            project = SqliteProject()
         project.load(path)
 
         new_files = project.scan_for_new_files()
@@ -61,8 +64,14 @@ def main():
         QMessageBox.information(None, "Empty Project", "No files in project. Exiting.")
         sys.exit(0)
 
+    # The main window pulls in the image stack; import it only once the
+    # wizard and file dialogs are done.
+    from slicer.ui.main_window import MainWindow
+    from slicer.controller import Controller
+
     main_window = MainWindow()
     controller = Controller(main_window, project)
+    app.aboutToQuit.connect(controller.shutdown)
     main_window.show()
     sys.exit(app.exec())
 
@@ -0,0 +1,42 @@
+import sys
+import logging
+import argparse
+
+from slicer.batch import BatchSlicer, load_project
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cut patches for a region catalog or a tile grid into a project without the GUI.")
+    parser.add_argument("project", help="project.json or project.sqlite")
+    parser.add_argument("catalog", nargs="?", help="CSV with x0,y0,x1,y1 or ra,dec,size (or width,height); optional fits_path, label")
+    parser.add_argument("--grid", type=int, metavar="SIZE", help="also cut every file into SIZE x SIZE tiles")
+    parser.add_argument("--stride", type=int, help="grid stride in pixels (default: SIZE)")
+    parser.add_argument("--max-nan", type=float, default=0.0, help="largest NaN fraction a tile may have")
+    parser.add_argument("--min-std", type=float, default=0.0, help="reject tiles flatter than this")
+    parser.add_argument("--label", help="label for grid tiles")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--no-resume", action="store_true", help="ignore the checkpoint of a previous run")
+    parser.add_argument("--no-png", action="store_true", help="skip PNG previews")
+    args = parser.parse_args()
+    if not args.catalog and not args.grid:
+        parser.error("give a catalog, --grid, or both")
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    project = load_project(args.project)
+    if args.no_png:
+        project.config.png_preview = False
+    grid = None
+    if args.grid:
+        grid = {
+            "size": args.grid,
+            "stride": args.stride or args.grid,
+            "max_nan_fraction": args.max_nan,
+            "min_std": args.min_std,
+            "label": args.label,
+        }
+    total = BatchSlicer(project, args.catalog, workers=args.workers, resume=not args.no_resume, grid=grid).run()
+    logging.info(f"Wrote {total} patches")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,205 @@
+import os
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from .patch_layouts import read_patch_hdu
+
+STORE_FILE_NAME = "store.json"
+IMAGES_FILE_NAME = "images.bin"
+
+# name -> dtype of the per-patch arrays kept aligned with the image array.
+COLUMNS = {
+    "patch_id": np.int64,
+    "label": np.int32,
+    "file": np.int32,
+    "x0": np.int32,
+    "y0": np.int32,
+    "x1": np.int32,
+    "y1": np.int32,
+    "ra_deg_cen": np.float64,
+    "dec_deg_cen": np.float64,
+    "valid": np.uint8,
+}
+
+
+def fit_to_shape(image: np.ndarray, shape: Tuple[int, int], mode: str = "pad", fill: float = np.nan) -> np.ndarray:
+    image = np.asarray(image, dtype=np.float32)
+    if mode == "resample":
+        from scipy.ndimage import zoom
+        factors = (shape[0] / image.shape[0], shape[1] / image.shape[1])
+        out = zoom(np.nan_to_num(image, nan=0.0), factors, order=1)
+        return out[:shape[0], :shape[1]]
+    # Centre-pad smaller patches, centre-crop larger ones.
+    out = np.full(shape, fill, dtype=np.float32)
+    h, w = min(image.shape[0], shape[0]), min(image.shape[1], shape[1])
+    sy, sx = (image.shape[0] - h) // 2, (image.shape[1] - w) // 2
+    dy, dx = (shape[0] - h) // 2, (shape[1] - w) // 2
+    out[dy:dy + h, dx:dx + w] = image[sy:sy + h, sx:sx + w]
+    return out
+
+
+def _float(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+class ArrayStore:
+    # Fixed-shape float32 patches in one flat binary file, with aligned
+    # per-patch columns in sibling files; store.json holds the shape, the
+    # record count and the label/file vocabularies. Files grow in chunks of
+    # `chunk` records and new patches are appended in place, so a loader
+    # only needs np.memmap(images.bin) and never opens per-sample files.
+    def __init__(self, directory: str, shape: Tuple[int, int] = (64, 64), mode: str = "pad", chunk: int = 1024):
+        self.directory = directory
+        self.meta_path = os.path.join(directory, STORE_FILE_NAME)
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path, "r") as f:
+                self.meta = json.load(f)
+        else:
+            self.meta = {
+                "shape": list(shape),
+                "dtype": "float32",
+                "mode": mode,
+                "count": 0,
+                "capacity": 0,
+                "chunk": chunk,
+                "labels": [],
+                "files": [],
+            }
+        self.shape = tuple(self.meta["shape"])
+        os.makedirs(directory, exist_ok=True)
+
+    @property
+    def count(self) -> int:
+        return self.meta["count"]
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, IMAGES_FILE_NAME if name == "images" else f"{name}.bin")
+
+    def _record_bytes(self, name: str) -> int:
+        if name == "images":
+            return int(np.prod(self.shape)) * 4
+        return np.dtype(COLUMNS[name]).itemsize
+
+    def _save_meta(self) -> None:
+        tmp = self.meta_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.meta, f)
+        os.replace(tmp, self.meta_path)
+
+    def _reserve(self, count: int) -> None:
+        capacity = self.meta["capacity"]
+        if count <= capacity:
+            return
+        chunk = self.meta["chunk"]
+        capacity = -(-count // chunk) * chunk
+        for name in ["images"] + list(COLUMNS):
+            with open(self._path(name), "ab") as f:
+                f.truncate(capacity * self._record_bytes(name))
+        self.meta["capacity"] = capacity
+
+    def array(self, name: str, mode: str = "r") -> np.ndarray:
+        if self.count == 0:
+            shape = (0,) + self.shape if name == "images" else (0,)
+            return np.empty(shape, dtype=np.float32 if name == "images" else COLUMNS[name])
+        if name == "images":
+            return np.memmap(self._path(name), dtype=np.float32, mode=mode, shape=(self.count,) + self.shape)
+        return np.memmap(self._path(name), dtype=COLUMNS[name], mode=mode, shape=(self.count,))
+
+    def _code(self, vocabulary: str, value: Optional[str]) -> int:
+        if value in (None, ""):
+            return -1
+        values = self.meta[vocabulary]
+        if value not in values:
+            values.append(value)
+        return values.index(value)
+
+    def append(self, images: List[np.ndarray], patches: List[dict]) -> None:
+        if not patches:
+            return
+        start = self.count
+        self._reserve(start + len(patches))
+        block = np.stack([fit_to_shape(img, self.shape, self.meta["mode"]) for img in images])
+        columns = {
+            "patch_id": [int(p["patch_id"]) for p in patches],
+            "label": [self._code("labels", p.get("label")) for p in patches],
+            "file": [self._code("files", p.get("fits_path")) for p in patches],
+            "x0": [int(p["x0"]) for p in patches],
+            "y0": [int(p["y0"]) for p in patches],
+            "x1": [int(p["x1"]) for p in patches],
+            "y1": [int(p["y1"]) for p in patches],
+            "ra_deg_cen": [_float(p.get("ra_deg_cen")) for p in patches],
+            "dec_deg_cen": [_float(p.get("dec_deg_cen")) for p in patches],
+            "valid": [1] * len(patches),
+        }
+        for name, values in [("images", block)] + list(columns.items()):
+            arr = np.ascontiguousarray(values, dtype=np.float32 if name == "images" else COLUMNS[name])
+            with open(self._path(name), "r+b") as f:
+                f.seek(start * self._record_bytes(name))
+                f.write(arr.tobytes())
+        # The count is published only after the records are on disk.
+        self.meta["count"] = start + len(patches)
+        self._save_meta()
+
+    def sync(self, live: Dict[int, dict]) -> Set[int]:
+        # Bring labels and the valid flag of stored records in line with the
+        # current patch set (relabels and deletions since the last export).
+        # A record only stands for a patch cut from the same file and box;
+        # one that no longer matches is flagged invalid so the patch is
+        # exported again. Returns the ids that have a current record.
+        current: Set[int] = set()
+        if self.count == 0:
+            return current
+        ids = self.array("patch_id")
+        files = self.array("file")
+        boxes = np.stack([self.array(k) for k in ("x0", "y0", "x1", "y1")], axis=1)
+        labels = self.array("label", mode="r+")
+        valid = self.array("valid", mode="r+")
+        for i, patch_id in enumerate(ids):
+            patch = live.get(int(patch_id))
+            matches = (
+                patch is not None
+                and int(patch_id) not in current
+                and files[i] == self._code("files", patch.get("fits_path"))
+                and tuple(boxes[i]) == tuple(int(patch[k]) for k in ("x0", "y0", "x1", "y1"))
+            )
+            valid[i] = matches
+            if matches:
+                labels[i] = self._code("labels", patch.get("label"))
+                current.add(int(patch_id))
+        labels.flush()
+        valid.flush()
+        self._save_meta()
+        return current
+
+
+def export_patches(store: ArrayStore, out_dir: str, patches: List[dict], workers: int = 8, batch: int = 256) -> int:
+    # Appends patches without a current record; existing records are only
+    # relabelled or flagged invalid, never rewritten in place.
+    live = {int(p["patch_id"]): p for p in patches if str(p.get("patch_id", "")).isdigit()}
+    done = store.sync(live)
+    todo = [p for pid, p in sorted(live.items()) if pid not in done]
+
+    def read(patch_meta):
+        try:
+            return read_patch_hdu(out_dir, patch_meta).data
+        except Exception as e:
+            logging.info(f"Skipping patch {patch_meta['patch_id']}: {e}")
+            return None
+
+    written = 0
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="export") as pool:
+        for start in range(0, len(todo), batch):
+            chunk = todo[start:start + batch]
+            images = list(pool.map(read, chunk))
+            kept = [(img, p) for img, p in zip(images, chunk) if img is not None]
+            store.append([img for img, _ in kept], [p for _, p in kept])
+            written += len(kept)
+    logging.info(f"Exported {written} new patches to {store.directory} ({store.count} total)")
+    return written
@@ -0,0 +1,240 @@
+import os
+import csv
+import json
+import logging
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from astropy.io import fits
+
+from config import Config
+from .models import FitsImageModel, PatchExporter, open_journal, open_patch_ids, open_layout, read_header_summary
+from .astropy_importer import WCS
+from .patch_ids import ReservedIds
+from .project import Project, _normalize_path
+from .sqlite_project import SqliteProject
+from .tiling import grid_boxes, tile_origins
+
+def load_project(path: str) -> Project:
+    project = SqliteProject() if path.endswith(".sqlite") else Project()
+    return project.load(path)
+
+
+def read_catalog(catalog_path: str) -> List[dict]:
+    # Rows are either pixel boxes (x0, y0, x1, y1; half-open like the patch
+    # metadata) or sky positions (ra, dec in degrees with width/height or
+    # size in pixels). fits_path and label are optional.
+    base = os.path.dirname(os.path.abspath(catalog_path))
+    regions = []
+    with open(catalog_path, "r", newline="") as f:
+        for i, row in enumerate(csv.DictReader(f)):
+            row = {k.strip().lower(): (v or "").strip() for k, v in row.items() if k}
+            region = {"row": i, "label": row.get("label") or None}
+            if row.get("fits_path"):
+                region["fits_path"] = _normalize_path(os.path.join(base, row["fits_path"]))
+            if row.get("x0"):
+                region["box"] = tuple(float(row[k]) for k in ("x0", "y0", "x1", "y1"))
+            elif row.get("ra"):
+                size = row.get("size")
+                region["sky"] = (
+                    float(row["ra"]),
+                    float(row["dec"]),
+                    int(row.get("width") or size),
+                    int(row.get("height") or size),
+                )
+            else:
+                raise ValueError(f"{catalog_path}:{i + 2}: need x0,y0,x1,y1 or ra,dec with a size")
+            regions.append(region)
+    return regions
+
+
+def _sky_to_pixel(wcs: WCS, sky: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    x, y = wcs.celestial.all_world2pix(sky[:, 0], sky[:, 1], 0)
+    return x, y
+
+
+def _boxes_from_sky(wcs: WCS, sky: np.ndarray) -> np.ndarray:
+    x, y = _sky_to_pixel(wcs, sky)
+    w = sky[:, 2].astype(int)
+    h = sky[:, 3].astype(int)
+    x0 = np.floor(x + 0.5).astype(int) - w // 2
+    y0 = np.floor(y + 0.5).astype(int) - h // 2
+    return np.stack([x0, y0, x0 + w, y0 + h], axis=1)
+
+
+def assign_files(regions: List[dict], files: List[str]) -> Dict[str, List[dict]]:
+    # Regions without a fits_path go to every project file whose footprint
+    # contains their centre; only headers are read.
+    groups: Dict[str, List[dict]] = {}
+    unassigned = []
+    for region in regions:
+        if "fits_path" in region:
+            groups.setdefault(region["fits_path"], []).append(region)
+        elif "sky" in region:
+            unassigned.append(region)
+        else:
+            logging.info(f"Skipping catalog row {region['row']}: pixel box without fits_path")
+    if not unassigned:
+        return groups
+
+    sky = np.array([r["sky"] for r in unassigned], dtype=float)
+    for path in files:
+        try:
+            summary = read_header_summary(path)
+        except Exception as e:
+            logging.info(f"Skipping {path}: {e}")
+            continue
+        wcs = WCS(fits.Header.fromstring(summary["header"]))
+        if not wcs.has_celestial:
+            continue
+        height, width = summary["shape"][-2:]
+        with np.errstate(invalid="ignore"):
+            x, y = _sky_to_pixel(wcs, sky)
+        inside = np.flatnonzero((x >= -0.5) & (x < width - 0.5) & (y >= -0.5) & (y < height - 0.5))
+        for i in inside:
+            groups.setdefault(path, []).append(unassigned[i])
+    return groups
+
+
+class _CollectingJournal:
+    # Workers hand their patches back to the parent, which owns the journal.
+    def __init__(self):
+        self.patches = []
+
+    def add(self, patch_meta: dict) -> None:
+        self.patches.append(patch_meta)
+
+
+def grid_tile_count(shape, grid: dict) -> int:
+    ys, xs = tile_origins(shape, grid["size"], grid["stride"])
+    return len(ys) * len(xs)
+
+
+def slice_file(cfg: Config, fits_path: str, regions: List[dict], ids: range, prefix: str) -> Tuple[str, List[dict]]:
+    journal = _CollectingJournal()
+    model = FitsImageModel(fits_path, memmap=cfg.memmap)
+    layout = open_layout(cfg, prefix=prefix)
+    try:
+        boxes = np.zeros((len(regions), 4), dtype=float)
+        pixel = [i for i, r in enumerate(regions) if "box" in r]
+        sky = [i for i, r in enumerate(regions) if "sky" in r]
+        if pixel:
+            boxes[pixel] = [regions[i]["box"] for i in pixel]
+        if sky:
+            boxes[sky] = _boxes_from_sky(model.wcs, np.array([regions[i]["sky"] for i in sky], dtype=float))
+        keep = pixel + sky
+        boxes = [boxes[keep]]
+        labels = [regions[i]["label"] for i in keep]
+        for region in regions:
+            if "grid" in region:
+                grid = region["grid"]
+                tiles = grid_boxes(model.data, grid["size"], grid["stride"], grid["max_nan_fraction"], grid["min_std"])
+                boxes.append(tiles)
+                labels.extend([region["label"]] * len(tiles))
+        exporter = PatchExporter(cfg, model, journal=journal, patch_ids=ReservedIds(ids), layout=layout)
+        exporter.save_patches(np.concatenate(boxes), labels)
+    finally:
+        layout.close()
+        model.close()
+    return fits_path, journal.patches
+
+
+class BatchSlicer:
+    def __init__(
+        self,
+        project: Project,
+        catalog_path: Optional[str] = None,
+        workers: Optional[int] = None,
+        resume: bool = True,
+        grid: Optional[dict] = None,
+    ):
+        # grid: {"size", "stride", "max_nan_fraction", "min_std", "label"} to
+        # tile every project file instead of (or as well as) a catalog.
+        self.project = project
+        self.cfg = project.config
+        self.catalog_path = catalog_path
+        self.grid = grid
+        self.workers = workers or os.cpu_count() or 1
+        stems = []
+        if catalog_path:
+            stems.append(os.path.splitext(os.path.basename(catalog_path))[0])
+        if grid:
+            stems.append(f"grid{grid['size']}s{grid['stride']}")
+        stem = "+".join(stems)
+        self.checkpoint_path = os.path.join(project.directory, "batch", f"{stem}.checkpoint.jsonl")
+        if not resume and os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+
+    def _done_files(self) -> set:
+        done = set()
+        if os.path.exists(self.checkpoint_path):
+            with open(self.checkpoint_path, "r") as f:
+                for line in f:
+                    try:
+                        done.add(json.loads(line)["fits_path"])
+                    except (ValueError, KeyError):
+                        continue
+        return done
+
+    def _checkpoint(self, fits_path: str, n_regions: int, n_patches: int) -> None:
+        os.makedirs(os.path.dirname(self.checkpoint_path), exist_ok=True)
+        with open(self.checkpoint_path, "a") as f:
+            f.write(json.dumps({"fits_path": fits_path, "regions": n_regions, "patches": n_patches}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _id_count(self, path: str, regions: List[dict]) -> int:
+        count = sum(1 for r in regions if "grid" not in r)
+        grids = [r["grid"] for r in regions if "grid" in r]
+        if grids:
+            shape = read_header_summary(path)["shape"]
+            count += sum(grid_tile_count(shape, g) for g in grids)
+        return max(count, 1)
+
+    def run(self) -> int:
+        regions = read_catalog(self.catalog_path) if self.catalog_path else []
+        groups = assign_files(regions, self.project.files)
+        if self.grid:
+            for path in self.project.files:
+                groups.setdefault(path, []).append({"row": None, "grid": self.grid, "label": self.grid.get("label")})
+        done = self._done_files()
+        todo = {path: rs for path, rs in groups.items() if path not in done}
+        logging.info(
+            f"{len(regions)} regions over {len(groups)} files; "
+            f"{len(groups) - len(todo)} already done, {len(todo)} to slice"
+        )
+
+        known = set(self.project.files)
+        new_files = [path for path in todo if path not in known]
+        if new_files:
+            self.project.add_files(new_files)
+
+        journal = open_journal(self.cfg, self.project)
+        patch_ids = open_patch_ids(self.cfg, journal)
+        total = 0
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            futures = {}
+            for path, rs in todo.items():
+                ids = patch_ids.reserve(self._id_count(path, rs))
+                prefix = f"batch{ids.start:08d}"
+                futures[pool.submit(slice_file, self.cfg, path, rs, ids, prefix)] = path
+            for future in as_completed(futures):
+                path = futures[future]
+                try:
+                    _, patches = future.result()
+                except Exception as e:
+                    logging.info(f"Slicing {path} failed: {e}")
+                    continue
+                # Commit to the journal and project before checkpointing, so a
+                # resumed run never loses a file it has marked done.
+                journal.add_many(patches)
+                self.project.get_patches(path).extend(patches)
+                self.project.record_patches_added(path, patches)
+                self._checkpoint(path, len(todo[path]), len(patches))
+                total += len(patches)
+                logging.info(f"{os.path.basename(path)}: {len(patches)} patches from {len(todo[path])} regions")
+
+        journal.export_csv(os.path.join(self.cfg.out_dir, self.cfg.csv_name))
+        self.project.close()
+        return total
@@ -0,0 +1,123 @@
+from typing import Dict, Hashable, Iterable, List, Set, Tuple
+
+Box = Tuple[float, float, float, float]
+
+
+class BoxIndex:
+    # Uniform grid hash over (x0, y0, x1, y1) boxes: inserts, removals and
+    # window queries only touch the cells a box or window overlaps.
+    def __init__(self, cell_size: int = 256):
+        self.cell_size = cell_size
+        self._boxes: Dict[Hashable, Box] = {}
+        self._cells: Dict[Tuple[int, int], Set[Hashable]] = {}
+
+    def __len__(self) -> int:
+        return len(self._boxes)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._boxes
+
+    def get(self, key: Hashable) -> Box:
+        return self._boxes[key]
+
+    def items(self):
+        return self._boxes.items()
+
+    def _cells_for(self, box: Box) -> Iterable[Tuple[int, int]]:
+        x0, y0, x1, y1 = box
+        c = self.cell_size
+        for cy in range(int(y0 // c), int(y1 // c) + 1):
+            for cx in range(int(x0 // c), int(x1 // c) + 1):
+                yield cx, cy
+
+    def insert(self, key: Hashable, box: Box) -> None:
+        if key in self._boxes:
+            self.remove(key)
+        self._boxes[key] = box
+        for cell in self._cells_for(box):
+            self._cells.setdefault(cell, set()).add(key)
+
+    def remove(self, key: Hashable) -> None:
+        box = self._boxes.pop(key, None)
+        if box is None:
+            return
+        for cell in self._cells_for(box):
+            keys = self._cells.get(cell)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._cells[cell]
+
+    def clear(self) -> None:
+        self._boxes.clear()
+        self._cells.clear()
+
+    def query(self, box: Box) -> Set[Hashable]:
+        x0, y0, x1, y1 = box
+        c = self.cell_size
+        n_cells = (int(x1 // c) - int(x0 // c) + 1) * (int(y1 // c) - int(y0 // c) + 1)
+        found = set()
+        if n_cells > len(self._cells):
+            # Wide windows (zoomed out): cheaper to walk the occupied cells.
+            for keys in self._cells.values():
+                found.update(keys)
+        else:
+            for cell in self._cells_for(box):
+                found.update(self._cells.get(cell, ()))
+        return {
+            k for k in found
+            if self._boxes[k][0] <= x1 and self._boxes[k][2] >= x0
+            and self._boxes[k][1] <= y1 and self._boxes[k][3] >= y0
+        }
+
+
+def iou(a: Box, b: Box) -> float:
+    w = min(a[2], b[2]) - max(a[0], b[0])
+    h = min(a[3], b[3]) - max(a[1], b[1])
+    if w <= 0 or h <= 0:
+        return 0.0
+    inter = w * h
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return float(inter / union) if union > 0 else 0.0
+
+
+def patch_box(patch_meta: dict) -> Box:
+    return (
+        float(patch_meta["x0"]), float(patch_meta["y0"]),
+        float(patch_meta["x1"]), float(patch_meta["y1"]),
+    )
+
+
+class PatchIndex:
+    # The boxes of one file's patches, kept beside patches_meta so a newly
+    # drawn box can be checked against existing ones without a full scan.
+    def __init__(self, patches: Iterable[dict] = (), cell_size: int = 256):
+        self._index = BoxIndex(cell_size)
+        self._patches: Dict[Hashable, dict] = {}
+        for patch_meta in patches:
+            self.add(patch_meta)
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def add(self, patch_meta: dict) -> None:
+        self._index.insert(patch_meta["patch_id"], patch_box(patch_meta))
+        self._patches[patch_meta["patch_id"]] = patch_meta
+
+    def remove(self, patch_meta: dict) -> None:
+        self._index.remove(patch_meta["patch_id"])
+        self._patches.pop(patch_meta["patch_id"], None)
+
+    def clear(self) -> None:
+        self._index.clear()
+        self._patches.clear()
+
+    def overlaps(self, box: Box, threshold: float = 0.0) -> List[Tuple[float, dict]]:
+        # (IoU, patch) for every patch at or above the threshold, best first.
+        found = []
+        for key in self._index.query(box):
+            overlap = iou(box, self._index.get(key))
+            if overlap > 0 and overlap >= threshold:
+                found.append((overlap, self._patches[key]))
+        found.sort(key=lambda m: m[0], reverse=True)
+        return found
@@ -0,0 +1,217 @@
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from .models import FitsImageModel
+from .processing_utils import build_pyramid
+from .disk_cache import DiskCache
+from .profiler import profiler
+
+
+class _CacheEntry:
+    def __init__(self, path: str):
+        self.path = path
+        self.model: Optional[FitsImageModel] = None
+        self.buffers: Dict[str, np.ndarray] = {}
+        self.pyramids: Dict[str, List[np.ndarray]] = {}
+        self.lock = threading.Lock()
+
+    @property
+    def nbytes(self) -> int:
+        total = sum(buf.nbytes for buf in self.buffers.values())
+        for levels in self.pyramids.values():
+            total += sum(level.nbytes for level in levels)
+        # Memory-mapped pixels live in the page cache, not in our budget.
+        if self.model is not None and not self.model.memmap and self.model._data is not None:
+            total += self.model._data.nbytes
+        return total
+
+    def close(self) -> None:
+        if self.model is not None:
+            self.model.close()
+        self.model = None
+        self.buffers = {}
+        self.pyramids = {}
+
+
+class ModelCache:
+    def __init__(self, budget_bytes: int, memmap: bool = True, tile_size: int = 256,
+                 disk_cache: Optional[DiskCache] = None):
+        self.budget_bytes = budget_bytes
+        self.tile_size = tile_size
+        self.memmap = memmap
+        self.disk_cache = disk_cache
+        self._entries: "OrderedDict[str, _CacheEntry]" = OrderedDict()
+        self._pinned: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def _entry(self, path: str) -> _CacheEntry:
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is None:
+                entry = _CacheEntry(path)
+                self._entries[path] = entry
+            self._entries.move_to_end(path)
+            return entry
+
+    def _load_model(self, entry: _CacheEntry) -> FitsImageModel:
+        if entry.model is None:
+            try:
+                with profiler.span("fits_open"):
+                    entry.model = FitsImageModel(entry.path, memmap=self.memmap, disk_cache=self.disk_cache)
+            except Exception:
+                self.discard(entry.path)
+                raise
+        return entry.model
+
+    def pin(self, path: Optional[str]) -> None:
+        self._pinned = path
+
+    def contains(self, path: str, stretch_mode: Optional[str] = None) -> bool:
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is None or entry.model is None:
+                return False
+            return stretch_mode is None or stretch_mode in entry.pyramids
+
+    def get_model(self, path: str) -> FitsImageModel:
+        entry = self._entry(path)
+        with entry.lock:
+            model = self._load_model(entry)
+        self._evict()
+        return model
+
+    def _display(self, entry: _CacheEntry, stretch_mode: str) -> np.ndarray:
+        model = self._load_model(entry)
+        buf = entry.buffers.get(stretch_mode)
+        if buf is None:
+            with profiler.span("stretch", mode=stretch_mode):
+                buf = model.get_display_image(stretch_mode=stretch_mode)
+            entry.buffers[stretch_mode] = buf
+        return buf
+
+    def get_display(self, path: str, stretch_mode: str) -> np.ndarray:
+        entry = self._entry(path)
+        with entry.lock:
+            buf = self._display(entry, stretch_mode)
+        self._evict()
+        return buf
+
+    def _stored_levels(self, path: str, stretch_mode: str) -> Optional[List[np.ndarray]]:
+        if self.disk_cache is None:
+            return None
+        count = self.disk_cache.get_json(path, f"pyramid-{stretch_mode}-{self.tile_size}")
+        if not count:
+            return None
+        levels = []
+        for level in range(1, count):
+            arr = self.disk_cache.get_array(path, f"pyramid-{stretch_mode}-{self.tile_size}-{level}", mmap=True)
+            if arr is None:
+                return None
+            levels.append(arr)
+        return levels
+
+    def _store_levels(self, path: str, stretch_mode: str, levels: List[np.ndarray]) -> None:
+        # Only the downsampled levels are persisted; level 0 is one LUT pass away.
+        for level in range(1, len(levels)):
+            self.disk_cache.put_array(path, f"pyramid-{stretch_mode}-{self.tile_size}-{level}", levels[level])
+        self.disk_cache.put_json(path, f"pyramid-{stretch_mode}-{self.tile_size}", len(levels))
+
+    def get_cached_preview(self, path: str, stretch_mode: str, max_size: int) -> Optional[Tuple[np.ndarray, int]]:
+        levels = self._stored_levels(path, stretch_mode)
+        if not levels:
+            return None
+        for level, arr in enumerate(levels, start=1):
+            if max(arr.shape) <= max_size:
+                return np.asarray(arr), 1 << level
+        return np.asarray(levels[-1]), 1 << len(levels)
+
+    def get_pyramid(self, path: str, stretch_mode: str) -> List[np.ndarray]:
+        entry = self._entry(path)
+        with entry.lock:
+            levels = entry.pyramids.get(stretch_mode)
+            if levels is None:
+                base = self._display(entry, stretch_mode)
+                stored = self._stored_levels(path, stretch_mode)
+                if stored is not None:
+                    levels = [base] + stored
+                else:
+                    with profiler.span("pyramid"):
+                        levels = build_pyramid(base, self.tile_size)
+                    if self.disk_cache is not None:
+                        self._store_levels(path, stretch_mode, levels)
+                entry.pyramids[stretch_mode] = levels
+                # The full-resolution level replaces the display buffer.
+                entry.buffers.pop(stretch_mode, None)
+        self._evict()
+        return levels
+
+    def discard(self, path: str) -> None:
+        with self._lock:
+            entry = self._entries.pop(path, None)
+        if entry is not None:
+            entry.close()
+
+    def clear(self) -> None:
+        with self._lock:
+            entries = list(self._entries.values())
+            self._entries.clear()
+        for entry in entries:
+            entry.close()
+
+    def _evict(self) -> None:
+        evicted = []
+        with self._lock:
+            total = sum(e.nbytes for e in self._entries.values())
+            for path in list(self._entries):
+                if total <= self.budget_bytes:
+                    break
+                if path == self._pinned:
+                    continue
+                entry = self._entries[path]
+                # Skip entries a worker is still filling; they are retried on the next pass.
+                if not entry.lock.acquire(blocking=False):
+                    continue
+                try:
+                    total -= entry.nbytes
+                    del self._entries[path]
+                    entry.close()
+                finally:
+                    entry.lock.release()
+                evicted.append(path)
+        for path in evicted:
+            logging.debug(f"Evicted {path} from model cache")
+
+
+class Prefetcher:
+    def __init__(self, cache: ModelCache, max_workers: int = 2):
+        self.cache = cache
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="prefetch")
+        self._futures: Dict[str, Future] = {}
+
+    def prefetch(self, paths: Iterable[str], stretch_mode: str) -> None:
+        paths = list(paths)
+        for path, future in list(self._futures.items()):
+            if path not in paths or future.done():
+                future.cancel()
+                del self._futures[path]
+        for path in paths:
+            if path in self._futures or self.cache.contains(path, stretch_mode):
+                continue
+            self._futures[path] = self._executor.submit(self._warm, path, stretch_mode)
+
+    def _warm(self, path: str, stretch_mode: str) -> None:
+        try:
+            self.cache.get_pyramid(path, stretch_mode)
+        except Exception as e:
+            logging.info(f"Prefetch of {path} failed: {e}")
+
+    def shutdown(self) -> None:
+        for future in self._futures.values():
+            future.cancel()
+        self._futures = {}
+        self._executor.shutdown(wait=True, cancel_futures=True)
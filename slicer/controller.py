@@ -1,15 +1,62 @@
 
 import os
-from PySide6.QtCore import QObject, Slot, QRect
-from PySide6.QtWidgets import QMessageBox
+import time
+from concurrent.futures import ThreadPoolExecutor
+from PySide6.QtCore import QObject, Signal, Slot, QRect, QTimer, QCoreApplication, QEvent
+from PySide6.QtWidgets import QMessageBox, QFileDialog
 from .ui.main_window import MainWindow
 from .ui.assign_label_dialog import AssignLabelDialog
 from .ui.add_files_dialog import AddFilesDialog
-from .models import FitsImageModel, PatchExporter
+from .ui.tile_dialog import TileDialog
+from .models import FitsImageModel, PatchExporter, open_journal, open_patch_ids, open_layout
+from .cache import ModelCache, Prefetcher
+from .disk_cache import DiskCache
+from .loader import ImageLoader
+from .patch_writer import PatchWriter
+from .footprints import FootprintIndex
+from .array_store import ArrayStore, export_patches
+from .batch import slice_file, grid_tile_count
+from .profiler import profiler
 from .project import Project, _normalize_path
+from .sqlite_project import SqliteProject
 from .ui.label_dialog import LabelDialog
+from .ui.tiled_image_item import TiledImageItem
+
+# Stages shown in the status bar while timings are recorded.
+STATUS_STAGES = [
+    "load", "fits_open", "stretch", "pyramid", "set_image", "overlays",
+    "region", "save_patch", "png", "project_write",
+]
+
+# Packed layouts learn a patch's offsets only after the write; those
+# write-backs are persisted at most this often.
+WRITE_BACK_MS = 1000
+
+# Tiling asks for confirmation above this many tiles.
+TILE_CONFIRM_COUNT = 1000
+
+
+def parse_sky_position(text):
+    import astropy.units as u
+    from astropy.coordinates import SkyCoord
+    parts = text.replace(",", " ").split()
+    if len(parts) == 2:
+        try:
+            return float(parts[0]), float(parts[1])
+        except ValueError:
+            pass
+    coord = SkyCoord(text, unit=(u.hourangle, u.deg))
+    return coord.ra.deg, coord.dec.deg
+
 
 class Controller(QObject):
+    # file_path, future of slice_file
+    tiles_done = Signal(str, object)
+    # query number, ra, dec, future of the covering files
+    sky_filter_done = Signal(int, float, float, object)
+    # store directory, future of (ArrayStore, patches added)
+    store_exported = Signal(str, object)
+
     def __init__(self, main_window: MainWindow, project: Project):
         super().__init__()
         self.main_window = main_window
@@ -18,17 +65,67 @@ class Controller(QObject):
         self.current_file_index = 0
         self.fits_image_model: FitsImageModel = None
         self.patch_exporter: PatchExporter = None
+        self.disk_cache = DiskCache(self.project.cache_dir, self.cfg.disk_cache_mb * 1024 * 1024)
+        self.model_cache = ModelCache(
+            self.cfg.cache_budget_mb * 1024 * 1024,
+            memmap=self.cfg.memmap,
+            tile_size=TiledImageItem.TILE_SIZE,
+            disk_cache=self.disk_cache,
+        )
+        self.prefetcher = Prefetcher(self.model_cache)
+        self.image_loader = ImageLoader(self.model_cache)
+        self.patch_journal = open_journal(self.cfg, self.project)
+        self.patch_ids = open_patch_ids(self.cfg, self.patch_journal)
+        self.patch_layout = open_layout(self.cfg)
+        self.patch_writer = PatchWriter(self.patch_journal)
+        # Tiling runs the batch slicer's per-file path off the GUI thread: it
+        # reads the frame through its own memmap and writes synchronously,
+        # so no per-tile copies queue up behind the patch writer.
+        self._tiler = ThreadPoolExecutor(max_workers=1, thread_name_prefix="tiler")
+        self._exporter = ThreadPoolExecutor(max_workers=1, thread_name_prefix="store-export")
+        self.patch_journal.start_compactor(csv_path=self._patches_csv_path())
+        self.footprints = FootprintIndex(self.project.index_dir)
+        # Footprint updates read every stale header, so sky queries run on
+        # their own worker; only the latest query's result is applied.
+        self._sky_worker = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sky")
+        self._sky_query = 0
+        self._sky_filter = None
+        self._reset_view_pending = False
+        self._load_started = None
+        self._written = []
+        self._written_timer = QTimer(self)
+        self._written_timer.setSingleShot(True)
+        self._written_timer.timeout.connect(self._record_written)
+        self._timing_timer = QTimer(self)
+        self._timing_timer.setInterval(1000)
+        self._timing_timer.timeout.connect(self._update_timing_label)
+        # FITS_SLICER_TRACE=<path> records from launch and writes the trace on exit.
+        self._trace_path = os.environ.get("FITS_SLICER_TRACE")
+        if self._trace_path:
+            self.main_window.record_timings_action.setChecked(True)
+            self.set_timings_enabled(True)
 
         self._connect_signals()
+        self._populate_patch_table()
         self.load_current_file()
 
     def _connect_signals(self):
         self.main_window.image_view.region_selected.connect(self.on_region_selected)
+        self.image_loader.preview_ready.connect(self.on_preview_ready)
+        self.image_loader.image_ready.connect(self.on_image_ready)
+        self.image_loader.load_failed.connect(self.on_load_failed)
+        self.patch_writer.patch_failed.connect(self.on_patch_write_failed)
+        self.patch_writer.patch_written.connect(self.on_patch_written)
+        self.tiles_done.connect(self.on_tiles_done)
+        self.sky_filter_done.connect(self.on_sky_filter_done)
+        self.store_exported.connect(self.on_store_exported)
         
         # Connect toolbar actions
         self.main_window.next_action.triggered.connect(self.next_file)
         self.main_window.prev_action.triggered.connect(self.prev_file)
-        self.main_window.file_combo.currentIndexChanged.connect(self.jump_to_file)
+        self.main_window.file_combo.currentIndexChanged.connect(self.on_file_combo_changed)
+        self.main_window.sky_filter_edit.returnPressed.connect(self.on_sky_filter_entered)
+        self.main_window.sky_filter_edit.textChanged.connect(self.on_sky_filter_text_changed)
         
         self.main_window.zoom_in_action.triggered.connect(self.main_window.image_view.zoom_in)
         self.main_window.zoom_out_action.triggered.connect(self.main_window.image_view.zoom_out)
@@ -36,8 +133,18 @@ class Controller(QObject):
 
         self.main_window.undo_action.triggered.connect(self.undo_last_patch)
         self.main_window.clear_action.triggered.connect(self.clear_all_patches)
+        self.main_window.tile_action.triggered.connect(self.tile_current_file)
         self.main_window.edit_labels_action.triggered.connect(self.edit_labels)
+        self.main_window.patch_table_view.model.label_changed.connect(self.on_patch_label_changed)
+        self.main_window.current_file_only_check.toggled.connect(self._update_table_file_filter)
         self.main_window.add_files_action.triggered.connect(self.add_files_to_project)
+        self.main_window.export_json_action.triggered.connect(self.export_project_json)
+        self.main_window.convert_sqlite_action.triggered.connect(self.convert_project_to_sqlite)
+        self.main_window.export_csv_action.triggered.connect(self.export_patches_csv)
+        self.main_window.export_store_action.triggered.connect(self.export_array_store)
+        self.main_window.record_timings_action.toggled.connect(self.set_timings_enabled)
+        self.main_window.save_trace_action.triggered.connect(self.save_timing_trace)
+        self.main_window.convert_sqlite_action.setEnabled(not isinstance(self.project, SqliteProject))
 
     def load_current_file(self):
         if not self.project.files:
@@ -51,81 +158,224 @@ class Controller(QObject):
         self.main_window.stretch_combo.blockSignals(False)
         
         file_path = self.project.files[self.current_file_index]
+        self.patch_writer.drain()
+        self.fits_image_model = None
+        self.patch_exporter = None
+        self._request_display(file_path, reset_view=True)
+        self.main_window.update_status(f"Loading {os.path.basename(file_path)}...")
+
+    def _request_display(self, file_path, reset_view):
+        self._reset_view_pending = reset_view
+        self._load_started = time.perf_counter()
+        self.model_cache.pin(file_path)
+        self.image_loader.request(file_path, self.cfg.stretch_mode)
+
+    def _activate_model(self, file_path, model):
+        if self.fits_image_model is model:
+            return
+        self.fits_image_model = model
+        self.patch_exporter = PatchExporter(
+            self.cfg, self.fits_image_model, journal=self.patch_journal, patch_ids=self.patch_ids,
+            layout=self.patch_layout, writer=self.patch_writer,
+        )
+
+        self.patch_exporter.patches_meta = self.project.get_patches(file_path)
+
+        self.main_window.setWindowTitle(f"{self.project.name} - FITS Image Slicer")
+        self._refresh_overlays()
+
+    @Slot(int, str, object, object, int)
+    def on_preview_ready(self, generation, file_path, model, preview, step):
+        if self.image_loader.is_stale(generation):
+            return
         try:
-            self.fits_image_model = FitsImageModel(file_path)
-            self.patch_exporter = PatchExporter(self.cfg, self.fits_image_model)
-            
-            current_patches = self.project.patches.get(_normalize_path(file_path), [])
-            self.patch_exporter.patches_meta = current_patches
-            
-            image_data = self.fits_image_model.get_normalized_image_data(
-                stretch_mode=self.cfg.stretch_mode
+            self._activate_model(file_path, model)
+            with profiler.span("set_image", preview=True):
+                self.main_window.image_view.set_image(preview, reset_view=self._reset_view_pending, scale=step)
+            self._reset_view_pending = False
+            profiler.record("first_preview", self._load_started, time.perf_counter() - self._load_started)
+        except Exception as e:
+            self._on_load_error(file_path, e)
+
+    @Slot(int, str, object, object)
+    def on_image_ready(self, generation, file_path, model, levels):
+        if self.image_loader.is_stale(generation):
+            return
+        try:
+            self._activate_model(file_path, model)
+            with profiler.span("set_image"):
+                self.main_window.image_view.set_image(levels[0], reset_view=self._reset_view_pending, levels=levels)
+            self._reset_view_pending = False
+            profiler.record(
+                "load", self._load_started, time.perf_counter() - self._load_started,
+                {"file": os.path.basename(file_path)},
             )
-            self.main_window.image_view.set_image(image_data, reset_view=True)
             self.main_window.update_status(f"Loaded {os.path.basename(file_path)}")
-            self.main_window.setWindowTitle(f"{self.project.name} - FITS Image Slicer")
-            self._refresh_overlays()
+            self._prefetch_neighbours()
         except Exception as e:
-            reply = QMessageBox.critical(
-                self.main_window, "Error Loading File",
-                f"Failed to load {os.path.basename(file_path)}.\n\n"
-                f"Error: {e}\n\n"
-                "Would you like to remove this file from the project?",
-                QMessageBox.Yes | QMessageBox.No | QMessageBox.Ignore,
-                QMessageBox.Ignore
-            )
-            if reply == QMessageBox.Yes:
-                self.project.files.pop(self.current_file_index)
-                self.project.save()
-                if self.current_file_index >= len(self.project.files):
-                    self.current_file_index = len(self.project.files) - 1
-                self.load_current_file()
-            elif reply == QMessageBox.No:
-                if self.current_file_index < len(self.project.files) - 1:
-                    self.next_file()
-            else: # Ignore
-                pass
+            self._on_load_error(file_path, e)
+
+    @Slot(int, str, str)
+    def on_load_failed(self, generation, file_path, message):
+        if self.image_loader.is_stale(generation):
+            return
+        self._on_load_error(file_path, message)
+
+    def _on_load_error(self, file_path, e):
+        self.fits_image_model = None
+        self.patch_exporter = None
+        reply = QMessageBox.critical(
+            self.main_window, "Error Loading File",
+            f"Failed to load {os.path.basename(file_path)}.\n\n"
+            f"Error: {e}\n\n"
+            "Would you like to remove this file from the project?",
+            QMessageBox.Yes | QMessageBox.No | QMessageBox.Ignore,
+            QMessageBox.Ignore
+        )
+        if reply == QMessageBox.Yes:
+            self.model_cache.discard(file_path)
+            self.project.remove_file(file_path)
+            if self.current_file_index >= len(self.project.files):
+                self.current_file_index = len(self.project.files) - 1
+            self.load_current_file()
+        elif reply == QMessageBox.No:
+            if self.current_file_index < len(self.project.files) - 1:
+                self.next_file()
+        else: # Ignore
+            pass
+
+    def _prefetch_neighbours(self):
+        n = len(self.project.files)
+        paths = []
+        for step in range(1, self.cfg.prefetch_count + 1):
+            for index in (self.current_file_index + step, self.current_file_index - step):
+                if 0 <= index < n:
+                    paths.append(self.project.files[index])
+        self.prefetcher.prefetch(paths, self.cfg.stretch_mode)
+
+    def shutdown(self):
+        self.image_loader.shutdown()
+        self.prefetcher.shutdown()
+        # Queued patch writes and tiling finish before the models they were
+        # cut from close.
+        self._sky_worker.shutdown(wait=True, cancel_futures=True)
+        self._tiler.shutdown(wait=True)
+        self._exporter.shutdown(wait=True)
+        self.patch_writer.shutdown()
+        QCoreApplication.sendPostedEvents(self, QEvent.MetaCall)
+        self._record_written()
+        self.model_cache.clear()
+        self.patch_layout.close()
+        self.patch_journal.stop_compactor()
+        self.patch_journal.export_csv(self._patches_csv_path())
+        self.project.close()
+        if self._trace_path:
+            profiler.write_trace(self._trace_path)
+
+    def _patches_csv_path(self):
+        return os.path.join(self.cfg.out_dir, self.cfg.csv_name)
 
     def _refresh_overlays(self):
-        self.main_window.image_view.clear_patches()
-        for patch_meta in self.patch_exporter.patches_meta:
-            color = self.cfg.get_color_for_label(patch_meta.get("label"))
-            self.main_window.image_view.add_patch_overlay(
-                patch_meta["x0"],
-                patch_meta["y0"],
-                patch_meta["width"],
-                patch_meta["height"],
-                color=color,
-                linewidth=self.cfg.overlay_linewidth,
-            )
-        
-        # Disconnect first to avoid duplicate connections
-        if self.main_window.patch_table_view.model is not None:
-            self.main_window.patch_table_view.model.dataChanged.disconnect(self.on_patch_label_changed)
-            
-        self.main_window.patch_table_view.set_patches(self.patch_exporter.patches_meta, self.cfg.labels)
-        self.main_window.patch_table_view.model.dataChanged.connect(self.on_patch_label_changed)
+        with profiler.span("overlays", patches=len(self.patch_exporter.patches_meta)):
+            self.main_window.image_view.clear_patches()
+            for patch_meta in self.patch_exporter.patches_meta:
+                self._add_overlay(patch_meta)
+            self._update_table_file_filter()
 
-    @Slot(object, object)
-    def on_patch_label_changed(self, top_left, bottom_right):
-        row = top_left.row()
-        new_label = self.patch_exporter.patches_meta[row]["label"]
-        
-        # This is a bit of a hack, but it works.
-        # We get the new label from the model, update the patch_meta, and then refresh.
-        model_label = self.main_window.patch_table_view.model.data(top_left, 0)
-        if new_label != model_label:
-            self.patch_exporter.patches_meta[row]["label"] = model_label
-            self._update_project_patches()
-            self._refresh_overlays()
+    def _add_overlay(self, patch_meta):
+        self.main_window.image_view.add_patch_overlay(
+            patch_meta["x0"],
+            patch_meta["y0"],
+            patch_meta["width"],
+            patch_meta["height"],
+            color=self.cfg.get_color_for_label(patch_meta.get("label")),
+            linewidth=self.cfg.overlay_linewidth,
+            patch_id=patch_meta["patch_id"],
+        )
+
+    def _populate_patch_table(self):
+        all_patches = [p for patches in self.project.patches.values() for p in patches]
+        self.main_window.patch_table_view.set_patches(all_patches, self.cfg.labels)
+
+    @Slot()
+    def _update_table_file_filter(self):
+        file_path = None
+        if self.main_window.current_file_only_check.isChecked() and self.project.files:
+            file_path = self.project.files[self.current_file_index]
+        self.main_window.patch_table_view.set_file_filter(file_path)
+
+    @Slot(object)
+    def on_patch_label_changed(self, patch_meta):
+        self.project.record_patch_updated(patch_meta)
+        self.patch_journal.relabel(patch_meta)
+        if self.patch_exporter and any(p is patch_meta for p in self.patch_exporter.patches_meta):
+            self.main_window.image_view.set_patch_overlay_color(
+                patch_meta["patch_id"], self.cfg.get_color_for_label(patch_meta.get("label"))
+            )
 
 
     def _update_file_combo(self):
-        self.main_window.file_combo.blockSignals(True)
-        self.main_window.file_combo.clear()
-        self.main_window.file_combo.addItems([os.path.basename(f) for f in self.project.files])
-        self.main_window.file_combo.setCurrentIndex(self.current_file_index)
-        self.main_window.file_combo.blockSignals(False)
+        # Items carry their index into project.files, since the sky filter
+        # may hide some of them.
+        combo = self.main_window.file_combo
+        combo.blockSignals(True)
+        combo.clear()
+        shown = set(self._sky_filter) if self._sky_filter is not None else None
+        for index, f in enumerate(self.project.files):
+            if shown is None or f in shown:
+                combo.addItem(os.path.basename(f), index)
+        combo.setCurrentIndex(combo.findData(self.current_file_index))
+        combo.blockSignals(False)
+
+    @Slot(int)
+    def on_file_combo_changed(self, row):
+        index = self.main_window.file_combo.itemData(row)
+        if index is not None:
+            self.jump_to_file(index)
+
+    @Slot()
+    def on_sky_filter_entered(self):
+        text = self.main_window.sky_filter_edit.text().strip()
+        self._sky_query += 1
+        if not text:
+            self._set_sky_filter(None)
+            return
+        try:
+            ra, dec = parse_sky_position(text)
+        except ValueError as e:
+            self.main_window.update_status(f"Invalid sky position: {e}")
+            return
+        query = self._sky_query
+        future = self._sky_worker.submit(self._covering_files, list(self.project.files), ra, dec)
+        future.add_done_callback(lambda f: self.sky_filter_done.emit(query, ra, dec, f))
+        self.main_window.update_status(f"Finding files that cover RA {ra:.5f} Dec {dec:.5f}...")
+
+    def _covering_files(self, files, ra, dec):
+        self.footprints.update(files)
+        return self.footprints.covering(ra, dec)
+
+    @Slot(int, float, float, object)
+    def on_sky_filter_done(self, query, ra, dec, future):
+        if query != self._sky_query or future.cancelled():
+            return
+        try:
+            files = future.result()
+        except Exception as e:
+            self.main_window.update_status(f"Sky filter failed: {e}")
+            return
+        self._set_sky_filter(files)
+        self.main_window.update_status(f"{len(files)} files cover RA {ra:.5f} Dec {dec:.5f}")
+
+    @Slot(str)
+    def on_sky_filter_text_changed(self, text):
+        if not text:
+            self._sky_query += 1
+            if self._sky_filter is not None:
+                self._set_sky_filter(None)
+
+    def _set_sky_filter(self, files):
+        self._sky_filter = files
+        self._update_file_combo()
 
     @Slot()
     def next_file(self):
@@ -149,7 +399,22 @@ class Controller(QObject):
     def on_region_selected(self, rect: QRect):
         if self.patch_exporter:
             x0, y0, x1, y1 = rect.left(), rect.top(), rect.right(), rect.bottom()
-            
+
+            with profiler.span("duplicate_check"):
+                duplicate = self._find_duplicate(x0, y0, x1, y1)
+            if duplicate and self.cfg.duplicate_action == "warn":
+                overlap, existing = duplicate
+                reply = QMessageBox.question(
+                    self.main_window, "Possible Duplicate",
+                    f"This box overlaps patch {existing['patch_id']} "
+                    f"({existing.get('label') or 'unlabeled'}) with IoU {overlap:.2f}.\n\n"
+                    "Save it anyway?",
+                    QMessageBox.Yes | QMessageBox.No,
+                    QMessageBox.No
+                )
+                if reply != QMessageBox.Yes:
+                    return
+
             label = None
             if self.cfg.labels:
                 dialog = AssignLabelDialog(self.main_window, self.cfg.labels)
@@ -157,31 +422,148 @@ class Controller(QObject):
                     label = dialog.get_selected_label()
                 else:
                     return # User cancelled
-            
-            patch_meta = self.patch_exporter.save_patch(x0, y0, x1, y1, label)
 
-            if patch_meta:
-                self._update_project_patches()
-                self._refresh_overlays()
+            if duplicate and self.cfg.duplicate_action == "merge":
+                self._merge_into_patch(duplicate[1], label, duplicate[0])
+                return
 
-    def _update_project_patches(self):
-        file_path = _normalize_path(self.project.files[self.current_file_index])
-        self.project.patches[file_path] = self.patch_exporter.patches_meta
-        self.project.save()
+            with profiler.span("region"):
+                with profiler.span("save_patch"):
+                    patch_meta = self.patch_exporter.save_patch(x0, y0, x1, y1, label)
+
+                if patch_meta:
+                    with profiler.span("project_write"):
+                        self.project.record_patch_added(self._current_file_path(), patch_meta)
+                    with profiler.span("overlay_add"):
+                        self._add_overlay(patch_meta)
+                        self.main_window.patch_table_view.model.append_patch(patch_meta)
+
+    def _find_duplicate(self, x0, y0, x1, y1):
+        if self.cfg.duplicate_action not in ("warn", "merge"):
+            return None
+        overlaps = self.patch_exporter.find_overlaps(x0, y0, x1, y1, self.cfg.duplicate_iou)
+        return overlaps[0] if overlaps else None
+
+    def _merge_into_patch(self, patch_meta, label, overlap):
+        # Redrawing an existing box keeps the stored patch; only a new label
+        # is carried over to it.
+        if label is not None and label != patch_meta.get("label"):
+            patch_meta["label"] = label
+            self.main_window.patch_table_view.model.patch_changed(patch_meta)
+            self.on_patch_label_changed(patch_meta)
+        self.main_window.update_status(
+            f"Merged into patch {patch_meta['patch_id']} (IoU {overlap:.2f})"
+        )
+
+    @Slot(object)
+    def on_patch_written(self, patch_meta):
+        # Loose layouts' file names were known when the patch was recorded.
+        # Packed layouts add offsets on the writer thread; persist those in
+        # batches rather than once more per patch.
+        if not self.patch_layout.packed:
+            return
+        self._written.append(patch_meta)
+        if not self._written_timer.isActive():
+            self._written_timer.start(WRITE_BACK_MS)
+
+    @Slot()
+    def _record_written(self):
+        written, self._written = self._written, []
+        by_file = {}
+        for patch_meta in written:
+            by_file.setdefault(_normalize_path(patch_meta["fits_path"]), []).append(patch_meta)
+        for file_path, patches in by_file.items():
+            # Skip patches undone or cleared since they were queued.
+            live = {id(p) for p in self.project.get_patches(file_path)}
+            patches = [p for p in patches if id(p) in live]
+            if patches:
+                self.project.record_patches_updated(file_path, patches)
+
+    @Slot(object, str)
+    def on_patch_write_failed(self, patch_meta, message):
+        # The patch was shown optimistically; take it back out everywhere.
+        file_path = _normalize_path(patch_meta["fits_path"])
+        patches = self.project.get_patches(file_path)
+        for i, p in enumerate(patches):
+            if p is patch_meta:
+                del patches[i]
+                break
+        self.patch_layout.remove(patch_meta)
+        if self.patch_exporter:
+            self.patch_exporter.patch_index.remove(patch_meta)
+        self.project.record_patch_removed(file_path, patch_meta)
+        self.main_window.image_view.remove_patch_overlay(patch_meta["patch_id"])
+        self.main_window.patch_table_view.model.remove_patch(patch_meta)
+        self.main_window.update_status(f"Saving patch {patch_meta['patch_id']} failed: {message}")
+
+    def _current_file_path(self):
+        return _normalize_path(self.project.files[self.current_file_index])
 
     @Slot()
     def undo_last_patch(self):
         if self.patch_exporter:
-            self.patch_exporter.undo_last_patch()
-            self._update_project_patches()
-            self._refresh_overlays()
+            patch_meta = self.patch_exporter.undo_last_patch()
+            if patch_meta:
+                self.project.record_patch_removed(self._current_file_path(), patch_meta)
+                self.main_window.image_view.remove_patch_overlay(patch_meta["patch_id"])
+                self.main_window.patch_table_view.model.remove_patch(patch_meta)
+
+    @Slot()
+    def tile_current_file(self):
+        if not self.patch_exporter:
+            return
+        dialog = TileDialog(self.main_window, self.cfg.labels, self.cfg.min_size)
+        if not dialog.exec():
+            return
+        settings = dialog.get_settings()
+        grid = {k: settings[k] for k in ("size", "stride", "max_nan_fraction", "min_std")}
+        count = grid_tile_count(self.fits_image_model.shape, grid)
+        if not count:
+            self.main_window.update_status("The frame is smaller than one tile")
+            return
+        if count > TILE_CONFIRM_COUNT:
+            reply = QMessageBox.question(
+                self.main_window, "Tile Current File",
+                f"This grid has {count} tiles. Cut them all?",
+                QMessageBox.Yes | QMessageBox.No,
+                QMessageBox.No
+            )
+            if reply != QMessageBox.Yes:
+                return
+
+        file_path = self._current_file_path()
+        ids = self.patch_ids.reserve(count)
+        region = {"row": None, "grid": grid, "label": settings["label"]}
+        future = self._tiler.submit(slice_file, self.cfg, file_path, [region], ids, f"tile{ids.start:08d}")
+        future.add_done_callback(lambda f: self.tiles_done.emit(file_path, f))
+        self.main_window.update_status(f"Tiling {os.path.basename(file_path)} into up to {count} tiles...")
+
+    @Slot(str, object)
+    def on_tiles_done(self, file_path, future):
+        try:
+            _, patches = future.result()
+        except Exception as e:
+            self.main_window.update_status(f"Tiling {os.path.basename(file_path)} failed: {e}")
+            return
+        self.patch_journal.add_many(patches)
+        file_patches = self.project.get_patches(file_path)
+        file_patches.extend(patches)
+        self.project.record_patches_added(file_path, patches)
+        if self.patch_exporter and self.patch_exporter.patches_meta is file_patches:
+            for patch_meta in patches:
+                self.patch_exporter.patch_index.add(patch_meta)
+                self._add_overlay(patch_meta)
+        self.main_window.patch_table_view.model.append_patches(patches)
+        self.main_window.update_status(f"Saved {len(patches)} tiles")
 
     @Slot()
     def clear_all_patches(self):
         if self.patch_exporter:
+            removed = list(self.patch_exporter.patches_meta)
             self.patch_exporter.clear_all_patches()
-            self._update_project_patches()
-            self._refresh_overlays()
+            self.project.record_patches_cleared(self._current_file_path())
+            self.main_window.image_view.clear_patches()
+            self.main_window.patch_table_view.model.remove_patches(removed)
 
     @Slot(str)
     def change_stretch_mode(self, mode):
@@ -194,10 +576,7 @@ class Controller(QObject):
         self.cfg.stretch_mode = mode_map.get(mode, "zscale")
         
         if self.fits_image_model:
-            image_data = self.fits_image_model.get_normalized_image_data(
-                stretch_mode=self.cfg.stretch_mode
-            )
-            self.main_window.image_view.set_image(image_data, reset_view=False)
+            self._request_display(self.fits_image_model.fits_path, reset_view=False)
 
 
     @Slot()
@@ -205,6 +584,7 @@ class Controller(QObject):
         dialog = LabelDialog(self.main_window, self.cfg.labels)
         if dialog.exec():
             self.cfg.labels = dialog.get_labels()
+            self.main_window.patch_table_view.set_labels(self.cfg.labels)
             self.project.save()
 
     @Slot()
@@ -215,3 +595,90 @@ class Controller(QObject):
             if new_files:
                 self.project.add_files(new_files)
                 self._update_file_combo() # Refresh file list
+
+    @Slot()
+    def export_project_json(self):
+        path, _ = QFileDialog.getSaveFileName(
+            self.main_window, "Export Project", os.path.join(self.project.directory, "project.json"),
+            "Project Files (*.json)"
+        )
+        if path:
+            self.project.export_json(path)
+            self.main_window.update_status(f"Exported project to {path}")
+
+    @Slot()
+    def export_patches_csv(self):
+        path, _ = QFileDialog.getSaveFileName(
+            self.main_window, "Export Patches", self._patches_csv_path(), "CSV Files (*.csv)"
+        )
+        if path:
+            self.patch_journal.export_csv(path)
+            self.main_window.update_status(f"Exported patches to {path}")
+
+    @Slot()
+    def export_array_store(self):
+        directory = QFileDialog.getExistingDirectory(
+            self.main_window, "Export Array Store", os.path.join(self.project.directory, "export")
+        )
+        if not directory:
+            return
+        self.patch_writer.drain()
+        # The project is the record of which patches exist; the worker gets
+        # a snapshot so edits made during the export do not race it.
+        patches = [dict(p) for file_patches in self.project.patches.values() for p in file_patches]
+        future = self._exporter.submit(self._export_store, directory, patches)
+        future.add_done_callback(lambda f: self.store_exported.emit(directory, f))
+        self.main_window.update_status(f"Exporting {len(patches)} patches to {directory}...")
+
+    def _export_store(self, directory, patches):
+        store = ArrayStore(directory, (self.cfg.store_shape, self.cfg.store_shape), self.cfg.store_mode)
+        return store, export_patches(store, self.cfg.out_dir, patches)
+
+    @Slot(str, object)
+    def on_store_exported(self, directory, future):
+        try:
+            store, added = future.result()
+        except Exception as e:
+            self.main_window.update_status(f"Array store export to {directory} failed: {e}")
+            return
+        self.main_window.update_status(f"Array store: {added} new patches, {store.count} total in {directory}")
+
+    @Slot(bool)
+    def set_timings_enabled(self, enabled):
+        if enabled:
+            profiler.clear()
+            profiler.enable()
+            self._timing_timer.start()
+        else:
+            profiler.disable()
+            self._timing_timer.stop()
+        self.main_window.timing_label.setVisible(enabled)
+        self._update_timing_label()
+
+    @Slot()
+    def _update_timing_label(self):
+        self.main_window.timing_label.setText(profiler.summary(STATUS_STAGES) or "Recording timings...")
+
+    @Slot()
+    def save_timing_trace(self):
+        path, _ = QFileDialog.getSaveFileName(
+            self.main_window, "Save Timing Trace", os.path.join(self.project.directory, "trace.json"),
+            "Trace Files (*.json)"
+        )
+        if path:
+            count = profiler.write_trace(path)
+            self.main_window.update_status(f"Wrote {count} timing events to {path}")
+
+    @Slot()
+    def convert_project_to_sqlite(self):
+        if isinstance(self.project, SqliteProject):
+            return
+        self.project.save()
+        project = SqliteProject.import_json(self.project.project_file_path)
+        # Keep the live Config object; caches and exporters hold references to it.
+        project.config = self.cfg
+        self.project = project
+        self.main_window.convert_sqlite_action.setEnabled(False)
+        self._populate_patch_table()
+        self.load_current_file()
+        self.main_window.update_status(f"Project now stored in {project.project_file_path}")
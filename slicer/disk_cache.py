@@ -0,0 +1,114 @@
+import os
+import json
+import hashlib
+import logging
+import threading
+from typing import Any, Optional
+
+import numpy as np
+
+from .project import _normalize_path
+
+
+class DiskCache:
+    def __init__(self, directory: str, budget_bytes: int):
+        self.directory = directory
+        self.budget_bytes = budget_bytes
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+        self._total = sum(e.stat().st_size for e in os.scandir(self.directory) if e.is_file())
+
+    def key(self, source_path: str, product: str, hdu: int = 0) -> Optional[str]:
+        try:
+            st = os.stat(source_path)
+        except OSError:
+            return None
+        # Size and mtime are part of the key, so a rewritten source never hits stale entries.
+        ident = f"{_normalize_path(source_path)}|{st.st_size}|{st.st_mtime_ns}|{hdu}|{product}"
+        return hashlib.sha1(ident.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str, ext: str) -> str:
+        return os.path.join(self.directory, key + ext)
+
+    def _touch(self, path: str) -> None:
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+    def get_array(self, source_path: str, product: str, hdu: int = 0, mmap: bool = False) -> Optional[np.ndarray]:
+        key = self.key(source_path, product, hdu)
+        if key is None:
+            return None
+        path = self._path(key, ".npy")
+        try:
+            arr = np.load(path, mmap_mode="r" if mmap else None, allow_pickle=False)
+        except (OSError, ValueError):
+            return None
+        self._touch(path)
+        return arr
+
+    def put_array(self, source_path: str, product: str, arr: np.ndarray, hdu: int = 0) -> None:
+        key = self.key(source_path, product, hdu)
+        if key is not None:
+            self._write(self._path(key, ".npy"), lambda f: np.save(f, arr, allow_pickle=False))
+
+    def get_json(self, source_path: str, product: str, hdu: int = 0) -> Optional[Any]:
+        key = self.key(source_path, product, hdu)
+        if key is None:
+            return None
+        path = self._path(key, ".json")
+        try:
+            with open(path, "r") as f:
+                value = json.load(f)
+        except (OSError, ValueError):
+            return None
+        self._touch(path)
+        return value
+
+    def put_json(self, source_path: str, product: str, value: Any, hdu: int = 0) -> None:
+        key = self.key(source_path, product, hdu)
+        if key is not None:
+            self._write(self._path(key, ".json"), lambda f: f.write(json.dumps(value).encode("utf-8")))
+
+    def _write(self, path: str, writer) -> None:
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            old_size = os.path.getsize(path) if os.path.exists(path) else 0
+            with open(tmp, "wb") as f:
+                writer(f)
+            size = os.path.getsize(tmp)
+            os.replace(tmp, path)
+        except OSError as e:
+            logging.info(f"Disk cache write failed: {e}")
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            return
+        with self._lock:
+            self._total += size - old_size
+            if self._total > self.budget_bytes:
+                self._evict()
+
+    def _evict(self) -> None:
+        entries = []
+        for e in os.scandir(self.directory):
+            if e.is_file() and not e.name.endswith(".tmp"):
+                st = e.stat()
+                entries.append((st.st_mtime, st.st_size, e.path))
+        entries.sort()
+        self._total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if self._total <= self.budget_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self._total -= size
+
+    def clear(self) -> None:
+        with self._lock:
+            for e in os.scandir(self.directory):
+                if e.is_file():
+                    os.remove(e.path)
+            self._total = 0
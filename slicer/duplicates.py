@@ -0,0 +1,188 @@
+import os
+import csv
+import logging
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from astropy.io import fits
+from astropy.wcs.utils import proj_plane_pixel_scales
+from scipy.spatial import cKDTree
+
+from .astropy_importer import WCS
+from .box_index import BoxIndex, iou, patch_box
+from .footprints import radec_to_unit, _chord
+from .models import read_header_summary, open_journal, open_layout
+from .project import Project
+
+REPORT_COLUMNS = [
+    "fits_path", "patch_id", "label", "duplicate_of_path", "duplicate_of_id", "duplicate_of_label", "iou",
+]
+
+
+def _celestial_wcs(path: str) -> Optional[WCS]:
+    try:
+        summary = read_header_summary(path)
+    except Exception as e:
+        logging.info(f"Skipping the WCS of {path}: {e}")
+        return None
+    wcs = WCS(fits.Header.fromstring(summary["header"]))
+    return wcs.celestial if wcs.has_celestial else None
+
+
+def _sky_centre(patch_meta: dict) -> Optional[Tuple[float, float]]:
+    try:
+        return float(patch_meta["ra_deg_cen"]), float(patch_meta["dec_deg_cen"])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def _same_file_pairs(patches: List[Tuple[int, dict]], threshold: float) -> List[Tuple[int, int, float]]:
+    index = BoxIndex()
+    for i, patch_meta in patches:
+        index.insert(i, patch_box(patch_meta))
+    pairs = []
+    for i, _ in patches:
+        box = index.get(i)
+        for j in index.query(box):
+            if j > i:
+                overlap = iou(box, index.get(j))
+                if overlap >= threshold:
+                    pairs.append((i, j, overlap))
+    return pairs
+
+
+def _project_boxes(boxes: np.ndarray, src: WCS, dst: WCS) -> np.ndarray:
+    # Bounding boxes in dst pixels of the src boxes' corners. Boxes are
+    # half-open pixel index ranges, so the corners sit on pixel edges.
+    x = np.stack([boxes[:, 0], boxes[:, 2], boxes[:, 2], boxes[:, 0]], axis=1) - 0.5
+    y = np.stack([boxes[:, 1], boxes[:, 1], boxes[:, 3], boxes[:, 3]], axis=1) - 0.5
+    ra, dec = src.all_pix2world(x.ravel(), y.ravel(), 0)
+    px, py = dst.all_world2pix(ra, dec, 0, quiet=True)
+    px = px.reshape(x.shape) + 0.5
+    py = py.reshape(y.shape) + 0.5
+    return np.stack([px.min(axis=1), py.min(axis=1), px.max(axis=1), py.max(axis=1)], axis=1)
+
+
+def _cross_file_pairs(
+    entries: List[Tuple[str, dict]], wcs: Dict[str, WCS], threshold: float
+) -> List[Tuple[int, int, float]]:
+    # Candidate pairs come from a KD-tree over the patch centres; the IoU is
+    # then taken in the second frame's pixels after mapping the first box
+    # through both WCSs.
+    sky = []
+    for i, (path, patch_meta) in enumerate(entries):
+        centre = _sky_centre(patch_meta)
+        if centre is not None and wcs.get(path) is not None:
+            sky.append((i, centre))
+    if len(sky) < 2:
+        return []
+    ids = np.array([i for i, _ in sky])
+    centres = np.array([c for _, c in sky])
+    scales = {path: float(np.mean(proj_plane_pixel_scales(w))) for path, w in wcs.items() if w is not None}
+    radius = max(
+        0.5 * np.hypot(p["x1"] - p["x0"], p["y1"] - p["y0"]) * scales[path]
+        for path, p in (entries[i] for i in ids)
+    )
+    tree = cKDTree(radec_to_unit(centres[:, 0], centres[:, 1]))
+    candidates = tree.query_pairs(_chord(2.0 * radius), output_type="ndarray")
+
+    groups: Dict[Tuple[str, str], List[Tuple[int, int]]] = {}
+    for a, b in candidates:
+        i, j = int(ids[a]), int(ids[b])
+        if entries[i][0] != entries[j][0]:
+            groups.setdefault((entries[i][0], entries[j][0]), []).append((i, j))
+
+    pairs = []
+    for (src, dst), members in groups.items():
+        boxes = np.array([patch_box(entries[i][1]) for i, _ in members])
+        with np.errstate(invalid="ignore"):
+            projected = _project_boxes(boxes, wcs[src], wcs[dst])
+        for (i, j), box in zip(members, projected):
+            if not np.all(np.isfinite(box)):
+                continue
+            overlap = iou(tuple(box), patch_box(entries[j][1]))
+            if overlap >= threshold:
+                pairs.append((i, j, overlap))
+    return pairs
+
+
+def _age(patch_meta: dict):
+    patch_id = str(patch_meta.get("patch_id", ""))
+    return (patch_meta.get("timestamp") or "", int(patch_id) if patch_id.isdigit() else 0, patch_id)
+
+
+def find_duplicates(project: Project, threshold: float = 0.7, cross_frame: bool = True) -> List[dict]:
+    # Greedy in creation order: a patch is a duplicate when it overlaps an
+    # older patch that is itself kept, so chains of overlaps do not cascade.
+    entries = [(path, p) for path, patches in project.patches.items() for p in patches]
+    by_file: Dict[str, List[Tuple[int, dict]]] = {}
+    for i, (path, patch_meta) in enumerate(entries):
+        by_file.setdefault(path, []).append((i, patch_meta))
+
+    pairs = []
+    for patches in by_file.values():
+        pairs.extend(_same_file_pairs(patches, threshold))
+    if cross_frame:
+        wcs = {path: _celestial_wcs(path) for path in by_file}
+        pairs.extend(_cross_file_pairs(entries, wcs, threshold))
+
+    neighbours: Dict[int, List[Tuple[int, float]]] = {}
+    for i, j, overlap in pairs:
+        neighbours.setdefault(i, []).append((j, overlap))
+        neighbours.setdefault(j, []).append((i, overlap))
+
+    kept = set()
+    duplicates = []
+    for i in sorted(range(len(entries)), key=lambda k: _age(entries[k][1])):
+        matches = [(overlap, j) for j, overlap in neighbours.get(i, ()) if j in kept]
+        if not matches:
+            kept.add(i)
+            continue
+        overlap, j = max(matches)
+        path, patch_meta = entries[i]
+        other_path, other = entries[j]
+        duplicates.append({
+            "fits_path": path,
+            "patch_id": patch_meta["patch_id"],
+            "label": patch_meta.get("label"),
+            "duplicate_of_path": other_path,
+            "duplicate_of_id": other["patch_id"],
+            "duplicate_of_label": other.get("label"),
+            "iou": round(overlap, 4),
+            "patch": patch_meta,
+        })
+    logging.info(f"{len(duplicates)} duplicates among {len(entries)} patches at IoU >= {threshold}")
+    return duplicates
+
+
+def write_report(duplicates: List[dict], report_path: str) -> None:
+    with open(report_path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=REPORT_COLUMNS, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(duplicates)
+
+
+def remove_duplicates(project: Project, duplicates: List[dict]) -> int:
+    cfg = project.config
+    journal = open_journal(cfg, project)
+    layout = open_layout(cfg)
+    by_file: Dict[str, List[dict]] = {}
+    for duplicate in duplicates:
+        by_file.setdefault(duplicate["fits_path"], []).append(duplicate["patch"])
+    removed = []
+    try:
+        for path, doomed in by_file.items():
+            doomed_ids = set(id(p) for p in doomed)
+            patches = project.get_patches(path)
+            gone = [p for p in patches if id(p) in doomed_ids]
+            patches[:] = [p for p in patches if id(p) not in doomed_ids]
+            for patch_meta in gone:
+                layout.remove(patch_meta)
+            project.record_patches_removed(path, gone)
+            removed.extend(gone)
+        journal.delete(removed)
+        journal.export_csv(os.path.join(cfg.out_dir, cfg.csv_name))
+    finally:
+        layout.close()
+    logging.info(f"Removed {len(removed)} duplicate patches")
+    return len(removed)
@@ -0,0 +1,200 @@
+import os
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import numpy as np
+from astropy.io import fits
+
+from .astropy_importer import WCS
+from .models import read_header_summary
+
+FOOTPRINT_FILE_NAME = "footprints.json"
+
+
+def radec_to_unit(ra, dec) -> np.ndarray:
+    ra = np.radians(np.asarray(ra, dtype=float))
+    dec = np.radians(np.asarray(dec, dtype=float))
+    return np.stack([np.cos(dec) * np.cos(ra), np.cos(dec) * np.sin(ra), np.sin(dec)], axis=-1)
+
+
+def _chord(angle_deg) -> float:
+    return 2.0 * np.sin(np.radians(np.minimum(angle_deg, 180.0)) / 2.0)
+
+
+def _tangent_plane(centre: np.ndarray, points: np.ndarray) -> np.ndarray:
+    # Gnomonic projection about `centre`, good enough to test containment in
+    # a single frame's footprint.
+    z = centre / np.linalg.norm(centre)
+    x = np.cross([0.0, 0.0, 1.0], z)
+    if np.linalg.norm(x) < 1e-12:
+        x = np.array([1.0, 0.0, 0.0])
+    x /= np.linalg.norm(x)
+    y = np.cross(z, x)
+    depth = points @ z
+    with np.errstate(divide="ignore", invalid="ignore"):
+        uv = np.stack([points @ x / depth, points @ y / depth], axis=-1)
+    uv[depth <= 0] = np.inf
+    return uv
+
+
+def _inside(polygon: np.ndarray, points: np.ndarray) -> np.ndarray:
+    inside = np.zeros(len(points), dtype=bool)
+    px, py = points[:, 0], points[:, 1]
+    n = len(polygon)
+    for i in range(n):
+        x0, y0 = polygon[i]
+        x1, y1 = polygon[(i + 1) % n]
+        crosses = (y0 > py) != (y1 > py)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            x_at = x0 + (py - y0) * (x1 - x0) / (y1 - y0)
+        inside ^= crosses & (px < x_at)
+    return inside
+
+
+def read_footprint(path: str) -> Optional[dict]:
+    st = os.stat(path)
+    summary = read_header_summary(path)
+    footprint = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "shape": summary["shape"], "corners": None}
+    wcs = WCS(fits.Header.fromstring(summary["header"]))
+    if not wcs.has_celestial:
+        return footprint
+    height, width = summary["shape"]
+    x = np.array([-0.5, width - 0.5, width - 0.5, -0.5, (width - 1) / 2.0])
+    y = np.array([-0.5, -0.5, height - 0.5, height - 0.5, (height - 1) / 2.0])
+    ra, dec = wcs.celestial.all_pix2world(x, y, 0)
+    if not np.all(np.isfinite(ra) & np.isfinite(dec)):
+        return footprint
+    vectors = radec_to_unit(ra, dec)
+    radius = np.degrees(np.arccos(np.clip(vectors[:4] @ vectors[4], -1.0, 1.0))).max()
+    footprint.update(
+        corners=[[float(r), float(d)] for r, d in zip(ra[:4], dec[:4])],
+        centre=[float(ra[4]), float(dec[4])],
+        radius_deg=float(radius),
+    )
+    return footprint
+
+
+class FootprintIndex:
+    # Sky footprints (WCS corners) of every project file, read from headers
+    # only and kept in the project's index directory. A KD-tree over the
+    # frame centres' unit vectors narrows queries before the exact corner test.
+    def __init__(self, index_dir: str, max_workers: int = 8):
+        self.path = os.path.join(index_dir, FOOTPRINT_FILE_NAME)
+        self.max_workers = max_workers
+        self._footprints: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+        self._tree = None
+        self._tree_paths: List[str] = []
+        self._max_radius = 0.0
+        self._load()
+
+    def _load(self) -> None:
+        try:
+            with open(self.path, "r") as f:
+                self._footprints = json.load(f)
+        except (OSError, ValueError):
+            self._footprints = {}
+
+    def _save(self) -> None:
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self._footprints, f)
+        os.replace(tmp, self.path)
+
+    def _stale(self, path: str) -> bool:
+        footprint = self._footprints.get(path)
+        if footprint is None:
+            return True
+        try:
+            st = os.stat(path)
+        except OSError:
+            return False
+        return footprint["size"] != st.st_size or footprint["mtime_ns"] != st.st_mtime_ns
+
+    def update(self, files: List[str]) -> int:
+        with self._lock:
+            stale = [f for f in files if self._stale(f)]
+            if stale:
+                with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="footprint") as pool:
+                    for path, footprint in zip(stale, pool.map(self._read, stale)):
+                        self._footprints[path] = footprint
+                self._save()
+                logging.info(f"Indexed sky footprints of {len(stale)} files")
+            wanted = set(files)
+            if stale or self._tree is None or set(self._tree_paths) != wanted:
+                self._build_tree(files)
+        return len(stale)
+
+    @staticmethod
+    def _read(path: str) -> dict:
+        try:
+            return read_footprint(path)
+        except Exception as e:
+            logging.info(f"Could not read the footprint of {path}: {e}")
+        # Unreadable files get an empty entry with their current size and
+        # mtime, so they are not retried until they change.
+        try:
+            st = os.stat(path)
+            size, mtime_ns = st.st_size, st.st_mtime_ns
+        except OSError:
+            size, mtime_ns = None, None
+        return {"size": size, "mtime_ns": mtime_ns, "shape": None, "corners": None}
+
+    def _build_tree(self, files: List[str]) -> None:
+        paths = [f for f in files if self._footprints.get(f, {}).get("corners")]
+        self._tree_paths = paths
+        if not paths:
+            self._tree = None
+            self._max_radius = 0.0
+            return
+        from scipy.spatial import cKDTree
+        centres = np.array([self._footprints[p]["centre"] for p in paths])
+        self._tree = cKDTree(radec_to_unit(centres[:, 0], centres[:, 1]))
+        self._max_radius = max(self._footprints[p]["radius_deg"] for p in paths)
+
+    def footprint(self, path: str) -> Optional[dict]:
+        return self._footprints.get(path)
+
+    def _contains(self, path: str, points: np.ndarray) -> np.ndarray:
+        footprint = self._footprints[path]
+        corners = radec_to_unit(*np.array(footprint["corners"]).T)
+        centre = radec_to_unit(*footprint["centre"])
+        return _inside(_tangent_plane(centre, corners), _tangent_plane(centre, points))
+
+    def covering(self, ra: float, dec: float) -> List[str]:
+        if self._tree is None:
+            return []
+        point = radec_to_unit(ra, dec)
+        candidates = self._tree.query_ball_point(point, _chord(self._max_radius))
+        return [
+            self._tree_paths[i] for i in sorted(candidates)
+            if self._contains(self._tree_paths[i], point[None, :])[0]
+        ]
+
+    def overlapping(self, path: str) -> List[str]:
+        footprint = self._footprints.get(path)
+        if self._tree is None or not footprint or not footprint.get("corners"):
+            return []
+        corners = radec_to_unit(*np.array(footprint["corners"]).T)
+        centre = radec_to_unit(*footprint["centre"])
+        reach = _chord(footprint["radius_deg"] + self._max_radius)
+        found = []
+        for i in sorted(self._tree.query_ball_point(centre, reach)):
+            other = self._tree_paths[i]
+            if other == path:
+                continue
+            other_fp = self._footprints[other]
+            other_corners = radec_to_unit(*np.array(other_fp["corners"]).T)
+            other_centre = radec_to_unit(*other_fp["centre"])
+            # Corner or centre containment either way; crossing-only overlaps
+            # (a plus-sign arrangement) are not reported.
+            if (
+                self._contains(other, np.vstack([corners, centre])).any()
+                or self._contains(path, np.vstack([other_corners, other_centre])).any()
+            ):
+                found.append(other)
+        return found
@@ -0,0 +1,76 @@
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Optional
+
+from PySide6.QtCore import QObject, Signal
+
+from .cache import ModelCache
+from .profiler import profiler
+
+
+class ImageLoader(QObject):
+    # generation, path, model, preview image, decimation step
+    preview_ready = Signal(int, str, object, object, int)
+    # generation, path, model, display pyramid (full resolution first)
+    image_ready = Signal(int, str, object, object)
+    # generation, path, error message
+    load_failed = Signal(int, str, str)
+
+    def __init__(self, cache: ModelCache, preview_size: int = 1024, parent=None):
+        super().__init__(parent)
+        self.cache = cache
+        self.preview_size = preview_size
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="loader")
+        self._future: Optional[Future] = None
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def request(self, path: str, stretch_mode: str) -> int:
+        with self._lock:
+            self._generation += 1
+            generation = self._generation
+        # A newer request supersedes everything still queued.
+        if self._future is not None:
+            self._future.cancel()
+        self._future = self._executor.submit(self._run, generation, path, stretch_mode)
+        return generation
+
+    def is_stale(self, generation: int) -> bool:
+        return generation != self._generation
+
+    def _run(self, generation: int, path: str, stretch_mode: str) -> None:
+        try:
+            if self.is_stale(generation):
+                return
+            if not self.cache.contains(path, stretch_mode):
+                model = self.cache.get_model(path)
+                if self.is_stale(generation):
+                    return
+                cached = self.cache.get_cached_preview(path, stretch_mode, self.preview_size)
+                if cached is not None:
+                    preview, step = cached
+                else:
+                    with profiler.span("preview", mode=stretch_mode):
+                        preview, step = model.get_preview_image_data(stretch_mode, max_size=self.preview_size)
+                if self.is_stale(generation):
+                    return
+                self.preview_ready.emit(generation, path, model, preview, step)
+            levels = self.cache.get_pyramid(path, stretch_mode)
+            model = self.cache.get_model(path)
+            if self.is_stale(generation):
+                return
+            self.image_ready.emit(generation, path, model, levels)
+        except Exception as e:
+            logging.info(f"Loading {path} failed: {e}")
+            if not self.is_stale(generation):
+                self.load_failed.emit(generation, path, str(e))
+
+    def shutdown(self) -> None:
+        with self._lock:
+            self._generation += 1
+        self._executor.shutdown(wait=True, cancel_futures=True)
@@ -1,183 +1,357 @@
 
 import os
-import csv
 import logging
-from typing import List, Tuple, Optional
+from typing import List, Tuple, Optional, TYPE_CHECKING
 
 import numpy as np
 from astropy.io import fits
-from astropy.nddata import Cutout2D
 from .astropy_importer import WCS
-from astropy.visualization import (
-    ZScaleInterval, AsinhStretch, ImageNormalize,
-    LinearStretch, LogStretch, MinMaxInterval
-)
-from skimage.exposure import equalize_hist
 
-from PIL import Image
+if TYPE_CHECKING:
+    from PIL import Image
+    from .project import Project
 
 from config import Config
 from .processing_utils import compute_integer_bounds, size_ok, in_img_bounds
+from .stretch import StretchEngine
+from .disk_cache import DiskCache
+from .patch_journal import PatchJournal
+from .patch_ids import PatchIdAllocator, scan_max_patch_id
+from .patch_layouts import make_layout
+from .box_index import PatchIndex
+from .profiler import profiler
+
+def _image_hdu_index(hdul: fits.HDUList) -> int:
+    # Same choice as fits.getdata: the primary HDU unless it is empty.
+    return 0 if hdul[0].header.get("NAXIS", 0) > 0 or len(hdul) == 1 else 1
+
+
+def _summarize_header(hdr: fits.Header, hdu_index: int) -> dict:
+    return {
+        "hdu": hdu_index,
+        "naxis": hdr.get("NAXIS", 0),
+        "shape": [hdr.get("NAXIS2", 0), hdr.get("NAXIS1", 0)],
+        "bitpix": hdr.get("BITPIX"),
+        "header": hdr.tostring(),
+    }
+
+
+def read_header_summary(path: str, disk_cache: Optional[DiskCache] = None) -> dict:
+    summary = disk_cache.get_json(path, "header") if disk_cache is not None else None
+    if summary is None:
+        with fits.open(path, memmap=True, lazy_load_hdus=True) as hdul:
+            index = _image_hdu_index(hdul)
+            summary = _summarize_header(hdul[index].header, index)
+        if disk_cache is not None:
+            disk_cache.put_json(path, "header", summary)
+    return summary
+
 
 class FitsImageModel:
-    def __init__(self, fits_path: str):
+    def __init__(self, fits_path: str, memmap: bool = True, disk_cache: Optional[DiskCache] = None):
         self.fits_path = fits_path
-        self.data, self.hdr, self.wcs = self._load_fits_2d(fits_path)
-
-    def _load_fits_2d(self, path: str) -> Tuple[np.ndarray, fits.Header, WCS]:
-        data = fits.getdata(path)
-        if data is None or np.asarray(data).ndim != 2:
-            raise ValueError("Only 2D FITS images supported.")
-        hdr = fits.getheader(path)
-        wcs = WCS(hdr)
-        return np.asarray(data), hdr, wcs
+        self.memmap = memmap
+        self.disk_cache = disk_cache
+        self.hdu_index = 0
+        self._hdul: Optional[fits.HDUList] = None
+        self._hdu = None
+        self._data: Optional[np.ndarray] = None
+        self.hdr, self.wcs = self._load_fits_2d(fits_path)
+        self._header_template: Optional[fits.Header] = None
+        self._fast_headers = False
+        self.stretch = StretchEngine(disk_cache, fits_path, self.hdu_index)
+        if disk_cache is not None and disk_cache.get_json(fits_path, "header") is None:
+            disk_cache.put_json(fits_path, "header", _summarize_header(self.hdr, self.hdu_index))
+
+    def _load_fits_2d(self, path: str) -> Tuple[fits.Header, WCS]:
+        # Open once; the header and WCS come from the same HDU whose pixels
+        # are memory-mapped and only read when `data` is first touched.
+        hdul = fits.open(path, memmap=self.memmap)
+        try:
+            self.hdu_index = _image_hdu_index(hdul)
+            hdu = hdul[self.hdu_index]
+            if not hdu.is_image or len(hdu.shape) != 2:
+                raise ValueError("Only 2D FITS images supported.")
+            hdr = hdu.header
+            wcs = WCS(hdr)
+        except Exception:
+            hdul.close()
+            raise
+
+        self._hdul, self._hdu = hdul, hdu
+        if not self.memmap:
+            self._data = np.asarray(hdu.data)
+            self.close()
+        return hdr, wcs
+
+    @property
+    def data(self) -> np.ndarray:
+        if self._data is None:
+            if self._hdu is None:
+                raise RuntimeError(f"{self.fits_path} is closed.")
+            data = self._hdu.data
+            if data is None:
+                raise ValueError("Only 2D FITS images supported.")
+            self._data = np.asarray(data)
+        return self._data
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        if self._data is not None:
+            return self._data.shape
+        return self._hdu.shape
+
+    def _sliced_wcs_header(self, ix0: int, iy0: int) -> fits.Header:
+        # The same shifted WCS Cutout2D builds for a cutout at (ix0, iy0).
+        hdr_out = self.hdr.copy()
+        wcs = self.wcs.deepcopy()
+        wcs.wcs.crpix -= (ix0, iy0)
+        for k, v in wcs.to_header().items():
+            hdr_out[k] = v
+        return hdr_out
+
+    def _build_header_template(self) -> None:
+        # Every cutout header is the parent header merged with the WCS header,
+        # and only CRPIX depends on the cutout origin. wcslib prints CRPIX with
+        # 14 significant digits; use the template only if shifting it that way
+        # reproduces the sliced-WCS header exactly.
+        self._header_template = self._sliced_wcs_header(0, 0)
+        probe = self._patch_header_from_template(7, 3)
+        self._fast_headers = probe.tostring() == self._sliced_wcs_header(7, 3).tostring()
+        if not self._fast_headers:
+            logging.info(f"Using the sliced-WCS header path for {os.path.basename(self.fits_path)}")
+
+    def _patch_header_from_template(self, ix0: int, iy0: int) -> fits.Header:
+        hdr_out = self._header_template.copy()
+        crpix = self.wcs.wcs.crpix
+        hdr_out["CRPIX1"] = float(f"{crpix[0] - ix0:.14G}")
+        hdr_out["CRPIX2"] = float(f"{crpix[1] - iy0:.14G}")
+        return hdr_out
+
+    def patch_header(self, ix0: int, iy0: int) -> fits.Header:
+        if self._header_template is None:
+            self._build_header_template()
+        if self._fast_headers:
+            return self._patch_header_from_template(ix0, iy0)
+        return self._sliced_wcs_header(ix0, iy0)
+
+    def sky_centres(self, x: np.ndarray, y: np.ndarray) -> Tuple[list, list]:
+        # One vectorized WCS call for many pixel positions; "" where there is
+        # no equatorial sky position, as before.
+        blank = [""] * len(x)
+        if not self.wcs.has_celestial:
+            return blank, blank
+        try:
+            coords = self.wcs.pixel_to_world(x, y)
+        except Exception as e:
+            logging.info(f"Sky centre lookup failed: {e}")
+            return blank, blank
+        ra = getattr(coords, "ra", None)
+        dec = getattr(coords, "dec", None)
+        if ra is None or dec is None:
+            return blank, blank
+        return list(np.atleast_1d(ra.deg)), list(np.atleast_1d(dec.deg))
+
+    def close(self) -> None:
+        if self._hdul is not None:
+            self._hdul.close()
+        self._hdul = None
+        self._hdu = None
+        if self.memmap:
+            self._data = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def get_display_image(self, stretch_mode: str = "zscale") -> np.ndarray:
+        return self.stretch.render(self.data, stretch_mode)
 
     def get_normalized_image_data(self, stretch_mode: str = "zscale") -> np.ndarray:
-        data_for_norm = np.nan_to_num(self.data)
-
-        if stretch_mode == "histeq":
-            img_min, img_max = np.min(data_for_norm), np.max(data_for_norm)
-            if img_max > img_min:
-                data_for_norm = (data_for_norm - img_min) / (img_max - img_min)
-            return equalize_hist(data_for_norm)
-
-        stretch = AsinhStretch()
-        interval = ZScaleInterval()
-
-        if stretch_mode == "linear":
-            stretch = LinearStretch()
-            interval = MinMaxInterval()
-        elif stretch_mode == "log":
-            stretch = LogStretch()
-            interval = MinMaxInterval()
-
-        norm = ImageNormalize(data_for_norm, interval=interval, stretch=stretch)
-        normalized_data = norm(data_for_norm)
-        
-        if hasattr(normalized_data, 'filled'):
-            normalized_data = normalized_data.filled(0)
-            
-        return normalized_data
+        return self.get_display_image(stretch_mode).astype(np.float32) / 255.0
+
+    def get_preview_image_data(self, stretch_mode: str = "zscale", max_size: int = 1024) -> Tuple[np.ndarray, int]:
+        step = max(1, int(np.ceil(max(self.shape) / max_size)))
+        sample = np.asarray(self.data[::step, ::step])
+        # Use the full-frame statistics once known; until then the sample's own are close enough.
+        cache = step == 1 or self.stretch.is_prepared(stretch_mode)
+        return self.stretch.render(sample, stretch_mode, cache=cache), step
+
+def open_journal(cfg: Config, project: "Project") -> PatchJournal:
+    def seed():
+        return [p for patches in project.patches.values() for p in patches]
+
+    os.makedirs(cfg.out_dir, exist_ok=True)
+    return PatchJournal(os.path.join(cfg.out_dir, cfg.journal_name), seed=seed)
+
+
+def open_patch_ids(cfg: Config, journal: PatchJournal) -> PatchIdAllocator:
+    def seed() -> int:
+        # One-off scan for projects created before the allocator existed.
+        ids = [int(p) for _, p in journal.materialize() if str(p).isdigit()]
+        return max(ids + [scan_max_patch_id(cfg.out_dir)])
+
+    os.makedirs(cfg.out_dir, exist_ok=True)
+    return PatchIdAllocator(
+        os.path.join(cfg.out_dir, cfg.patch_id_state_name),
+        block_size=cfg.patch_id_block_size,
+        seed=seed,
+    )
+
+
+def open_layout(cfg: Config, prefix: str = "shard"):
+    os.makedirs(cfg.out_dir, exist_ok=True)
+    return make_layout(
+        cfg.output_layout,
+        cfg.out_dir,
+        fanout=cfg.shard_fanout,
+        max_patches=cfg.shard_max_patches,
+        max_bytes=cfg.shard_max_mb * 1024 * 1024,
+        prefix=prefix,
+    )
+
 
 class PatchExporter:
-    def __init__(self, cfg: Config, fits_image_model: FitsImageModel):
+    def __init__(
+        self,
+        cfg: Config,
+        fits_image_model: FitsImageModel,
+        journal: Optional[PatchJournal] = None,
+        patch_ids: Optional[PatchIdAllocator] = None,
+        layout=None,
+        writer=None,
+    ):
         self.cfg = cfg
         self.fits_image_model = fits_image_model
         self.out_dir = self._ensure_out_dir()
         self.csv_path = os.path.join(self.out_dir, self.cfg.csv_name)
-        self._csv_init_if_needed()
-        self.counter = self._next_patch_index()
+        self.journal = journal or open_journal(self.cfg)
+        self.patch_ids = patch_ids or open_patch_ids(self.cfg, self.journal)
+        self.layout = layout or open_layout(self.cfg)
+        self.writer = writer
         self.patches_meta: List[dict] = []
 
+    @property
+    def patches_meta(self) -> List[dict]:
+        return self._patches_meta
+
+    @patches_meta.setter
+    def patches_meta(self, patches: List[dict]) -> None:
+        self._patches_meta = patches
+        self.patch_index = PatchIndex(patches)
+
     def _ensure_out_dir(self) -> str:
         if os.path.exists(self.cfg.out_dir) and not os.path.isdir(self.cfg.out_dir):
             raise RuntimeError(f"{self.cfg.out_dir} exists and is not a directory.")
         os.makedirs(self.cfg.out_dir, exist_ok=True)
         return self.cfg.out_dir
 
-    def _csv_init_if_needed(self) -> None:
-        if not os.path.exists(self.csv_path):
-            with open(self.csv_path, "w", newline="") as f:
-                w = csv.writer(f)
-                w.writerow(
-                    [
-                        "patch_id",
-                        "timestamp",
-                        "fits_path",
-                        "x0",
-                        "y0",
-                        "x1",
-                        "y1",
-                        "width",
-                        "height",
-                        "ra_deg_cen",
-                        "dec_deg_cen",
-                        "label",
-                    ]
-                )
-
-    def _next_patch_index(self) -> int:
-        nums = []
-        for f in os.listdir(self.out_dir):
-            if f.startswith("patch_") and f.endswith(".fits"):
-                try:
-                    nums.append(int(f.split("_")[1].split(".")[0]))
-                except Exception:
-                    pass
-        return (max(nums) + 1) if nums else 1
-
     def save_patch(self, xmin: float, ymin: float, xmax: float, ymax: float, label: str = None) -> Optional[dict]:
-        ix0, iy0, ix1, iy1 = compute_integer_bounds(xmin, ymin, xmax, ymax)
-        if not size_ok(ix0, iy0, ix1, iy1, self.cfg):
-            return None
-        if not in_img_bounds(ix0, iy0, ix1, iy1, self.fits_image_model.data.shape):
-            return None
-
+        return self.save_patches([(xmin, ymin, xmax, ymax)], [label])[0]
+
+    def save_patches(self, boxes, labels) -> List[Optional[dict]]:
+        results: List[Optional[dict]] = [None] * len(boxes)
+        accepted = []
+        for i, (xmin, ymin, xmax, ymax) in enumerate(boxes):
+            ix0, iy0, ix1, iy1 = compute_integer_bounds(xmin, ymin, xmax, ymax)
+            if not size_ok(ix0, iy0, ix1, iy1, self.cfg):
+                continue
+            if not in_img_bounds(ix0, iy0, ix1, iy1, self.fits_image_model.shape):
+                continue
+            accepted.append((i, ix0, iy0, ix1, iy1))
+        if not accepted:
+            return results
+
+        bounds = np.array([a[1:] for a in accepted], dtype=float)
+        with profiler.span("sky_centre", patches=len(accepted)):
+            ras, decs = self.fits_image_model.sky_centres(
+                (bounds[:, 0] + bounds[:, 2]) / 2.0, (bounds[:, 1] + bounds[:, 3]) / 2.0
+            )
+        for (i, ix0, iy0, ix1, iy1), ra, dec in zip(accepted, ras, decs):
+            results[i] = self._save_one(ix0, iy0, ix1, iy1, labels[i], ra, dec)
+        return results
+
+    def find_overlaps(self, xmin: float, ymin: float, xmax: float, ymax: float, threshold: float) -> List[Tuple[float, dict]]:
+        box = compute_integer_bounds(xmin, ymin, xmax, ymax)
+        return self.patch_index.overlaps(box, threshold)
+
+    def _save_one(self, ix0: int, iy0: int, ix1: int, iy1: int, label: Optional[str], ra, dec) -> Optional[dict]:
         w, h = ix1 - ix0, iy1 - iy0
+        # Everything the write needs from the model is taken here, on the
+        # caller's thread; the model may be closed before a queued write runs.
         try:
-            cut = self._make_cutout(ix0, iy0, ix1, iy1)
+            with profiler.span("cutout"):
+                cut = self._make_cutout(ix0, iy0, ix1, iy1)
+            with profiler.span("patch_header"):
+                header = self._make_patch_header(ix0, iy0, ix1, iy1)
         except Exception as e:
             logging.info(f"Cutout failed: {e}")
             return None
+        dtype = self.fits_image_model.data.dtype
 
-        patch_id = f"{self.counter:04d}"
-        self._save_fits_patch(cut, patch_id, ix0, iy0, ix1, iy1)
-
-        if self.cfg.png_preview:
-            self._save_png_preview(cut, patch_id)
-
-        patch_meta = self._get_patch_metadata(cut, patch_id, ix0, iy0, ix1, iy1, w, h, label)
-        self._append_csv(patch_meta)
+        patch_id = f"{self.patch_ids.allocate():04d}"
+        patch_meta = self._get_patch_metadata(patch_id, ix0, iy0, ix1, iy1, w, h, label, ra, dec)
+        location = self.layout.location(patch_id, label, self._previews())
+        if location:
+            patch_meta.update(location)
         self.patches_meta.append(patch_meta)
-
-        self.counter += 1
-        logging.info(
-            f"Saved patch {patch_id}: {w}x{h} @ x=[{ix0}:{ix1}) y=[{iy0}:{iy1})"
-        )
+        self.patch_index.add(patch_meta)
+
+        def write():
+            self._write_patch(cut, header, dtype, patch_meta)
+            logging.info(
+                f"Saved patch {patch_id}: {w}x{h} @ x=[{ix0}:{ix1}) y=[{iy0}:{iy1})"
+            )
+
+        if self.writer is not None:
+            self.writer.submit(patch_meta, write)
+        else:
+            write()
+            with profiler.span("journal", patches=1):
+                self.journal.add(patch_meta)
         return patch_meta
 
-    def _make_cutout(self, ix0: int, iy0: int, ix1: int, iy1: int) -> Cutout2D:
-        w, h = ix1 - ix0, iy1 - iy0
-        position = (ix0 + w / 2.0, iy0 + h / 2.0)
-        size = (h, w)
-        return Cutout2D(
-            self.fits_image_model.data,
-            position=position,
-            size=size,
-            wcs=self.fits_image_model.wcs,
-            mode="partial",
-        )
-
-    def _save_fits_patch(self, cut: Cutout2D, patch_id: str, ix0: int, iy0: int, ix1: int, iy1: int) -> None:
-        base = f"patch_{patch_id}"
-        fits_out = os.path.join(self.out_dir, base + ".fits")
-        hdr_out = self.fits_image_model.hdr.copy()
-        for k, v in cut.wcs.to_header().items():
-            hdr_out[k] = v
+    def _write_patch(self, cut: np.ndarray, header: fits.Header, dtype: np.dtype, patch_meta: dict) -> None:
+        with profiler.span("fits_hdu"):
+            hdu = fits.PrimaryHDU(data=cut.astype(dtype, copy=False), header=header)
+        preview = None
+        if self._previews():
+            with profiler.span("png"):
+                preview = self._make_png_preview(cut)
+        with profiler.span("layout_write"):
+            patch_meta.update(self.layout.write(patch_meta["patch_id"], patch_meta["label"], hdu, preview))
+        if preview is None:
+            patch_meta.pop("png_file", None)
+
+    def _previews(self) -> bool:
+        return self.cfg.png_preview and self.layout.previews
+
+    def _make_cutout(self, ix0: int, iy0: int, ix1: int, iy1: int) -> np.ndarray:
+        # Bounds are already checked, so this is a plain view; the background
+        # writer gets its own copy since the memmap may be closed under it.
+        cut = self.fits_image_model.data[iy0:iy1, ix0:ix1]
+        return np.array(cut) if self.writer is not None else cut
+
+    def _make_patch_header(self, ix0: int, iy0: int, ix1: int, iy1: int) -> fits.Header:
+        hdr_out = self.fits_image_model.patch_header(ix0, iy0)
         hdr_out["HISTORY"] = f"Cutout from {os.path.basename(self.fits_image_model.fits_path)} x=[{ix0}:{ix1}) y=[{iy0}:{iy1})"
-        fits.PrimaryHDU(
-            data=cut.data.astype(self.fits_image_model.data.dtype, copy=False),
-            header=hdr_out,
-        ).writeto(fits_out, overwrite=True)
+        return hdr_out
 
-    def _save_png_preview(self, cut: Cutout2D, patch_id: str) -> None:
+    def _make_png_preview(self, cut: np.ndarray) -> Optional["Image.Image"]:
+        from astropy.visualization import ZScaleInterval, AsinhStretch, ImageNormalize
+        from PIL import Image
         try:
-            norm = ImageNormalize(cut.data, interval=ZScaleInterval(), stretch=AsinhStretch())
-            arr = norm(cut.data)
+            norm = ImageNormalize(cut, interval=ZScaleInterval(), stretch=AsinhStretch())
+            arr = norm(cut)
             arr = (arr * 255).astype(np.uint8)
-            img = Image.fromarray(arr, mode='L')
-            img.save(os.path.join(self.out_dir, f"patch_{patch_id}.png"))
+            return Image.fromarray(arr, mode='L')
         except Exception as e:
             logging.info(f"Preview export failed: {e}")
+            return None
 
-    def _get_patch_metadata(self, cut: Cutout2D, patch_id: str, ix0: int, iy0: int, ix1: int, iy1: int, w: int, h: int, label: str = None) -> dict:
-        cx = cut.data.shape[1] / 2.0
-        cy = cut.data.shape[0] / 2.0
-        wc_center = cut.wcs.pixel_to_world(cx, cy)
-        ra = getattr(wc_center, "ra", None)
-        dec = getattr(wc_center, "dec", None)
-        ra_deg = getattr(ra, "deg", "") if ra is not None else ""
-        dec_deg = getattr(dec, "deg", "") if dec is not None else ""
+    def _get_patch_metadata(self, patch_id: str, ix0: int, iy0: int, ix1: int, iy1: int, w: int, h: int, label: str = None, ra_deg="", dec_deg="") -> dict:
         timestamp = np.datetime64("now").astype(str)
         
         return {
@@ -195,55 +369,28 @@ class PatchExporter:
             "label": label,
         }
 
-    def _append_csv(self, patch_meta: dict) -> None:
-        with open(self.csv_path, "a", newline="") as f:
-            csv.writer(f).writerow(patch_meta.values())
-
-    def undo_last_patch(self) -> None:
+    def undo_last_patch(self) -> Optional[dict]:
         if not self.patches_meta:
-            return
+            return None
 
+        if self.writer is not None:
+            self.writer.drain()
         last_patch = self.patches_meta.pop()
+        self.patch_index.remove(last_patch)
         patch_id = last_patch["patch_id"]
 
-        # Remove patch files
-        base = f"patch_{patch_id}"
-        fits_out = os.path.join(self.out_dir, base + ".fits")
-        png_out = os.path.join(self.out_dir, base + ".png")
-        if os.path.exists(fits_out):
-            os.remove(fits_out)
-        if os.path.exists(png_out):
-            os.remove(png_out)
-
-        # Rewrite CSV without the last patch
-        all_patches = []
-        with open(self.csv_path, "r", newline="") as f:
-            reader = csv.reader(f)
-            header = next(reader)
-            all_patches.append(header)
-            for row in reader:
-                if row[0] != patch_id:
-                    all_patches.append(row)
-
-        with open(self.csv_path, "w", newline="") as f:
-            writer = csv.writer(f)
-            writer.writerows(all_patches)
-
-        self.counter -= 1
+        self.layout.remove(last_patch)
+        self.journal.delete([last_patch])
         logging.info(f"Undid patch {patch_id}")
+        return last_patch
 
     def clear_all_patches(self) -> None:
+        if self.writer is not None:
+            self.writer.drain()
         for patch in self.patches_meta:
-            patch_id = patch["patch_id"]
-            base = f"patch_{patch_id}"
-            fits_out = os.path.join(self.out_dir, base + ".fits")
-            png_out = os.path.join(self.out_dir, base + ".png")
-            if os.path.exists(fits_out):
-                os.remove(fits_out)
-            if os.path.exists(png_out):
-                os.remove(png_out)
-
-        self.patches_meta = []
-        self._csv_init_if_needed()  # This will effectively clear the CSV
-        self.counter = 1
+            self.layout.remove(patch)
+
+        self.journal.delete(self.patches_meta)
+        self.patches_meta.clear()
+        self.patch_index.clear()
         logging.info("Cleared all patches")
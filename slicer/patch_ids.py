@@ -0,0 +1,113 @@
+import os
+import re
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+if os.name == "nt":
+    import msvcrt
+else:
+    import fcntl
+
+_PATCH_FILE_RE = re.compile(r"^patch_(\d+)\.fits$")
+
+
+def scan_max_patch_id(out_dir: str) -> int:
+    max_id = 0
+    if not os.path.isdir(out_dir):
+        return max_id
+    with os.scandir(out_dir) as entries:
+        for entry in entries:
+            m = _PATCH_FILE_RE.match(entry.name)
+            if m:
+                max_id = max(max_id, int(m.group(1)))
+    return max_id
+
+
+class PatchIdAllocator:
+    # Hands out monotonically increasing patch IDs. The state file holds a
+    # high-water mark reserved one block ahead, so it is written once per
+    # block rather than once per patch; IDs below the mark are never reissued,
+    # even after undo, clear or a crash. Several allocators (the GUI and a
+    # batch run) may share the state file; blocks are taken under a file lock.
+    def __init__(self, path: str, block_size: int = 256, seed: Optional[Callable[[], int]] = None):
+        self.path = path
+        self.block_size = block_size
+        self._lock = threading.Lock()
+        with self._file_lock():
+            ceiling = self._read()
+            if ceiling is None:
+                ceiling = (seed() if seed else 0) + 1
+                self._write(ceiling)
+                logging.info(f"Initialized patch ID allocator at {ceiling} in {self.path}")
+        self._next = ceiling
+        self._ceiling = ceiling
+
+    @contextmanager
+    def _file_lock(self):
+        with open(self.path + ".lock", "a+") as f:
+            if os.name == "nt":
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            else:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if os.name == "nt":
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+                else:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    def _read(self) -> Optional[int]:
+        try:
+            with open(self.path, "r") as f:
+                return int(f.read().strip())
+        except (OSError, ValueError):
+            return None
+
+    def _write(self, value: int) -> None:
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            f.write(f"{value}\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+
+    @property
+    def next_id(self) -> int:
+        return self._next
+
+    def allocate(self) -> int:
+        return self.reserve(1).start
+
+    def reserve(self, count: int) -> range:
+        if count < 1:
+            raise ValueError("count must be positive")
+        with self._lock:
+            start = self._next
+            end = start + count
+            if end > self._ceiling:
+                with self._file_lock():
+                    on_disk = self._read() or 0
+                    if on_disk > self._ceiling:
+                        # Another allocator reserved past our block; the
+                        # rest of ours is skipped and we continue after it.
+                        start = on_disk
+                        end = start + count
+                    self._ceiling = end + self.block_size
+                    self._write(self._ceiling)
+            self._next = end
+        return range(start, end)
+
+
+class ReservedIds:
+    # Allocator over a block reserved up front, for worker processes that
+    # must not touch the shared state file.
+    def __init__(self, ids: range):
+        self._ids = iter(ids)
+
+    def allocate(self) -> int:
+        return next(self._ids)
@@ -0,0 +1,196 @@
+import os
+import csv
+import json
+import logging
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+CSV_COLUMNS = [
+    "patch_id",
+    "timestamp",
+    "fits_path",
+    "x0",
+    "y0",
+    "x1",
+    "y1",
+    "width",
+    "height",
+    "ra_deg_cen",
+    "dec_deg_cen",
+    "label",
+]
+
+
+def _jsonable(value):
+    if hasattr(value, "item"):
+        return value.item()
+    return str(value)
+
+
+def _key(fits_path, patch_id) -> Tuple[str, str]:
+    return fits_path, patch_id
+
+
+class PatchJournal:
+    # Append-only log of patch adds, relabels and deletes (tombstones).
+    # Replaying it yields the live patch set; compaction rewrites it as adds only.
+    # A missing journal is seeded from `seed`, the project's own patches; the
+    # CSV next to it is only ever an export.
+    def __init__(self, path: str, seed: Optional[Callable[[], Iterable[dict]]] = None):
+        self.path = path
+        self._lock = threading.Lock()
+        self._records = 0
+        self._live = 0
+        self._compactor: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        if not os.path.exists(self.path) and seed is not None:
+            self._seed(seed())
+        self._count()
+
+    def _count(self) -> None:
+        self._records = 0
+        if os.path.exists(self.path):
+            with open(self.path, "rb") as f:
+                self._records = sum(1 for _ in f)
+                torn = False
+                if f.seek(0, os.SEEK_END) > 0:
+                    f.seek(-1, os.SEEK_END)
+                    torn = f.read(1) != b"\n"
+            if torn:
+                # Terminate a torn record so the next append starts on its own line.
+                with open(self.path, "a") as f:
+                    f.write("\n")
+        self._live = len(self.materialize())
+
+    def _seed(self, patches: Iterable[dict]) -> None:
+        tmp = self.path + ".tmp"
+        count = 0
+        with open(tmp, "w") as f:
+            for patch in patches:
+                f.write(json.dumps({"op": "add", "patch": patch}, default=_jsonable) + "\n")
+                count += 1
+        os.replace(tmp, self.path)
+        logging.info(f"Seeded {self.path} with {count} patches from the project")
+
+    def _append(self, records: List[dict]) -> None:
+        if not records:
+            return
+        data = "".join(json.dumps(r, default=_jsonable) + "\n" for r in records)
+        with self._lock:
+            with open(self.path, "a") as f:
+                f.write(data)
+            self._records += len(records)
+
+    def add(self, patch_meta: dict) -> None:
+        self.add_many([patch_meta])
+
+    def add_many(self, patches: List[dict]) -> None:
+        self._append([{"op": "add", "patch": p} for p in patches])
+        self._live += len(patches)
+
+    def relabel(self, patch_meta: dict) -> None:
+        self._append([{
+            "op": "relabel",
+            "fits_path": patch_meta["fits_path"],
+            "patch_id": patch_meta["patch_id"],
+            "label": patch_meta.get("label"),
+        }])
+
+    def delete(self, patches: List[dict]) -> None:
+        self._append([
+            {"op": "delete", "fits_path": p["fits_path"], "patch_id": p["patch_id"]}
+            for p in patches
+        ])
+        self._live = max(self._live - len(patches), 0)
+
+    def _replay(self) -> Dict[Tuple[str, str], dict]:
+        live: Dict[Tuple[str, str], dict] = {}
+        if not os.path.exists(self.path):
+            return live
+        with open(self.path, "r") as f:
+            lines = f.readlines()
+        for line in lines:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # A torn last line from a crash mid-append; everything before it is intact.
+                continue
+            op = record.get("op")
+            if op == "add":
+                patch = record["patch"]
+                live[_key(patch.get("fits_path"), patch.get("patch_id"))] = patch
+            elif op == "relabel":
+                patch = live.get(_key(record["fits_path"], record["patch_id"]))
+                if patch is not None:
+                    patch["label"] = record["label"]
+            elif op == "delete":
+                live.pop(_key(record["fits_path"], record["patch_id"]), None)
+        return live
+
+    def materialize(self) -> Dict[Tuple[str, str], dict]:
+        with self._lock:
+            return self._replay()
+
+    def needs_compaction(self) -> bool:
+        return self._records > 1000 and self._records > 2 * self._live
+
+    def compact(self) -> None:
+        tmp = self.path + ".tmp"
+        with self._lock:
+            live = self._replay()
+            with open(tmp, "w") as f:
+                for patch in live.values():
+                    f.write(json.dumps({"op": "add", "patch": patch}, default=_jsonable) + "\n")
+            os.replace(tmp, self.path)
+            self._records = len(live)
+            self._live = len(live)
+        logging.info(f"Compacted {self.path} to {len(live)} patches")
+
+    def export_csv(self, csv_path: str) -> None:
+        live = self.materialize()
+        tmp = csv_path + ".tmp"
+        with open(tmp, "w", newline="") as f:
+            w = csv.writer(f)
+            w.writerow(CSV_COLUMNS)
+            for patch in live.values():
+                w.writerow([patch.get(col, "") for col in CSV_COLUMNS])
+        os.replace(tmp, csv_path)
+
+    def export_columns(self, npz_path: str) -> None:
+        live = list(self.materialize().values())
+        columns = {}
+        for col in CSV_COLUMNS:
+            values = [p.get(col) for p in live]
+            if col in ("x0", "y0", "x1", "y1", "width", "height"):
+                columns[col] = np.asarray([int(v) for v in values], dtype=np.int64)
+            elif col in ("ra_deg_cen", "dec_deg_cen"):
+                columns[col] = np.asarray([float(v) if v not in ("", None) else np.nan for v in values])
+            else:
+                columns[col] = np.asarray(["" if v is None else str(v) for v in values])
+        np.savez(npz_path, **columns)
+
+    def start_compactor(self, interval: float = 30.0, csv_path: Optional[str] = None) -> None:
+        if self._compactor is not None:
+            return
+
+        def run():
+            while not self._stop.wait(interval):
+                try:
+                    if self.needs_compaction():
+                        self.compact()
+                        if csv_path:
+                            self.export_csv(csv_path)
+                except OSError as e:
+                    logging.info(f"Journal compaction failed: {e}")
+
+        self._stop.clear()
+        self._compactor = threading.Thread(target=run, name="journal-compactor", daemon=True)
+        self._compactor.start()
+
+    def stop_compactor(self) -> None:
+        self._stop.set()
+        if self._compactor is not None:
+            self._compactor.join()
+            self._compactor = None
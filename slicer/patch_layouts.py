@@ -0,0 +1,295 @@
+import io
+import os
+import re
+import json
+import hashlib
+import logging
+import tarfile
+import threading
+from abc import ABC, abstractmethod
+from typing import Optional, TYPE_CHECKING
+
+from astropy.io import fits
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+LAYOUTS = ["flat", "hash", "label", "tar", "mef"]
+
+_FITS_BLOCK = 2880
+_TAR_BLOCK = tarfile.BLOCKSIZE
+
+
+def _png_bytes(preview: "Image.Image") -> bytes:
+    buf = io.BytesIO()
+    preview.save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def _fits_bytes(hdul: fits.HDUList) -> bytes:
+    buf = io.BytesIO()
+    hdul.writeto(buf)
+    return buf.getvalue()
+
+
+class LooseLayout:
+    # One .fits (and optional .png) per patch under out_dir/<subdir>.
+    packed = False
+    previews = True
+
+    def __init__(self, out_dir: str):
+        self.out_dir = out_dir
+
+    def subdir(self, patch_id: str, label: Optional[str]) -> str:
+        return ""
+
+    def location(self, patch_id: str, label: Optional[str], preview: bool) -> Optional[dict]:
+        # Known before the write, so a patch is recorded with its files.
+        subdir = self.subdir(patch_id, label)
+        out_dir = os.path.abspath(self.out_dir)
+        if os.path.commonpath([out_dir, os.path.abspath(os.path.join(out_dir, subdir))]) != out_dir:
+            raise ValueError(f"Patch directory {subdir!r} is outside {self.out_dir}")
+        base = f"patch_{patch_id}"
+        location = {"file": os.path.join(subdir, base + ".fits").replace(os.sep, "/")}
+        if preview:
+            location["png_file"] = os.path.join(subdir, base + ".png").replace(os.sep, "/")
+        return location
+
+    def write(self, patch_id: str, label: Optional[str], hdu: fits.PrimaryHDU, preview: Optional["Image.Image"]) -> dict:
+        location = self.location(patch_id, label, preview is not None)
+        os.makedirs(os.path.dirname(os.path.join(self.out_dir, location["file"])), exist_ok=True)
+        hdu.writeto(os.path.join(self.out_dir, location["file"]), overwrite=True)
+        if preview is not None:
+            preview.save(os.path.join(self.out_dir, location["png_file"]))
+        return location
+
+    def remove(self, patch_meta: dict) -> None:
+        base = f"patch_{patch_meta['patch_id']}"
+        for key, default in (("file", base + ".fits"), ("png_file", base + ".png")):
+            path = os.path.join(self.out_dir, patch_meta.get(key) or default)
+            if os.path.exists(path):
+                os.remove(path)
+
+    def close(self) -> None:
+        pass
+
+
+class HashShardedLayout(LooseLayout):
+    def __init__(self, out_dir: str, fanout: int = 256):
+        super().__init__(out_dir)
+        self.fanout = fanout
+        self._width = len(f"{fanout - 1:x}")
+
+    def subdir(self, patch_id: str, label: Optional[str]) -> str:
+        h = int(hashlib.md5(patch_id.encode()).hexdigest()[:8], 16) % self.fanout
+        return f"{h:0{self._width}x}"
+
+
+class LabelShardedLayout(LooseLayout):
+    # Sharded by the label at save time; relabelling does not move files,
+    # the patch metadata keeps pointing at where the file actually is.
+    def subdir(self, patch_id: str, label: Optional[str]) -> str:
+        if not label:
+            return "unlabeled"
+        # Dots stay inside a name but a label cannot become "." or "..".
+        return re.sub(r"[^\w.-]", "_", label).strip(".") or "_"
+
+
+class _PackedLayout(ABC):
+    # Appends patches to numbered shard files under out_dir/shards, rolling
+    # over at max_patches or max_bytes. Each shard has a .idx JSON-lines
+    # sidecar of (patch_id, member, offset, nbytes); the same location is
+    # stored in the patch metadata so a patch is one seek + read away.
+    # Undo and clear only drop the metadata; shard bytes stay until rebuilt.
+    packed = True
+    previews = True
+    suffix = ""
+
+    def __init__(self, out_dir: str, max_patches: int = 10000, max_bytes: int = 1 << 30, prefix: str = "shard"):
+        self.out_dir = out_dir
+        self.shard_dir = os.path.join(out_dir, "shards")
+        self.prefix = prefix
+        self.max_patches = max_patches
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._shard = -1
+        self._count = 0
+        self._size = 0
+        os.makedirs(self.shard_dir, exist_ok=True)
+        self._resume()
+
+    def shard_path(self, shard: int) -> str:
+        return os.path.join(self.shard_dir, f"{self.prefix}_{shard:05d}{self.suffix}")
+
+    def _resume(self) -> None:
+        pattern = re.compile(rf"^{re.escape(self.prefix)}_(\d+){re.escape(self.suffix)}$")
+        shards = sorted(
+            int(m.group(1)) for m in map(pattern.match, os.listdir(self.shard_dir)) if m
+        )
+        if not shards:
+            return
+        self._shard = shards[-1]
+        idx = self.shard_path(self._shard) + ".idx"
+        if os.path.exists(idx):
+            with open(idx, "r") as f:
+                self._count = len({json.loads(line)["patch_id"] for line in f if line.strip()})
+        self._size = os.path.getsize(self.shard_path(self._shard))
+        self._open_existing(self.shard_path(self._shard))
+
+    def _roll(self) -> None:
+        self._close_shard()
+        self._shard += 1
+        self._count = 0
+        self._size = 0
+        self._open_new(self.shard_path(self._shard))
+        logging.info(f"Started patch shard {self.shard_path(self._shard)}")
+
+    def _index(self, entries) -> None:
+        with open(self.shard_path(self._shard) + ".idx", "a") as f:
+            for entry in entries:
+                f.write(json.dumps(entry) + "\n")
+
+    def location(self, patch_id: str, label: Optional[str], preview: bool) -> Optional[dict]:
+        # Offsets are only known once the patch has been appended.
+        return None
+
+    def write(self, patch_id: str, label: Optional[str], hdu: fits.PrimaryHDU, preview: Optional["Image.Image"]) -> dict:
+        with self._lock:
+            if self._shard < 0 or self._count >= self.max_patches or self._size >= self.max_bytes:
+                self._roll()
+            location = self._append(patch_id, hdu, preview)
+            self._count += 1
+        return location
+
+    def remove(self, patch_meta: dict) -> None:
+        pass
+
+    def close(self) -> None:
+        with self._lock:
+            self._close_shard()
+
+    @abstractmethod
+    def _open_new(self, path: str) -> None:
+        pass
+
+    @abstractmethod
+    def _open_existing(self, path: str) -> None:
+        pass
+
+    @abstractmethod
+    def _append(self, patch_id: str, hdu: fits.PrimaryHDU, preview: Optional["Image.Image"]) -> dict:
+        pass
+
+    @abstractmethod
+    def _close_shard(self) -> None:
+        pass
+
+
+class TarShardLayout(_PackedLayout):
+    # Webdataset-style tar shards: patch_<id>.fits (+ .png) members.
+    suffix = ".tar"
+
+    def __init__(self, out_dir: str, max_patches: int = 10000, max_bytes: int = 1 << 30, prefix: str = "shard"):
+        self._tar: Optional[tarfile.TarFile] = None
+        super().__init__(out_dir, max_patches, max_bytes, prefix)
+
+    def _open_new(self, path: str) -> None:
+        self._tar = tarfile.open(path, "w", format=tarfile.USTAR_FORMAT)
+
+    def _open_existing(self, path: str) -> None:
+        self._tar = tarfile.open(path, "a", format=tarfile.USTAR_FORMAT)
+
+    def _add(self, name: str, payload: bytes) -> dict:
+        info = tarfile.TarInfo(name)
+        info.size = len(payload)
+        self._tar.addfile(info, io.BytesIO(payload))
+        padded = -(-len(payload) // _TAR_BLOCK) * _TAR_BLOCK
+        return {"member": name, "offset": self._tar.offset - padded, "nbytes": len(payload)}
+
+    def _append(self, patch_id: str, hdu: fits.PrimaryHDU, preview: Optional["Image.Image"]) -> dict:
+        base = f"patch_{patch_id}"
+        entries = [self._add(base + ".fits", _fits_bytes(fits.HDUList([hdu])))]
+        if preview is not None:
+            entries.append(self._add(base + ".png", _png_bytes(preview)))
+        self._tar.fileobj.flush()
+        self._size = self._tar.offset
+        self._index([dict(e, patch_id=patch_id) for e in entries])
+        shard = os.path.relpath(self.shard_path(self._shard), self.out_dir).replace(os.sep, "/")
+        location = {"file": shard, "offset": entries[0]["offset"], "nbytes": entries[0]["nbytes"]}
+        if preview is not None:
+            location["png_offset"] = entries[1]["offset"]
+            location["png_nbytes"] = entries[1]["nbytes"]
+        return location
+
+    def _close_shard(self) -> None:
+        if self._tar is not None:
+            self._tar.close()
+            self._tar = None
+
+
+class FitsShardLayout(_PackedLayout):
+    # Multi-extension FITS shards: an empty primary HDU followed by one
+    # image extension per patch (EXTNAME = PATCH_<id>). There is nowhere to
+    # put PNG previews, so none are rendered for this layout.
+    previews = False
+    suffix = ".fits"
+
+    def __init__(self, out_dir: str, max_patches: int = 10000, max_bytes: int = 1 << 30, prefix: str = "shard"):
+        self._file = None
+        super().__init__(out_dir, max_patches, max_bytes, prefix)
+
+    def _open_new(self, path: str) -> None:
+        self._file = open(path, "wb")
+        self._file.write(_fits_bytes(fits.HDUList([fits.PrimaryHDU()])))
+        self._size = self._file.tell()
+
+    def _open_existing(self, path: str) -> None:
+        self._file = open(path, "ab")
+
+    def _append(self, patch_id: str, hdu: fits.PrimaryHDU, preview: Optional["Image.Image"]) -> dict:
+        ext = fits.ImageHDU(data=hdu.data, header=hdu.header, name=f"PATCH_{patch_id}")
+        payload = _fits_bytes(fits.HDUList([fits.PrimaryHDU(), ext]))[_FITS_BLOCK:]
+        offset = self._file.tell()
+        self._file.write(payload)
+        self._file.flush()
+        self._size = self._file.tell()
+        self._index([{"patch_id": patch_id, "member": ext.name, "offset": offset, "nbytes": len(payload)}])
+        shard = os.path.relpath(self.shard_path(self._shard), self.out_dir).replace(os.sep, "/")
+        return {"file": shard, "offset": offset, "nbytes": len(payload), "hdu": self._count + 1}
+
+    def _close_shard(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def make_layout(
+    name: str, out_dir: str, fanout: int = 256, max_patches: int = 10000, max_bytes: int = 1 << 30,
+    prefix: str = "shard",
+):
+    if name == "flat":
+        return LooseLayout(out_dir)
+    if name == "hash":
+        return HashShardedLayout(out_dir, fanout)
+    if name == "label":
+        return LabelShardedLayout(out_dir)
+    if name == "tar":
+        return TarShardLayout(out_dir, max_patches, max_bytes, prefix)
+    if name == "mef":
+        return FitsShardLayout(out_dir, max_patches, max_bytes, prefix)
+    raise ValueError(f"Unknown output layout: {name}")
+
+
+def read_patch_hdu(out_dir: str, patch_meta: dict):
+    # Random access by metadata: open one loose file or read one byte range.
+    path = os.path.join(out_dir, patch_meta.get("file") or f"patch_{patch_meta['patch_id']}.fits")
+    if "offset" not in patch_meta:
+        with fits.open(path) as hdul:
+            return hdul[0].copy()
+    with open(path, "rb") as f:
+        f.seek(int(patch_meta["offset"]))
+        payload = f.read(int(patch_meta["nbytes"]))
+    if path.endswith(".tar"):
+        with fits.open(io.BytesIO(payload)) as hdul:
+            return hdul[0].copy()
+    return fits.ImageHDU.fromstring(payload)
@@ -0,0 +1,75 @@
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Callable, List, Set
+
+from PySide6.QtCore import QObject, Signal
+
+from .patch_journal import PatchJournal
+from .profiler import profiler
+
+
+class PatchWriter(QObject):
+    # Write-behind queue for patch files: the GUI thread hands over an
+    # already-registered patch and a write callable; workers write the files
+    # and the journal records are appended in batches once files are on disk.
+    # patch_meta
+    patch_written = Signal(object)
+    # patch_meta, error message
+    patch_failed = Signal(object, str)
+
+    def __init__(self, journal: PatchJournal, max_workers: int = 2, batch_size: int = 32, parent=None):
+        super().__init__(parent)
+        self.journal = journal
+        self.batch_size = batch_size
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="patch-writer")
+        self._pending: Set[Future] = set()
+        self._written: List[dict] = []
+        self._lock = threading.Lock()
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def submit(self, patch_meta: dict, write: Callable[[], None]) -> None:
+        with self._lock:
+            future = self._executor.submit(self._run, patch_meta, write)
+            self._pending.add(future)
+        future.add_done_callback(self._done)
+
+    def _run(self, patch_meta: dict, write: Callable[[], None]) -> None:
+        try:
+            write()
+        except Exception as e:
+            logging.info(f"Writing patch {patch_meta['patch_id']} failed: {e}")
+            self.patch_failed.emit(patch_meta, str(e))
+            return
+        with self._lock:
+            self._written.append(patch_meta)
+            flush = len(self._written) >= self.batch_size or len(self._pending) <= 1
+        if flush:
+            self._flush()
+        self.patch_written.emit(patch_meta)
+
+    def _done(self, future: Future) -> None:
+        with self._lock:
+            self._pending.discard(future)
+
+    def _flush(self) -> None:
+        with self._lock:
+            batch, self._written = self._written, []
+        if batch:
+            with profiler.span("journal", patches=len(batch)):
+                self.journal.add_many(batch)
+
+    def drain(self) -> None:
+        with self._lock:
+            pending = list(self._pending)
+        if pending:
+            wait(pending)
+            logging.info(f"Drained {len(pending)} pending patch writes")
+        self._flush()
+
+    def shutdown(self) -> None:
+        self.drain()
+        self._executor.shutdown(wait=True)
@@ -1,6 +1,6 @@
 
 import logging
-from typing import Tuple
+from typing import List, Tuple
 import numpy as np
 from config import Config
 
@@ -30,4 +30,29 @@ def in_img_bounds(
     if ix0 < 0 or iy0 < 0 or ix1 > W or iy1 > H:
         logging.info("Ignored: rectangle extends outside image bounds.")
         return False
-    return True
\ No newline at end of file
+    return True
+
+def to_uint8(image: np.ndarray) -> np.ndarray:
+    if image.dtype == np.uint8:
+        return image
+    return (np.clip(image, 0, 1) * 255).astype(np.uint8)
+
+
+def downsample_2x(image: np.ndarray) -> np.ndarray:
+    H, W = image.shape
+    if H % 2 or W % 2:
+        image = np.pad(image, ((0, H % 2), (0, W % 2)), mode="edge")
+    acc = image[0::2, 0::2].astype(np.uint16)
+    acc += image[1::2, 0::2]
+    acc += image[0::2, 1::2]
+    acc += image[1::2, 1::2]
+    acc += 2
+    acc >>= 2
+    return acc.astype(np.uint8)
+
+
+def build_pyramid(image: np.ndarray, min_size: int = 256) -> List[np.ndarray]:
+    levels = [np.ascontiguousarray(to_uint8(image))]
+    while max(levels[-1].shape) > min_size:
+        levels.append(downsample_2x(levels[-1]))
+    return levels
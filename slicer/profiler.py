@@ -0,0 +1,116 @@
+import os
+import json
+import time
+import threading
+import statistics
+from collections import deque
+from contextlib import nullcontext
+from typing import Deque, Dict, List, Optional
+
+_NULL_SPAN = nullcontext()
+
+
+class _Span:
+    __slots__ = ("profiler", "name", "args", "start")
+
+    def __init__(self, profiler: "Profiler", name: str, args: dict):
+        self.profiler = profiler
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.profiler.record(self.name, self.start, time.perf_counter() - self.start, self.args)
+        return False
+
+
+class Profiler:
+    # Stage timings for the GUI hot paths. While disabled, span() hands back
+    # one shared no-op context manager, so instrumented code pays a single
+    # attribute check. While enabled, spans are kept as Chrome trace events
+    # (viewable in Perfetto or chrome://tracing) and as rolling windows per
+    # stage for the status bar.
+    def __init__(self, window: int = 50, max_events: int = 500_000):
+        self.enabled = False
+        self.window = window
+        self._events: Deque[dict] = deque(maxlen=max_events)
+        self._recent: Dict[str, Deque[float]] = {}
+        self._threads: Dict[int, str] = {}
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter()
+
+    def enable(self) -> None:
+        self.enabled = True
+
+    def disable(self) -> None:
+        self.enabled = False
+
+    def clear(self) -> None:
+        with self._lock:
+            self._events.clear()
+            self._recent.clear()
+            self._threads.clear()
+        self._origin = time.perf_counter()
+
+    def span(self, name: str, **args):
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, args)
+
+    def record(self, name: str, start: float, duration: float, args: Optional[dict] = None) -> None:
+        # start is a time.perf_counter() value; lets callers time spans that
+        # begin and end in different callbacks.
+        if not self.enabled:
+            return
+        thread = threading.current_thread()
+        event = {
+            "name": name,
+            "ph": "X",
+            "ts": (start - self._origin) * 1e6,
+            "dur": duration * 1e6,
+            "pid": os.getpid(),
+            "tid": thread.ident,
+        }
+        if args:
+            event["args"] = args
+        with self._lock:
+            self._events.append(event)
+            self._threads.setdefault(thread.ident, thread.name)
+            recent = self._recent.get(name)
+            if recent is None:
+                recent = self._recent[name] = deque(maxlen=self.window)
+            recent.append(duration)
+
+    def latency(self, name: str) -> Optional[float]:
+        # Median of the recent durations of a stage, in seconds.
+        with self._lock:
+            recent = list(self._recent.get(name, ()))
+        return statistics.median(recent) if recent else None
+
+    def summary(self, names: List[str]) -> str:
+        parts = []
+        for name in names:
+            value = self.latency(name)
+            if value is not None:
+                parts.append(f"{name} {value * 1000:.1f} ms")
+        return " · ".join(parts)
+
+    def write_trace(self, path: str) -> int:
+        with self._lock:
+            events = list(self._events)
+            threads = dict(self._threads)
+        pid = os.getpid()
+        meta = [{"name": "process_name", "ph": "M", "pid": pid, "args": {"name": "FITS Image Slicer"}}]
+        meta += [
+            {"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}}
+            for tid, name in threads.items()
+        ]
+        with open(path, "w") as f:
+            json.dump({"traceEvents": meta + events, "displayTimeUnit": "ms"}, f)
+        return len(events)
+
+
+profiler = Profiler()
@@ -1,13 +1,17 @@
 
 import os
 import json
+import logging
 from datetime import datetime
 from config import Config
+from .scanner import FolderScanner, SCAN_INDEX_FILE_NAME
 
 def _normalize_path(path):
     return os.path.normcase(os.path.normpath(os.path.abspath(path)))
 
 class Project:
+    PROJECT_FILE_NAME = "project.json"
+
     def __init__(self):
         self.name = ""
         self.directory = ""
@@ -22,7 +26,7 @@ class Project:
         self.directory = _normalize_path(os.path.join(directory, name))
         self.files = [_normalize_path(f) for f in files]
         self.source_folders = list(set(os.path.dirname(f) for f in self.files))
-        self.project_file_path = os.path.join(self.directory, "project.json")
+        self.project_file_path = os.path.join(self.directory, self.PROJECT_FILE_NAME)
         
         os.makedirs(self.directory, exist_ok=True)
         self.config.out_dir = os.path.join(self.directory, "patches")
@@ -44,49 +48,101 @@ class Project:
 
             patches_raw = data.get("patches", {})
             self.patches = {_normalize_path(k): v for k, v in patches_raw.items()}
+            for path, patches in self.patches.items():
+                for patch_meta in patches:
+                    patch_meta["fits_path"] = path
 
             self.config.labels = data.get("labels", [])
             self.config.out_dir = os.path.join(self.directory, "patches")
         return self
 
-    def save(self):
-        data = {
+    @property
+    def cache_dir(self):
+        return os.path.join(self.directory, "cache")
+
+    # Indexes kept apart from cache_dir, whose files DiskCache may evict.
+    @property
+    def index_dir(self):
+        return os.path.join(self.directory, "index")
+
+    def to_dict(self):
+        return {
             "name": self.name,
             "files": self.files,
             "source_folders": self.source_folders,
-            "patches": self.patches,
+            # Copies, since the patch writer may still be adding file keys.
+            "patches": {path: [dict(p) for p in patches] for path, patches in self.patches.items()},
             "labels": self.config.labels,
             "last_modified": datetime.now().isoformat()
         }
-        with open(self.project_file_path, 'w') as f:
-            json.dump(data, f, indent=4)
+
+    def save(self):
+        self.export_json(self.project_file_path)
+
+    def export_json(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=4)
+
+    def get_patches(self, file_path):
+        return self.patches.setdefault(_normalize_path(file_path), [])
+
+    # The record_* hooks persist a change already applied to the list
+    # returned by get_patches(); the JSON backend simply rewrites the file.
+    def record_patch_added(self, file_path, patch_meta):
+        self.save()
+
+    def record_patches_added(self, file_path, patches):
+        self.save()
+
+    def record_patch_removed(self, file_path, patch_meta):
+        self.save()
+
+    def record_patches_removed(self, file_path, patches):
+        self.save()
+
+    def record_patch_updated(self, patch_meta):
+        self.save()
+
+    def record_patches_updated(self, file_path, patches):
+        self.save()
+
+    def record_patches_cleared(self, file_path):
+        self.save()
+
+    def remove_file(self, file_path):
+        self.files.remove(file_path)
+        self.save()
+
+    def close(self):
+        pass
 
     def add_files(self, files_to_add):
+        known = set(self.files)
+        folders = set(self.source_folders)
         for f in files_to_add:
             normalized_f = _normalize_path(f)
-            if normalized_f not in self.files:
+            if normalized_f not in known:
+                known.add(normalized_f)
                 self.files.append(normalized_f)
-            
+
             dir_name = os.path.dirname(normalized_f)
-            if dir_name not in self.source_folders:
+            if dir_name not in folders:
+                folders.add(dir_name)
                 self.source_folders.append(dir_name)
         self.save()
 
     def scan_for_new_files(self):
+        # Usable 2D images under the source folders (recursively) that are
+        # not in the project yet. The project's own directory is skipped so
+        # cut patches are never picked up as new images.
         if not self.source_folders:
             return []
 
-        new_files = []
+        scanner = FolderScanner(os.path.join(self.index_dir, SCAN_INDEX_FILE_NAME))
+        found, rejected = scanner.scan(
+            [d for d in self.source_folders if os.path.isdir(d)], exclude=[self.directory]
+        )
+        for path, reason in rejected.items():
+            logging.info(f"Skipping {path}: {reason}")
         current_files_normalized = set(self.files)
-
-        for directory in self.source_folders:
-            try:
-                if not os.path.isdir(directory): continue
-                for filename in os.listdir(directory):
-                    if filename.lower().endswith(('.fits','fts' ,'.fit', '.fz')):
-                        full_path = _normalize_path(os.path.join(directory, filename))
-                        if full_path not in current_files_normalized:
-                            new_files.append(full_path)
-            except FileNotFoundError:
-                continue
-        return new_files
+        return [f for f in map(_normalize_path, found) if f not in current_files_normalized]
@@ -0,0 +1,123 @@
+import os
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+FITS_EXTENSIONS = (".fits", ".fts", ".fit", ".fz")
+SCAN_INDEX_FILE_NAME = "scan_index.json"
+
+
+def is_fits_name(name: str) -> bool:
+    return name.lower().endswith(FITS_EXTENSIONS)
+
+
+def walk_fits(directories: Iterable[str], exclude: Iterable[str] = ()) -> Iterator[Tuple[str, os.stat_result]]:
+    # Recursive os.scandir walk; directories are visited once even when one
+    # source folder contains another, and excluded trees are skipped.
+    seen = set(os.path.normcase(os.path.abspath(d)) for d in exclude)
+    stack = [os.path.abspath(d) for d in directories]
+    while stack:
+        directory = stack.pop()
+        key = os.path.normcase(directory)
+        if key in seen:
+            continue
+        seen.add(key)
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        elif is_fits_name(entry.name) and entry.is_file():
+                            yield entry.path, entry.stat()
+                    except OSError:
+                        continue
+        except OSError as e:
+            logging.info(f"Cannot scan {directory}: {e}")
+
+
+def list_fits_files(directory: str) -> List[str]:
+    return sorted(path for path, _ in walk_fits([directory]))
+
+
+def peek_image(path: str) -> Optional[str]:
+    # None if the file holds a usable 2D image, else the reason it does not.
+    # Only headers are read.
+    from astropy.io import fits
+    try:
+        with fits.open(path, memmap=True, lazy_load_hdus=True) as hdul:
+            # Same HDU choice as FitsImageModel: the primary unless empty.
+            index = 0 if hdul[0].header.get("NAXIS", 0) > 0 or len(hdul) == 1 else 1
+            hdu = hdul[index]
+            if not hdu.is_image:
+                return f"HDU {index} is not an image"
+            shape = hdu.shape
+    except Exception as e:
+        return f"unreadable: {e}"
+    if len(shape) != 2:
+        return f"{len(shape)}D data"
+    if min(shape) == 0:
+        return "empty image"
+    return None
+
+
+def validate_files(paths: List[str], max_workers: int = 8) -> Tuple[List[str], Dict[str, str]]:
+    if not paths:
+        return [], {}
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="peek") as pool:
+        reasons = list(pool.map(peek_image, paths))
+    ok = [p for p, reason in zip(paths, reasons) if reason is None]
+    rejected = {p: reason for p, reason in zip(paths, reasons) if reason is not None}
+    return ok, rejected
+
+
+class FolderScanner:
+    # Keeps (size, mtime) and the header verdict of every FITS file under the
+    # source folders, so a rescan only stats the tree and peeks at files that
+    # are new or changed.
+    def __init__(self, index_path: str, max_workers: int = 8):
+        self.index_path = index_path
+        self.max_workers = max_workers
+        self._index: Dict[str, dict] = {}
+        self._load()
+
+    def _load(self) -> None:
+        try:
+            with open(self.index_path, "r") as f:
+                self._index = json.load(f)
+        except (OSError, ValueError):
+            self._index = {}
+
+    def _save(self) -> None:
+        os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+        tmp = self.index_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self._index, f)
+        os.replace(tmp, self.index_path)
+
+    def scan(self, directories: Iterable[str], exclude: Iterable[str] = ()) -> Tuple[List[str], Dict[str, str]]:
+        # All usable image files under the directories, and the rejected
+        # ones with a reason.
+        found = {}
+        changed = []
+        for path, st in walk_fits(directories, exclude):
+            found[path] = st
+            entry = self._index.get(path)
+            if entry is None or entry["size"] != st.st_size or entry["mtime_ns"] != st.st_mtime_ns:
+                changed.append(path)
+
+        _, rejected = validate_files(changed, self.max_workers)
+        for path in changed:
+            st = found[path]
+            self._index[path] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "reason": rejected.get(path)}
+        gone = [path for path in self._index if path not in found]
+        for path in gone:
+            del self._index[path]
+        if changed or gone:
+            self._save()
+        logging.info(f"Scanned {len(found)} FITS files: {len(changed)} new or changed, {len(gone)} gone")
+
+        ok = [path for path in found if self._index[path]["reason"] is None]
+        bad = {path: self._index[path]["reason"] for path in found if self._index[path]["reason"] is not None}
+        return sorted(ok), bad
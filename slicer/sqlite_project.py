@@ -0,0 +1,286 @@
+import os
+import json
+import sqlite3
+from collections.abc import MutableMapping
+from datetime import datetime
+
+from .project import Project, _normalize_path
+
+PATCH_COLUMNS = [
+    "patch_id",
+    "timestamp",
+    "fits_path",
+    "x0",
+    "y0",
+    "x1",
+    "y1",
+    "width",
+    "height",
+    "ra_deg_cen",
+    "dec_deg_cen",
+    "label",
+]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    path TEXT UNIQUE NOT NULL
+);
+CREATE TABLE IF NOT EXISTS patches (
+    fits_path TEXT NOT NULL,
+    patch_id TEXT NOT NULL,
+    timestamp TEXT,
+    x0 INTEGER,
+    y0 INTEGER,
+    x1 INTEGER,
+    y1 INTEGER,
+    width INTEGER,
+    height INTEGER,
+    ra_deg_cen REAL,
+    dec_deg_cen REAL,
+    label TEXT,
+    extra TEXT,
+    PRIMARY KEY (fits_path, patch_id)
+);
+CREATE INDEX IF NOT EXISTS patches_by_label ON patches (label);
+"""
+
+# Patches are read back in rowid order, so an existing row is updated in
+# place; INSERT OR REPLACE would delete it and append it at the end.
+_UPSERT_PATCH = (
+    f"INSERT INTO patches ({', '.join(PATCH_COLUMNS)}, extra) "
+    f"VALUES ({', '.join('?' * (len(PATCH_COLUMNS) + 1))}) "
+    "ON CONFLICT (fits_path, patch_id) DO UPDATE SET "
+    + ", ".join(f"{c} = excluded.{c}" for c in PATCH_COLUMNS + ["extra"] if c not in ("fits_path", "patch_id"))
+)
+
+
+def _patch_row(patch_meta):
+    row = [patch_meta.get(col) for col in PATCH_COLUMNS]
+    extra = {k: v for k, v in patch_meta.items() if k not in PATCH_COLUMNS}
+    for i, value in enumerate(row):
+        # numpy scalars and "" placeholders from the CSV path
+        if hasattr(value, "item"):
+            row[i] = value.item()
+    row.append(json.dumps(extra) if extra else None)
+    return row
+
+
+def _patch_meta(row):
+    patch_meta = dict(zip(PATCH_COLUMNS, row[:-1]))
+    if row[-1]:
+        patch_meta.update(json.loads(row[-1]))
+    return patch_meta
+
+
+class _PatchMap(MutableMapping):
+    # {file_path: [patch_meta]} that reads each file's rows on first access.
+    def __init__(self, project):
+        self._project = project
+        self._loaded = {}
+        self._all_loaded = False
+
+    def _load(self, file_path):
+        patches = self._loaded.get(file_path)
+        if patches is None:
+            cur = self._project.db.execute(
+                f"SELECT {', '.join(PATCH_COLUMNS)}, extra FROM patches WHERE fits_path = ? ORDER BY rowid",
+                (file_path,),
+            )
+            patches = [_patch_meta(r) for r in cur]
+            self._loaded[file_path] = patches
+        return patches
+
+    def _load_all(self):
+        if self._all_loaded:
+            return
+        cur = self._project.db.execute(
+            f"SELECT {', '.join(PATCH_COLUMNS)}, extra FROM patches ORDER BY rowid"
+        )
+        grouped = {}
+        for r in cur:
+            patch_meta = _patch_meta(r)
+            grouped.setdefault(patch_meta["fits_path"], []).append(patch_meta)
+        for file_path, patches in grouped.items():
+            self._loaded.setdefault(file_path, patches)
+        self._all_loaded = True
+
+    def __getitem__(self, file_path):
+        patches = self._load(file_path)
+        if not patches and file_path not in self._project.files:
+            raise KeyError(file_path)
+        return patches
+
+    def get(self, file_path, default=None):
+        try:
+            return self[file_path]
+        except KeyError:
+            return default
+
+    def setdefault(self, file_path, default=None):
+        return self._load(file_path)
+
+    def __setitem__(self, file_path, patches):
+        self._loaded[file_path] = patches
+
+    def __delitem__(self, file_path):
+        self._loaded.pop(file_path, None)
+
+    def __iter__(self):
+        self._load_all()
+        return iter([k for k, v in self._loaded.items() if v])
+
+    def __len__(self):
+        self._load_all()
+        return sum(1 for v in self._loaded.values() if v)
+
+
+class SqliteProject(Project):
+    PROJECT_FILE_NAME = "project.sqlite"
+
+    def __init__(self):
+        super().__init__()
+        self._db = None
+        self.patches = _PatchMap(self)
+
+    @property
+    def db(self):
+        if self._db is None:
+            self._db = sqlite3.connect(self.project_file_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.executescript(_SCHEMA)
+        return self._db
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def create(self, name, directory, files):
+        super().create(name, directory, [])
+        self.add_files(files)
+        return self
+
+    def load(self, file_path):
+        self.close()
+        self.project_file_path = _normalize_path(file_path)
+        self.directory = os.path.dirname(self.project_file_path)
+        meta = dict(self.db.execute("SELECT key, value FROM meta"))
+        self.name = meta.get("name", "")
+        self.config.labels = json.loads(meta.get("labels", "[]"))
+        self.files = [r[0] for r in self.db.execute("SELECT path FROM files ORDER BY id")]
+        self.source_folders = json.loads(meta.get("source_folders", "[]"))
+        if not self.source_folders and self.files:
+            self.source_folders = list(set(os.path.dirname(f) for f in self.files))
+        self.patches = _PatchMap(self)
+        self.config.out_dir = os.path.join(self.directory, "patches")
+        return self
+
+    def save(self):
+        # Only project-level settings live here; files and patches are written row by row.
+        meta = {
+            "name": self.name,
+            "labels": json.dumps(self.config.labels),
+            "source_folders": json.dumps(self.source_folders),
+            "last_modified": datetime.now().isoformat(),
+        }
+        with self.db:
+            self.db.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", meta.items())
+
+    def add_files(self, files_to_add):
+        known = set(self.files)
+        folders = set(self.source_folders)
+        new_files = []
+        for f in files_to_add:
+            normalized_f = _normalize_path(f)
+            if normalized_f not in known:
+                known.add(normalized_f)
+                new_files.append(normalized_f)
+            dir_name = os.path.dirname(normalized_f)
+            if dir_name not in folders:
+                folders.add(dir_name)
+                self.source_folders.append(dir_name)
+        with self.db:
+            self.db.executemany("INSERT OR IGNORE INTO files (path) VALUES (?)", [(f,) for f in new_files])
+        self.files.extend(new_files)
+        self.save()
+
+    def remove_file(self, file_path):
+        self.files.remove(file_path)
+        with self.db:
+            self.db.execute("DELETE FROM files WHERE path = ?", (file_path,))
+
+    def record_patch_added(self, file_path, patch_meta):
+        with self.db:
+            self.db.execute(
+                _UPSERT_PATCH,
+                _patch_row(dict(patch_meta, fits_path=_normalize_path(file_path))),
+            )
+
+    def record_patches_added(self, file_path, patches):
+        file_path = _normalize_path(file_path)
+        with self.db:
+            self.db.executemany(
+                _UPSERT_PATCH,
+                [_patch_row(dict(p, fits_path=file_path)) for p in patches],
+            )
+
+    def record_patch_removed(self, file_path, patch_meta):
+        with self.db:
+            self.db.execute(
+                "DELETE FROM patches WHERE fits_path = ? AND patch_id = ?",
+                (_normalize_path(file_path), patch_meta["patch_id"]),
+            )
+
+    def record_patches_removed(self, file_path, patches):
+        file_path = _normalize_path(file_path)
+        with self.db:
+            self.db.executemany(
+                "DELETE FROM patches WHERE fits_path = ? AND patch_id = ?",
+                [(file_path, p["patch_id"]) for p in patches],
+            )
+
+    def record_patch_updated(self, patch_meta):
+        self.record_patch_added(patch_meta["fits_path"], patch_meta)
+
+    def record_patches_updated(self, file_path, patches):
+        self.record_patches_added(file_path, patches)
+
+    def record_patches_cleared(self, file_path):
+        with self.db:
+            self.db.execute("DELETE FROM patches WHERE fits_path = ?", (_normalize_path(file_path),))
+
+    def patches_with_label(self, label):
+        cur = self.db.execute(
+            f"SELECT {', '.join(PATCH_COLUMNS)}, extra FROM patches WHERE label = ? ORDER BY rowid", (label,)
+        )
+        return [_patch_meta(r) for r in cur]
+
+    @classmethod
+    def import_json(cls, json_path, db_path=None):
+        source = Project().load(json_path)
+        project = cls()
+        project.project_file_path = _normalize_path(
+            db_path or os.path.join(source.directory, cls.PROJECT_FILE_NAME)
+        )
+        project.directory = os.path.dirname(project.project_file_path)
+        project.name = source.name
+        project.config = source.config
+        project.source_folders = list(source.source_folders)
+        project.add_files(source.files)
+        rows = [
+            _patch_row(dict(p, fits_path=file_path))
+            for file_path, patches in source.patches.items()
+            for p in patches
+        ]
+        with project.db:
+            project.db.executemany(
+                _UPSERT_PATCH,
+                rows,
+            )
+        return project.load(project.project_file_path)
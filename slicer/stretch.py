@@ -0,0 +1,190 @@
+import threading
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from .disk_cache import DiskCache
+
+LUT_SIZE = 65536
+HISTEQ_BINS = 256
+ZSCALE_SAMPLE_PIXELS = 250_000
+CHUNK_PIXELS = 1 << 22
+
+_INTERVALS = {
+    "zscale": "zscale",
+    "linear": "minmax",
+    "log": "minmax",
+    "histeq": "minmax",
+}
+
+# astropy.visualization imports matplotlib when it is installed, so it is
+# only loaded once something is actually rendered.
+_STRETCHES = {
+    "zscale": "AsinhStretch",
+    "linear": "LinearStretch",
+    "log": "LogStretch",
+}
+
+
+def subsample(data: np.ndarray, n_pixels: int) -> np.ndarray:
+    step = max(1, int(np.ceil(np.sqrt(data.size / n_pixels))))
+    return np.asarray(data[::step, ::step])
+
+
+def _row_chunks(shape: Tuple[int, int]):
+    rows = max(1, CHUNK_PIXELS // max(shape[1], 1))
+    for r0 in range(0, shape[0], rows):
+        yield r0, min(r0 + rows, shape[0])
+
+
+def finite_min_max(data: np.ndarray) -> Tuple[float, float]:
+    vmin, vmax = np.inf, -np.inf
+    for r0, r1 in _row_chunks(data.shape):
+        chunk = np.asarray(data[r0:r1])
+        if np.issubdtype(chunk.dtype, np.floating):
+            chunk = chunk[np.isfinite(chunk)]
+        if chunk.size:
+            vmin = min(vmin, float(chunk.min()))
+            vmax = max(vmax, float(chunk.max()))
+    if vmin > vmax:
+        return 0.0, 0.0
+    return vmin, vmax
+
+
+def compute_limits(data: np.ndarray, interval: str) -> Tuple[float, float]:
+    if interval == "zscale":
+        from astropy.visualization import ZScaleInterval
+        sample = subsample(data, ZSCALE_SAMPLE_PIXELS)
+        sample = sample[np.isfinite(sample)]
+        if not sample.size:
+            return 0.0, 0.0
+        vmin, vmax = ZScaleInterval().get_limits(sample)
+        return float(vmin), float(vmax)
+    return finite_min_max(data)
+
+
+def compute_histogram(data: np.ndarray, limits: Tuple[float, float], nbins: int = HISTEQ_BINS) -> np.ndarray:
+    hist = np.zeros(nbins, dtype=np.int64)
+    for r0, r1 in _row_chunks(data.shape):
+        chunk = np.asarray(data[r0:r1])
+        if np.issubdtype(chunk.dtype, np.floating):
+            chunk = chunk[np.isfinite(chunk)]
+        hist += np.histogram(chunk, bins=nbins, range=limits)[0]
+    return hist
+
+
+def build_histeq_lut(hist: np.ndarray, limits: Tuple[float, float]) -> np.ndarray:
+    # Same mapping as skimage.exposure.equalize_hist, sampled once per LUT entry
+    # instead of interpolated per pixel. The histogram covers finite pixels
+    # only, so NaNs no longer pull the mapping towards zero as they did when
+    # nan_to_num ran first; they are drawn like a zero-valued pixel instead.
+    vmin, vmax = limits
+    if vmax <= vmin:
+        # A flat image has nothing to equalize; mid-grey, as equalize_hist gives.
+        return np.full(LUT_SIZE, 127, dtype=np.uint8)
+    edges = np.linspace(vmin, vmax, hist.size + 1)
+    centers = (edges[:-1] + edges[1:]) / 2
+    cdf = hist.cumsum() / max(float(hist.sum()), 1.0)
+    values = np.linspace(vmin, vmax, LUT_SIZE)
+    return (np.interp(values, centers, cdf) * 255).astype(np.uint8)
+
+
+def build_lut(stretch_mode: str) -> np.ndarray:
+    from astropy import visualization
+    x = np.linspace(0.0, 1.0, LUT_SIZE)
+    y = getattr(visualization, _STRETCHES.get(stretch_mode, "AsinhStretch"))()(x, clip=True)
+    return (y * 255).astype(np.uint8)
+
+
+class StretchEngine:
+    def __init__(self, disk_cache: Optional[DiskCache] = None, source_path: Optional[str] = None, hdu: int = 0):
+        self.disk_cache = disk_cache if source_path else None
+        self.source_path = source_path
+        self.hdu = hdu
+        self._limits: Dict[str, Tuple[float, float]] = {}
+        self._histograms: Dict[str, np.ndarray] = {}
+        self._luts: Dict[str, np.ndarray] = {}
+        self._lock = threading.Lock()
+
+    def _stored_limits(self, interval: str) -> Optional[Tuple[float, float]]:
+        limits = self._limits.get(interval)
+        if limits is None and self.disk_cache is not None:
+            stored = self.disk_cache.get_json(self.source_path, f"limits-{interval}", self.hdu)
+            if stored is not None:
+                limits = tuple(stored)
+                with self._lock:
+                    self._limits[interval] = limits
+        return limits
+
+    def _stored_histogram(self) -> Optional[np.ndarray]:
+        hist = self._histograms.get("histeq")
+        if hist is None and self.disk_cache is not None:
+            hist = self.disk_cache.get_array(self.source_path, f"histogram-{HISTEQ_BINS}", self.hdu)
+            if hist is not None:
+                with self._lock:
+                    self._histograms["histeq"] = hist
+        return hist
+
+    def is_prepared(self, stretch_mode: str) -> bool:
+        if self._stored_limits(_INTERVALS.get(stretch_mode, "zscale")) is None:
+            return False
+        return stretch_mode != "histeq" or self._stored_histogram() is not None
+
+    def limits(self, data: np.ndarray, stretch_mode: str, cache: bool = True) -> Tuple[float, float]:
+        interval = _INTERVALS.get(stretch_mode, "zscale")
+        limits = self._stored_limits(interval) if cache else None
+        if limits is None:
+            limits = compute_limits(data, interval)
+            if not cache:
+                return limits
+            with self._lock:
+                self._limits[interval] = limits
+            if self.disk_cache is not None:
+                self.disk_cache.put_json(self.source_path, f"limits-{interval}", list(limits), self.hdu)
+        return limits
+
+    def histogram(self, data: np.ndarray, cache: bool = True) -> np.ndarray:
+        hist = self._stored_histogram() if cache else None
+        if hist is None:
+            hist = compute_histogram(data, self.limits(data, "histeq", cache))
+            if not cache:
+                return hist
+            with self._lock:
+                self._histograms["histeq"] = hist
+            if self.disk_cache is not None:
+                self.disk_cache.put_array(self.source_path, f"histogram-{HISTEQ_BINS}", hist, self.hdu)
+        return hist
+
+    def lut(self, data: np.ndarray, stretch_mode: str, cache: bool = True) -> np.ndarray:
+        lut = self._luts.get(stretch_mode) if cache else None
+        if lut is None:
+            if stretch_mode == "histeq":
+                lut = build_histeq_lut(self.histogram(data, cache), self.limits(data, stretch_mode, cache))
+            else:
+                lut = build_lut(stretch_mode)
+            if not cache:
+                return lut
+            with self._lock:
+                self._luts[stretch_mode] = lut
+        return lut
+
+    def render(self, data: np.ndarray, stretch_mode: str, cache: bool = True) -> np.ndarray:
+        vmin, vmax = self.limits(data, stretch_mode, cache)
+        lut = self.lut(data, stretch_mode, cache)
+        scale = (LUT_SIZE - 1) / (vmax - vmin) if vmax > vmin else 0.0
+        # NaNs render like zero-valued pixels, as nan_to_num did before.
+        nan_index = min(max((0.0 - vmin) * scale, 0), LUT_SIZE - 1)
+
+        out = np.empty(data.shape, dtype=np.uint8)
+        buf = None
+        for r0, r1 in _row_chunks(data.shape):
+            chunk = data[r0:r1]
+            if buf is None or buf.shape[0] < chunk.shape[0]:
+                buf = np.empty(chunk.shape, dtype=np.float32)
+            b = buf[:chunk.shape[0]]
+            np.subtract(chunk, vmin, out=b, casting="unsafe")
+            b *= scale
+            np.nan_to_num(b, copy=False, nan=nan_index)
+            np.clip(b, 0, LUT_SIZE - 1, out=b)
+            np.take(lut, b.astype(np.uint16), out=out[r0:r1])
+        return out
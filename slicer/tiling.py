@@ -0,0 +1,78 @@
+from typing import Tuple
+
+import numpy as np
+
+ROW_CHUNK = 512
+
+
+def tile_origins(shape: Tuple[int, int], size: int, stride: int) -> Tuple[np.ndarray, np.ndarray]:
+    height, width = shape
+    if size > height or size > width:
+        return np.empty(0, dtype=int), np.empty(0, dtype=int)
+    return np.arange(0, height - size + 1, stride), np.arange(0, width - size + 1, stride)
+
+
+def _window_sums(rows: np.ndarray, xs: np.ndarray, size: int) -> np.ndarray:
+    # Per image row, the sum over each horizontal window starting at xs.
+    cs = np.zeros((rows.shape[0], rows.shape[1] + 1), dtype=np.float64)
+    np.cumsum(rows, axis=1, out=cs[:, 1:])
+    return cs[:, xs + size] - cs[:, xs]
+
+
+def tile_stats(data: np.ndarray, size: int, stride: int):
+    # NaN fraction, mean and standard deviation of every grid tile in one
+    # pass over the rows: horizontal window sums per row, then vertical
+    # window sums over those via a cumulative sum. Works on memmaps in
+    # ROW_CHUNK bands, so memory stays O(height x tiles per row).
+    ys, xs = tile_origins(data.shape, size, stride)
+    if len(ys) == 0 or len(xs) == 0:
+        empty = np.empty((len(ys), len(xs)))
+        return empty, empty, empty
+    height = data.shape[0]
+    # Sums are taken about a rough image level so the variance does not
+    # cancel catastrophically on frames with a large sky background.
+    sample = np.asarray(data[::max(height // 64, 1), ::max(data.shape[1] // 64, 1)], dtype=np.float64)
+    offset = float(np.nanmedian(sample)) if np.isfinite(sample).any() else 0.0
+    nan_rows = np.empty((height, len(xs)))
+    sum_rows = np.empty((height, len(xs)))
+    sq_rows = np.empty((height, len(xs)))
+    for y0 in range(0, height, ROW_CHUNK):
+        band = np.asarray(data[y0:y0 + ROW_CHUNK], dtype=np.float64) - offset
+        nan = np.isnan(band)
+        band[nan] = 0.0
+        nan_rows[y0:y0 + len(band)] = _window_sums(nan, xs, size)
+        sum_rows[y0:y0 + len(band)] = _window_sums(band, xs, size)
+        np.square(band, out=band)
+        sq_rows[y0:y0 + len(band)] = _window_sums(band, xs, size)
+
+    def vertical(rows):
+        cs = np.zeros((height + 1, rows.shape[1]))
+        np.cumsum(rows, axis=0, out=cs[1:])
+        return cs[ys + size] - cs[ys]
+
+    n_nan = vertical(nan_rows)
+    n_valid = size * size - n_nan
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = vertical(sum_rows) / n_valid
+        var = vertical(sq_rows) / n_valid - mean ** 2
+    return n_nan / (size * size), mean + offset, np.sqrt(np.maximum(var, 0.0))
+
+
+def grid_boxes(
+    data: np.ndarray,
+    size: int,
+    stride: int = None,
+    max_nan_fraction: float = 0.0,
+    min_std: float = 0.0,
+) -> np.ndarray:
+    # (n, 4) array of x0, y0, x1, y1 for every accepted tile, row-major.
+    stride = stride or size
+    ys, xs = tile_origins(data.shape, size, stride)
+    nan_fraction, _, std = tile_stats(data, size, stride)
+    keep = nan_fraction <= max_nan_fraction
+    if min_std > 0:
+        keep &= std >= min_std
+    iy, ix = np.nonzero(keep)
+    x0 = xs[ix]
+    y0 = ys[iy]
+    return np.stack([x0, y0, x0 + size, y0 + size], axis=1)
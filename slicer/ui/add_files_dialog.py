@@ -1,9 +1,9 @@
 
-import os
 from PySide6.QtWidgets import (
     QDialog, QVBoxLayout, QHBoxLayout, QFileDialog,
-    QListWidget, QDialogButtonBox, QPushButton
+    QListWidget, QDialogButtonBox, QPushButton, QMessageBox
 )
+from ..scanner import list_fits_files, validate_files
 
 class AddFilesDialog(QDialog):
     def __init__(self, parent=None):
@@ -31,16 +31,20 @@ class AddFilesDialog(QDialog):
         self.button_box.rejected.connect(self.reject)
 
     def add_files(self):
-        files, _ = QFileDialog.getOpenFileNames(self, "Select FITS Files", "", "FITS Files (*.fits *.fit *.fz)")
+        files, _ = QFileDialog.getOpenFileNames(self, "Select FITS Files", "", "FITS Files (*.fits *.fts *.fit *.fz)")
         if files:
             self.file_list.addItems(files)
 
     def add_folder(self):
         directory = QFileDialog.getExistingDirectory(self, "Select Folder")
         if directory:
-            for filename in os.listdir(directory):
-                if filename.lower().endswith(('.fits', '.fit', '.fz')):
-                    self.file_list.addItem(os.path.join(directory, filename))
+            files, rejected = validate_files(list_fits_files(directory))
+            self.file_list.addItems(files)
+            if rejected:
+                QMessageBox.information(
+                    self, "Files Skipped",
+                    f"{len(rejected)} FITS files under {directory} are not 2D images and were skipped."
+                )
 
     def get_files(self):
         return [self.file_list.item(i).text() for i in range(self.file_list.count())]
@@ -1,5 +1,6 @@
 
 from PySide6.QtWidgets import QStyledItemDelegate, QComboBox
+from PySide6.QtCore import Qt
 
 class LabelDelegate(QStyledItemDelegate):
     def __init__(self, parent=None, labels=None):
@@ -12,9 +13,9 @@ class LabelDelegate(QStyledItemDelegate):
         return editor
 
     def setEditorData(self, editor, index):
-        value = index.model().data(index, 0)
+        value = index.model().data(index, Qt.EditRole)
         if value:
             editor.setCurrentText(value)
 
     def setModelData(self, editor, model, index):
-        model.setData(index, editor.currentText(), 0)
+        model.setData(index, editor.currentText(), Qt.EditRole)
@@ -1,9 +1,11 @@
 
-from PySide6.QtWidgets import QGraphicsView, QGraphicsScene, QGraphicsRectItem, QRubberBand
-from PySide6.QtGui import QPixmap, QImage, QPen, QColor, QPainter
+from PySide6.QtWidgets import QGraphicsView, QGraphicsScene, QRubberBand
+from PySide6.QtGui import QPainter
 from PySide6.QtCore import Signal, Qt, QRect, QPoint, QRectF, QSize
-from PySide6.QtCore import Signal, Qt, QRect, QPoint
 import numpy as np
+from ..processing_utils import build_pyramid
+from .tiled_image_item import TiledImageItem
+from .patch_overlay_item import PatchOverlayItem
 
 class ImageView(QGraphicsView):
     region_selected = Signal(QRect)
@@ -20,37 +22,44 @@ class ImageView(QGraphicsView):
 
         self.rubber_band = QRubberBand(QRubberBand.Rectangle, self)
         self.origin = QPoint()
-        self._pixmap_item = None
-        self._patch_items = []
-
-    def set_image(self, image_data: np.ndarray, reset_view=False):
-        height, width = image_data.shape
-        image_data_u8 = (image_data * 255).astype(np.uint8)
-        q_image = QImage(image_data_u8.data, width, height, width, QImage.Format_Grayscale8)
-        q_image.ndarray = image_data_u8
-        pixmap = QPixmap.fromImage(q_image)
-
-        if self._pixmap_item is None:
-            self._pixmap_item = self.scene.addPixmap(pixmap)
+        self._image_item = None
+        self._overlay = PatchOverlayItem()
+        self.scene.addItem(self._overlay)
+
+    def set_image(self, image_data: np.ndarray, reset_view=False, scale=1, levels=None):
+        if levels is None:
+            levels = build_pyramid(image_data, TiledImageItem.TILE_SIZE)
+
+        if self._image_item is None:
+            self._image_item = TiledImageItem(levels)
+            self.scene.addItem(self._image_item)
         else:
-            self._pixmap_item.setPixmap(pixmap)
+            self._image_item.set_levels(levels)
+        # Decimated previews are stretched back over the full-resolution scene.
+        self._image_item.setScale(scale)
+        self.scene.setSceneRect(self._image_item.sceneBoundingRect())
+        self._overlay.set_bounds(self._image_item.sceneBoundingRect())
 
         if reset_view:
-            self.fitInView(self._pixmap_item, Qt.KeepAspectRatio)
+            self.fitInView(self._image_item, Qt.KeepAspectRatio)
 
     def clear_patches(self):
-        for item in self._patch_items:
-            self.scene.removeItem(item)
-        self._patch_items = []
+        self._overlay.clear()
+
+    def add_patch_overlay(self, x0, y0, w, h, color="lime", linewidth=1.0, patch_id=None):
+        self._overlay.set_linewidth(linewidth)
+        if patch_id is None:
+            patch_id = f"_anon{len(self._overlay)}"
+        self._overlay.add_patch(patch_id, x0, y0, w, h, color)
+
+    def remove_patch_overlay(self, patch_id):
+        self._overlay.remove_patch(patch_id)
 
-    def add_patch_overlay(self, x0, y0, w, h, color="lime", linewidth=1.0):
-        pen = QPen(QColor(color))
-        pen.setWidthF(linewidth)
-        rect_item = self.scene.addRect(QRectF(x0, y0, w, h), pen)
-        self._patch_items.append(rect_item)
+    def set_patch_overlay_color(self, patch_id, color):
+        self._overlay.set_patch_color(patch_id, color)
 
     def mousePressEvent(self, event):
-        if event.button() == Qt.LeftButton and self._pixmap_item:
+        if event.button() == Qt.LeftButton and self._image_item:
             self.origin = self.mapToScene(event.pos())
             self.rubber_band.setGeometry(QRect(event.pos(), QSize()))
             self.rubber_band.show()
@@ -83,7 +92,7 @@ class ImageView(QGraphicsView):
         self.scale(1 / 1.2, 1 / 1.2)
 
     def resizeEvent(self, event):
-        if self._pixmap_item:
-            self.fitInView(self._pixmap_item, Qt.KeepAspectRatio)
+        if self._image_item:
+            self.fitInView(self._image_item, Qt.KeepAspectRatio)
         super().resizeEvent(event)
         self.setInteractive(False) # Disable scrollbars after fitting
@@ -1,7 +1,7 @@
 
 from PySide6.QtWidgets import (
     QMainWindow, QWidget, QVBoxLayout, QMenuBar, QFileDialog, QDockWidget,
-    QStatusBar, QToolBar, QComboBox
+    QStatusBar, QToolBar, QComboBox, QLineEdit, QCheckBox, QHBoxLayout, QLabel
 )
 from PySide6.QtGui import QAction, QIcon
 from PySide6.QtCore import Qt, Signal
@@ -22,6 +22,9 @@ class MainWindow(QMainWindow):
         self.layout.addWidget(self.image_view)
 
         self.setStatusBar(QStatusBar(self))
+        self.timing_label = QLabel()
+        self.timing_label.setVisible(False)
+        self.statusBar().addPermanentWidget(self.timing_label)
         self._create_toolbar()
         self._create_patch_table_dock()
         self._create_menus()
@@ -38,6 +41,13 @@ class MainWindow(QMainWindow):
 
         self.next_action = QAction("Next", self)
         self.toolbar.addAction(self.next_action)
+
+        self.sky_filter_edit = QLineEdit()
+        self.sky_filter_edit.setPlaceholderText("RA Dec")
+        self.sky_filter_edit.setToolTip("Only list files covering this sky position (degrees or sexagesimal)")
+        self.sky_filter_edit.setClearButtonEnabled(True)
+        self.sky_filter_edit.setMaximumWidth(200)
+        self.toolbar.addWidget(self.sky_filter_edit)
         
         self.toolbar.addSeparator()
 
@@ -65,12 +75,24 @@ class MainWindow(QMainWindow):
         project_menu = self.menu_bar.addMenu("&Project")
         self.add_files_action = QAction("&Add Files...", self)
         project_menu.addAction(self.add_files_action)
+        project_menu.addSeparator()
+        self.export_json_action = QAction("&Export as JSON...", self)
+        project_menu.addAction(self.export_json_action)
+        self.export_csv_action = QAction("Export &Patches CSV...", self)
+        project_menu.addAction(self.export_csv_action)
+        self.export_store_action = QAction("Export &Array Store...", self)
+        project_menu.addAction(self.export_store_action)
+        self.convert_sqlite_action = QAction("Convert to &SQLite Store", self)
+        project_menu.addAction(self.convert_sqlite_action)
 
         edit_menu = self.menu_bar.addMenu("&Edit")
         self.undo_action = QAction("&Undo Last Patch", self)
         edit_menu.addAction(self.undo_action)
         self.clear_action = QAction("&Clear All Patches", self)
         edit_menu.addAction(self.clear_action)
+        edit_menu.addSeparator()
+        self.tile_action = QAction("&Tile Current File...", self)
+        edit_menu.addAction(self.tile_action)
 
         labels_menu = self.menu_bar.addMenu("&Labels")
         self.edit_labels_action = QAction("&Edit Labels...", self)
@@ -81,11 +103,33 @@ class MainWindow(QMainWindow):
         patch_table_action = self.patch_table_dock.toggleViewAction()
         patch_table_action.setText("Patch Table")
         view_menu.addAction(patch_table_action)
+        view_menu.addSeparator()
+        self.record_timings_action = QAction("Record &Timings", self)
+        self.record_timings_action.setCheckable(True)
+        view_menu.addAction(self.record_timings_action)
+        self.save_trace_action = QAction("Save Timing T&race...", self)
+        view_menu.addAction(self.save_trace_action)
 
     def _create_patch_table_dock(self):
         self.patch_table_dock = QDockWidget("Patch Table", self)
+        container = QWidget()
+        layout = QVBoxLayout(container)
+        layout.setContentsMargins(0, 0, 0, 0)
+
+        filter_row = QHBoxLayout()
+        self.patch_filter_edit = QLineEdit()
+        self.patch_filter_edit.setPlaceholderText("Filter patches...")
+        self.patch_filter_edit.setClearButtonEnabled(True)
+        filter_row.addWidget(self.patch_filter_edit)
+        self.current_file_only_check = QCheckBox("Current file only")
+        self.current_file_only_check.setChecked(True)
+        filter_row.addWidget(self.current_file_only_check)
+        layout.addLayout(filter_row)
+
         self.patch_table_view = PatchTableView()
-        self.patch_table_dock.setWidget(self.patch_table_view)
+        layout.addWidget(self.patch_table_view)
+        self.patch_filter_edit.textChanged.connect(self.patch_table_view.set_filter_text)
+        self.patch_table_dock.setWidget(container)
         self.addDockWidget(Qt.RightDockWidgetArea, self.patch_table_dock)
 
     def update_status(self, message):
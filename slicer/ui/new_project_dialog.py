@@ -1,9 +1,9 @@
 
-import os
 from PySide6.QtWidgets import (
     QDialog, QVBoxLayout, QHBoxLayout, QLineEdit, QPushButton, QFileDialog,
-    QListWidget, QDialogButtonBox, QLabel
+    QListWidget, QDialogButtonBox, QLabel, QComboBox, QMessageBox
 )
+from ..scanner import list_fits_files, validate_files
 
 class NewProjectDialog(QDialog):
     def __init__(self, parent=None):
@@ -26,6 +26,13 @@ class NewProjectDialog(QDialog):
         dir_layout.addWidget(self.browse_button)
         self.layout.addLayout(dir_layout)
 
+        # Project Storage
+        self.layout.addWidget(QLabel("Project Storage:"))
+        self.backend_combo = QComboBox()
+        self.backend_combo.addItem("JSON file", "json")
+        self.backend_combo.addItem("SQLite database", "sqlite")
+        self.layout.addWidget(self.backend_combo)
+
         # FITS Files
         self.layout.addWidget(QLabel("FITS Files:"))
         self.file_list = QListWidget()
@@ -55,20 +62,25 @@ class NewProjectDialog(QDialog):
             self.project_dir.setText(directory)
 
     def add_files(self):
-        files, _ = QFileDialog.getOpenFileNames(self, "Select FITS Files", "", "FITS Files (*.fits *.fit *.fz)")
+        files, _ = QFileDialog.getOpenFileNames(self, "Select FITS Files", "", "FITS Files (*.fits *.fts *.fit *.fz)")
         if files:
             self.file_list.addItems(files)
 
     def add_folder(self):
         directory = QFileDialog.getExistingDirectory(self, "Select Folder")
         if directory:
-            for filename in os.listdir(directory):
-                if filename.lower().endswith(('.fits', '.fit', '.fz')):
-                    self.file_list.addItem(os.path.join(directory, filename))
+            files, rejected = validate_files(list_fits_files(directory))
+            self.file_list.addItems(files)
+            if rejected:
+                QMessageBox.information(
+                    self, "Files Skipped",
+                    f"{len(rejected)} FITS files under {directory} are not 2D images and were skipped."
+                )
 
     def get_project_details(self):
         return {
             "name": self.project_name.text(),
             "directory": self.project_dir.text(),
+            "backend": self.backend_combo.currentData(),
             "files": [self.file_list.item(i).text() for i in range(self.file_list.count())]
         }
@@ -0,0 +1,92 @@
+from typing import Dict, Tuple
+
+from PySide6.QtWidgets import QGraphicsItem, QStyleOptionGraphicsItem
+from PySide6.QtGui import QPen, QColor, QPainter
+from PySide6.QtCore import QRectF
+
+from ..box_index import BoxIndex
+
+
+class PatchOverlayItem(QGraphicsItem):
+    def __init__(self, linewidth: float = 1.0, parent=None):
+        super().__init__(parent)
+        self.setFlag(QGraphicsItem.ItemUsesExtendedStyleOption)
+        self.setZValue(1)
+        self._linewidth = linewidth
+        self._bounds = QRectF()
+        self._colors: Dict[str, str] = {}
+        self._index = BoxIndex()
+        self._pens: Dict[Tuple[str, float], QPen] = {}
+
+    def set_bounds(self, rect: QRectF) -> None:
+        self.prepareGeometryChange()
+        self._bounds = QRectF(rect)
+
+    def set_linewidth(self, linewidth: float) -> None:
+        if linewidth != self._linewidth:
+            self._linewidth = linewidth
+            self.update()
+
+    def boundingRect(self) -> QRectF:
+        m = self._linewidth
+        return self._bounds.adjusted(-m, -m, m, m)
+
+    def _dirty(self, box) -> None:
+        x0, y0, x1, y1 = box
+        m = self._linewidth
+        self.update(QRectF(x0 - m, y0 - m, x1 - x0 + 2 * m, y1 - y0 + 2 * m))
+
+    def add_patch(self, patch_id: str, x0: float, y0: float, w: float, h: float, color: str) -> None:
+        if patch_id in self._index:
+            self._dirty(self._index.get(patch_id))
+        box = (x0, y0, x0 + w, y0 + h)
+        self._index.insert(patch_id, box)
+        self._colors[patch_id] = color
+        self._dirty(box)
+
+    def remove_patch(self, patch_id: str) -> None:
+        if patch_id not in self._index:
+            return
+        self._dirty(self._index.get(patch_id))
+        self._index.remove(patch_id)
+        self._colors.pop(patch_id, None)
+
+    def set_patch_color(self, patch_id: str, color: str) -> None:
+        if patch_id in self._index and self._colors.get(patch_id) != color:
+            self._colors[patch_id] = color
+            self._dirty(self._index.get(patch_id))
+
+    def clear(self) -> None:
+        self._index.clear()
+        self._colors.clear()
+        self.update()
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def _pen(self, color: str) -> QPen:
+        key = (color, self._linewidth)
+        pen = self._pens.get(key)
+        if pen is None:
+            pen = QPen(QColor(color))
+            pen.setWidthF(self._linewidth)
+            self._pens[key] = pen
+        return pen
+
+    def paint(self, painter: QPainter, option: QStyleOptionGraphicsItem, widget=None) -> None:
+        exposed = option.exposedRect
+        m = self._linewidth
+        visible = self._index.query((exposed.left() - m, exposed.top() - m, exposed.right() + m, exposed.bottom() + m))
+        if not visible:
+            return
+
+        by_color: Dict[str, list] = {}
+        for patch_id in visible:
+            x0, y0, x1, y1 = self._index.get(patch_id)
+            by_color.setdefault(self._colors[patch_id], []).append(QRectF(x0, y0, x1 - x0, y1 - y0))
+
+        painter.save()
+        for color, rects in by_color.items():
+            painter.setPen(self._pen(color))
+            painter.drawRects(rects)
+        painter.restore()
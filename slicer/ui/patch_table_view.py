@@ -1,23 +1,157 @@
-
-from PySide6.QtWidgets import QTableView
-from PySide6.QtCore import QAbstractTableModel, Qt, QModelIndex
+import os
+from PySide6.QtWidgets import QTableView, QHeaderView, QAbstractItemView
+from PySide6.QtCore import (
+    QAbstractTableModel, QSortFilterProxyModel, Qt, QModelIndex, Signal
+)
 from .delegates import LabelDelegate
 
+COLUMNS = [
+    "patch_id",
+    "label",
+    "fits_path",
+    "x0",
+    "y0",
+    "x1",
+    "y1",
+    "width",
+    "height",
+    "ra_deg_cen",
+    "dec_deg_cen",
+    "timestamp",
+]
+
+
 class PatchTableModel(QAbstractTableModel):
-    def __init__(self, data=None, headers=None, parent=None):
+    label_changed = Signal(object)
+
+    def __init__(self, patches=None, parent=None):
         super().__init__(parent)
-        self._data = data or []
-        self._headers = headers or []
+        self._all = {}
+        self._by_file = {}
+        self._file_path = None
+        self._rows = []
+        self._row_of = {}
+        self._headers = COLUMNS
+        self.set_patches(patches or [])
+
+    # Rows are the patch_meta dicts themselves, so edits land in the project store.
+    # The file filter lives here rather than in the proxy: _by_file indexes the
+    # patches per frame, so switching frames touches only that frame's rows.
+    def set_patches(self, patches):
+        self._all = {id(p): p for p in patches}
+        self._by_file = {}
+        for patch_meta in self._all.values():
+            self._by_file.setdefault(patch_meta.get("fits_path"), []).append(patch_meta)
+        self._show()
+
+    def set_file_filter(self, file_path):
+        if file_path == self._file_path:
+            return
+        self._file_path = file_path
+        self._show()
+
+    def _show(self):
+        self.beginResetModel()
+        if self._file_path is None:
+            self._rows = list(self._all.values())
+        else:
+            self._rows = list(self._by_file.get(self._file_path, ()))
+        self._row_of = {id(p): i for i, p in enumerate(self._rows)}
+        self.endResetModel()
+
+    def _shown(self, patch_meta):
+        return self._file_path is None or patch_meta.get("fits_path") == self._file_path
+
+    def _index(self, patch_meta):
+        self._all[id(patch_meta)] = patch_meta
+        self._by_file.setdefault(patch_meta.get("fits_path"), []).append(patch_meta)
+
+    def _unindex(self, patch_meta):
+        if self._all.pop(id(patch_meta), None) is None:
+            return False
+        rows = self._by_file.get(patch_meta.get("fits_path"), [])
+        for i, p in enumerate(rows):
+            if p is patch_meta:
+                del rows[i]
+                break
+        return True
+
+    def patch_at(self, row):
+        return self._rows[row]
+
+    def append_patch(self, patch_meta):
+        self._index(patch_meta)
+        if not self._shown(patch_meta):
+            return
+        row = len(self._rows)
+        self.beginInsertRows(QModelIndex(), row, row)
+        self._rows.append(patch_meta)
+        self._row_of[id(patch_meta)] = row
+        self.endInsertRows()
+
+    def append_patches(self, patches):
+        for patch_meta in patches:
+            self._index(patch_meta)
+        patches = [p for p in patches if self._shown(p)]
+        if not patches:
+            return
+        first = len(self._rows)
+        self.beginInsertRows(QModelIndex(), first, first + len(patches) - 1)
+        for i, patch_meta in enumerate(patches, first):
+            self._rows.append(patch_meta)
+            self._row_of[id(patch_meta)] = i
+        self.endInsertRows()
+
+    def remove_patch(self, patch_meta):
+        if not self._unindex(patch_meta):
+            return
+        row = self._row_of.get(id(patch_meta))
+        if row is None:
+            return
+        self.beginRemoveRows(QModelIndex(), row, row)
+        del self._rows[row]
+        del self._row_of[id(patch_meta)]
+        for i in range(row, len(self._rows)):
+            self._row_of[id(self._rows[i])] = i
+        self.endRemoveRows()
+
+    def remove_patches(self, patches):
+        if len(patches) == 1:
+            self.remove_patch(patches[0])
+            return
+        shown = False
+        for patch_meta in patches:
+            if self._unindex(patch_meta):
+                shown = shown or id(patch_meta) in self._row_of
+        if shown:
+            self._show()
+
+    def patch_changed(self, patch_meta):
+        row = self._row_of.get(id(patch_meta))
+        if row is not None:
+            self.dataChanged.emit(self.index(row, 0), self.index(row, len(self._headers) - 1))
 
     def rowCount(self, parent=QModelIndex()):
-        return len(self._data)
+        return 0 if parent.isValid() else len(self._rows)
 
     def columnCount(self, parent=QModelIndex()):
-        return len(self._headers)
+        return 0 if parent.isValid() else len(self._headers)
 
     def data(self, index, role=Qt.DisplayRole):
-        if role == Qt.DisplayRole:
-            return self._data[index.row()][index.column()]
+        if not index.isValid():
+            return None
+        key = self._headers[index.column()]
+        value = self._rows[index.row()].get(key)
+        if role in (Qt.DisplayRole, Qt.EditRole):
+            if key == "fits_path" and value:
+                return os.path.basename(value)
+            if isinstance(value, float):
+                return f"{value:.6f}"
+            return value
+        if role == Qt.ToolTipRole and key == "fits_path":
+            return value
+        if role == Qt.UserRole:
+            return value if value is not None else ""
         return None
 
     def headerData(self, section, orientation, role=Qt.DisplayRole):
@@ -26,9 +160,13 @@ class PatchTableModel(QAbstractTableModel):
         return None
 
     def setData(self, index, value, role=Qt.EditRole):
-        if role == Qt.EditRole:
-            self._data[index.row()][index.column()] = value
+        if role == Qt.EditRole and self._headers[index.column()] == "label":
+            patch_meta = self._rows[index.row()]
+            if patch_meta.get("label") == value:
+                return False
+            patch_meta["label"] = value
             self.dataChanged.emit(index, index)
+            self.label_changed.emit(patch_meta)
             return True
         return False
 
@@ -38,23 +176,54 @@ class PatchTableModel(QAbstractTableModel):
             flags |= Qt.ItemIsEditable
         return flags
 
+
+class PatchFilterProxyModel(QSortFilterProxyModel):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._text = ""
+        self.setSortRole(Qt.UserRole)
+
+    def set_filter_text(self, text):
+        self._text = text.strip().lower()
+        self.invalidateFilter()
+
+    # Matching on the patch dict directly avoids one data() round trip per cell.
+    def filterAcceptsRow(self, source_row, source_parent):
+        if not self._text:
+            return True
+        patch_meta = self.sourceModel().patch_at(source_row)
+        return any(self._text in str(patch_meta.get(key, "")).lower() for key in COLUMNS)
+
+
 class PatchTableView(QTableView):
     def __init__(self, parent=None):
         super().__init__(parent)
-        self.model = None
-
-    def set_patches(self, patches_meta, labels):
-        headers = ["patch_id", "label"]
-        data = [[p.get("patch_id"), p.get("label")] for p in patches_meta]
-        
-        self.model = PatchTableModel(data=data, headers=headers)
-        self.setModel(self.model)
-        
-        delegate = LabelDelegate(labels=labels)
-        self.setItemDelegateForColumn(headers.index("label"), delegate)
-        
-        self.model.dataChanged.connect(self.on_data_changed)
-
-    def on_data_changed(self, top_left, bottom_right):
-        # This is where we'll emit a signal to the controller
-        pass
+        self.model = PatchTableModel()
+        self.proxy = PatchFilterProxyModel(self)
+        self.proxy.setSourceModel(self.model)
+        self.setModel(self.proxy)
+        self.setSortingEnabled(True)
+        self.sortByColumn(-1, Qt.AscendingOrder)
+        self.setSelectionBehavior(QAbstractItemView.SelectRows)
+
+        # Fixed row heights keep scrolling O(visible rows) for very large tables.
+        self.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.verticalHeader().setDefaultSectionSize(self.fontMetrics().height() + 6)
+        self.horizontalHeader().setSectionResizeMode(QHeaderView.Interactive)
+
+        self.delegate = LabelDelegate(self)
+        self.setItemDelegateForColumn(COLUMNS.index("label"), self.delegate)
+
+    def set_labels(self, labels):
+        self.delegate.labels = list(labels or [])
+
+    def set_patches(self, patches_meta, labels=None):
+        if labels is not None:
+            self.set_labels(labels)
+        self.model.set_patches(patches_meta)
+
+    def set_file_filter(self, file_path):
+        self.model.set_file_filter(file_path)
+
+    def set_filter_text(self, text):
+        self.proxy.set_filter_text(text)
@@ -0,0 +1,57 @@
+from PySide6.QtWidgets import (
+    QDialog, QFormLayout, QSpinBox, QDoubleSpinBox, QComboBox, QDialogButtonBox
+)
+
+
+class TileDialog(QDialog):
+    def __init__(self, parent=None, labels=None, min_size=16):
+        super().__init__(parent)
+        self.setWindowTitle("Tile Current File")
+        self.layout = QFormLayout(self)
+
+        self.size_spin = QSpinBox()
+        self.size_spin.setRange(min_size, 8192)
+        self.size_spin.setValue(max(256, min_size))
+        self.layout.addRow("Tile size (px):", self.size_spin)
+
+        self.stride_spin = QSpinBox()
+        self.stride_spin.setMaximum(8192)
+        self._update_stride_minimum(self.size_spin.value())
+        self.stride_spin.setValue(self.size_spin.value())
+        self.size_spin.valueChanged.connect(self._update_stride_minimum)
+        self.layout.addRow("Stride (px):", self.stride_spin)
+
+        self.max_nan_spin = QDoubleSpinBox()
+        self.max_nan_spin.setRange(0.0, 100.0)
+        self.max_nan_spin.setSuffix(" %")
+        self.layout.addRow("Max NaN fraction:", self.max_nan_spin)
+
+        self.min_std_spin = QDoubleSpinBox()
+        self.min_std_spin.setRange(0.0, 1e9)
+        self.min_std_spin.setDecimals(4)
+        self.layout.addRow("Min std. dev.:", self.min_std_spin)
+
+        self.label_combo = QComboBox()
+        self.label_combo.addItem("(none)", None)
+        for label in labels or []:
+            self.label_combo.addItem(label, label)
+        self.layout.addRow("Label:", self.label_combo)
+
+        self.button_box = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        self.button_box.accepted.connect(self.accept)
+        self.button_box.rejected.connect(self.reject)
+        self.layout.addRow(self.button_box)
+
+    # Overlap is capped at three quarters of a tile; smaller strides multiply
+    # the tile count without adding much coverage.
+    def _update_stride_minimum(self, size):
+        self.stride_spin.setMinimum(max(1, size // 4))
+
+    def get_settings(self):
+        return {
+            "size": self.size_spin.value(),
+            "stride": self.stride_spin.value(),
+            "max_nan_fraction": self.max_nan_spin.value() / 100.0,
+            "min_std": self.min_std_spin.value(),
+            "label": self.label_combo.currentData(),
+        }
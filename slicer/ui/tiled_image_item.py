@@ -0,0 +1,89 @@
+import math
+from collections import OrderedDict
+from typing import List, Tuple
+
+import numpy as np
+from PySide6.QtWidgets import QGraphicsItem, QStyleOptionGraphicsItem
+from PySide6.QtGui import QImage, QPixmap, QPainter
+from PySide6.QtCore import QRectF
+
+from ..profiler import profiler
+
+
+class TiledImageItem(QGraphicsItem):
+    TILE_SIZE = 256
+    MAX_CACHED_TILES = 512
+
+    def __init__(self, levels: List[np.ndarray], parent=None):
+        super().__init__(parent)
+        self.setFlag(QGraphicsItem.ItemUsesExtendedStyleOption)
+        self._levels: List[np.ndarray] = []
+        self._tiles: "OrderedDict[Tuple[int, int, int], QPixmap]" = OrderedDict()
+        self.set_levels(levels)
+
+    def set_levels(self, levels: List[np.ndarray]) -> None:
+        self.prepareGeometryChange()
+        self._levels = levels
+        self._tiles.clear()
+        self.update()
+
+    @property
+    def image_shape(self) -> Tuple[int, int]:
+        return self._levels[0].shape
+
+    def boundingRect(self) -> QRectF:
+        height, width = self.image_shape
+        return QRectF(0, 0, width, height)
+
+    def _level_for(self, painter: QPainter) -> int:
+        lod = QStyleOptionGraphicsItem.levelOfDetailFromTransform(painter.worldTransform())
+        if lod <= 0:
+            return len(self._levels) - 1
+        level = int(math.floor(math.log2(1.0 / lod))) if lod < 1 else 0
+        return min(max(level, 0), len(self._levels) - 1)
+
+    def _tile(self, level: int, tx: int, ty: int) -> QPixmap:
+        key = (level, tx, ty)
+        pixmap = self._tiles.get(key)
+        if pixmap is not None:
+            self._tiles.move_to_end(key)
+            return pixmap
+
+        t = self.TILE_SIZE
+        with profiler.span("pixmap", level=level):
+            block = np.ascontiguousarray(self._levels[level][ty * t:(ty + 1) * t, tx * t:(tx + 1) * t])
+            h, w = block.shape
+            q_image = QImage(block.data, w, h, w, QImage.Format_Grayscale8)
+            pixmap = QPixmap.fromImage(q_image)
+
+        self._tiles[key] = pixmap
+        if len(self._tiles) > self.MAX_CACHED_TILES:
+            self._tiles.popitem(last=False)
+        return pixmap
+
+    def paint(self, painter: QPainter, option: QStyleOptionGraphicsItem, widget=None) -> None:
+        bounds = self.boundingRect()
+        exposed = option.exposedRect.intersected(bounds)
+        if exposed.isEmpty():
+            return
+
+        level = self._level_for(painter)
+        factor = 1 << level
+        span = self.TILE_SIZE * factor
+        level_h, level_w = self._levels[level].shape
+
+        tx0 = max(int(exposed.left() // span), 0)
+        ty0 = max(int(exposed.top() // span), 0)
+        tx1 = min(int(math.ceil(exposed.right() / span)), int(math.ceil(level_w / self.TILE_SIZE)))
+        ty1 = min(int(math.ceil(exposed.bottom() / span)), int(math.ceil(level_h / self.TILE_SIZE)))
+
+        painter.save()
+        painter.setClipRect(bounds)
+        # Antialiased edges leave visible seams between adjacent tiles.
+        painter.setRenderHint(QPainter.Antialiasing, False)
+        for ty in range(ty0, ty1):
+            for tx in range(tx0, tx1):
+                pixmap = self._tile(level, tx, ty)
+                target = QRectF(tx * span, ty * span, pixmap.width() * factor, pixmap.height() * factor)
+                painter.drawPixmap(target, pixmap, QRectF(pixmap.rect()))
+        painter.restore()
@@ -0,0 +1,19 @@
+from slicer.patch_ids import PatchIdAllocator
+
+
+def test_allocators_sharing_a_state_file_never_overlap(tmp_path):
+    path = str(tmp_path / "patch_ids.txt")
+    gui = PatchIdAllocator(path, block_size=4)
+    batch = PatchIdAllocator(path, block_size=4)
+    issued = []
+    for count in (3, 5, 1, 7, 2, 6):
+        issued.extend(gui.reserve(count))
+        issued.extend(batch.reserve(count))
+    assert len(issued) == len(set(issued))
+
+
+def test_ids_are_not_reissued_after_reopening(tmp_path):
+    path = str(tmp_path / "patch_ids.txt")
+    first = list(PatchIdAllocator(path, block_size=4, seed=lambda: 41).reserve(10))
+    assert first[0] == 42
+    assert PatchIdAllocator(path, block_size=4).allocate() > first[-1]
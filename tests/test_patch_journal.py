@@ -0,0 +1,56 @@
+from slicer.patch_journal import PatchJournal
+
+FITS_PATH = "/data/frame.fits"
+
+
+def _patch(patch_id, label="star"):
+    return {"patch_id": patch_id, "fits_path": FITS_PATH, "x0": 0, "y0": 0, "x1": 10, "y1": 10, "label": label}
+
+
+def _journal(tmp_path, seed=None):
+    return PatchJournal(str(tmp_path / "patches.jsonl"), seed=seed)
+
+
+def test_replay_applies_relabels_and_deletes(tmp_path):
+    journal = _journal(tmp_path)
+    journal.add_many([_patch("0001"), _patch("0002"), _patch("0003")])
+    journal.relabel(_patch("0002", label="galaxy"))
+    journal.delete([_patch("0001")])
+
+    live = _journal(tmp_path).materialize()
+    assert list(live) == [(FITS_PATH, "0002"), (FITS_PATH, "0003")]
+    assert live[(FITS_PATH, "0002")]["label"] == "galaxy"
+
+
+def test_torn_last_record_is_ignored_and_terminated(tmp_path):
+    journal = _journal(tmp_path)
+    journal.add(_patch("0001"))
+    with open(journal.path, "a") as f:
+        f.write('{"op": "add", "patch": {"patch_')
+
+    journal = _journal(tmp_path)
+    journal.add(_patch("0002"))
+    assert list(journal.materialize()) == [(FITS_PATH, "0001"), (FITS_PATH, "0002")]
+
+
+def test_compaction_keeps_the_live_set(tmp_path):
+    journal = _journal(tmp_path)
+    journal.add_many([_patch(f"{i:04d}") for i in range(10)])
+    journal.relabel(_patch("0004", label="galaxy"))
+    journal.delete([_patch(f"{i:04d}") for i in range(5, 10)])
+    before = journal.materialize()
+
+    journal.compact()
+    with open(journal.path) as f:
+        assert sum(1 for _ in f) == 5
+    assert _journal(tmp_path).materialize() == before
+
+
+def test_missing_journal_is_seeded_once(tmp_path):
+    patches = [_patch("0001"), _patch("0002")]
+    journal = _journal(tmp_path, seed=lambda: patches)
+    assert list(journal.materialize()) == [(FITS_PATH, "0001"), (FITS_PATH, "0002")]
+
+    journal.delete([patches[0]])
+    journal = _journal(tmp_path, seed=lambda: patches)
+    assert list(journal.materialize()) == [(FITS_PATH, "0002")]
@@ -0,0 +1,65 @@
+import os
+
+import numpy as np
+import pytest
+from astropy.io import fits
+
+from slicer.patch_layouts import LAYOUTS, LabelShardedLayout, _PackedLayout, make_layout, read_patch_hdu
+
+
+def _hdu(value):
+    hdu = fits.PrimaryHDU(np.full((6, 8), value, dtype=np.float32))
+    hdu.header["PATCHVAL"] = value
+    return hdu
+
+
+def _write(layout, patch_ids):
+    patches = []
+    for patch_id in patch_ids:
+        patch_meta = {"patch_id": patch_id, "label": "star"}
+        patch_meta.update(layout.write(patch_id, "star", _hdu(int(patch_id)), None))
+        patches.append(patch_meta)
+    return patches
+
+
+@pytest.mark.parametrize("name", LAYOUTS)
+def test_patches_read_back_from_their_location(tmp_path, name):
+    layout = make_layout(name, str(tmp_path), max_patches=3)
+    patches = _write(layout, ["0001", "0002", "0003", "0004"])
+    layout.close()
+    # Packed layouts resume the last shard when reopened.
+    layout = make_layout(name, str(tmp_path), max_patches=3)
+    patches += _write(layout, ["0005", "0006"])
+    layout.close()
+
+    for patch_meta in patches:
+        hdu = read_patch_hdu(str(tmp_path), patch_meta)
+        assert hdu.header["PATCHVAL"] == int(patch_meta["patch_id"])
+        assert (hdu.data == int(patch_meta["patch_id"])).all()
+
+
+@pytest.mark.parametrize("label, subdir", [
+    ("star", "star"),
+    ("M 31/core", "M_31_core"),
+    ("v1.2", "v1.2"),
+    (".", "_"),
+    ("..", "_"),
+    ("../..", "_"),
+    ("..hidden", "hidden"),
+    (None, "unlabeled"),
+])
+def test_label_subdirs_stay_under_out_dir(tmp_path, label, subdir):
+    layout = LabelShardedLayout(str(tmp_path))
+    location = layout.location("0001", label, preview=False)
+    assert location["file"] == f"{subdir}/patch_0001.fits"
+    path = os.path.abspath(os.path.join(str(tmp_path), location["file"]))
+    assert os.path.dirname(path) == os.path.join(str(tmp_path), subdir)
+
+
+def test_packed_layouts_must_implement_the_shard_hooks(tmp_path):
+    class Incomplete(_PackedLayout):
+        def _open_new(self, path):
+            pass
+
+    with pytest.raises(TypeError):
+        Incomplete(str(tmp_path))
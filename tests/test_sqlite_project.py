@@ -0,0 +1,82 @@
+from slicer.project import Project
+from slicer.sqlite_project import SqliteProject
+
+FITS_PATH = "/data/frame.fits"
+
+
+def _patch(patch_id, label="star"):
+    return {
+        "patch_id": patch_id, "timestamp": "2024-01-01T00:00:00", "fits_path": FITS_PATH,
+        "x0": 0, "y0": 0, "x1": 10, "y1": 10, "width": 10, "height": 10,
+        "ra_deg_cen": "", "dec_deg_cen": "", "label": label,
+    }
+
+
+def _project(tmp_path):
+    project = SqliteProject().create("p", str(tmp_path), [FITS_PATH])
+    patches = project.get_patches(FITS_PATH)
+    for patch_id in ("0001", "0002", "0003"):
+        patches.append(_patch(patch_id))
+        project.record_patch_added(FITS_PATH, patches[-1])
+    return project
+
+
+def _reload(project):
+    path = project.project_file_path
+    project.close()
+    return SqliteProject().load(path)
+
+
+def test_updates_keep_patch_order(tmp_path):
+    project = _project(tmp_path)
+    patches = project.get_patches(FITS_PATH)
+    patches[0]["label"] = "galaxy"
+    project.record_patch_updated(patches[0])
+    patches[1]["file"] = "ab/patch_0002.fits"
+    project.record_patches_updated(FITS_PATH, [patches[1]])
+
+    project = _reload(project)
+    patches = project.get_patches(FITS_PATH)
+    assert [p["patch_id"] for p in patches] == ["0001", "0002", "0003"]
+    assert patches[0]["label"] == "galaxy"
+    assert patches[1]["file"] == "ab/patch_0002.fits"
+
+
+def test_undo_after_reload_removes_last_patch(tmp_path):
+    project = _project(tmp_path)
+    patches = project.get_patches(FITS_PATH)
+    patches[0]["label"] = "galaxy"
+    project.record_patch_updated(patches[0])
+
+    project = _reload(project)
+    patches = project.get_patches(FITS_PATH)
+    undone = patches.pop()
+    project.record_patch_removed(FITS_PATH, undone)
+    assert undone["patch_id"] == "0003"
+
+    project = _reload(project)
+    assert [p["patch_id"] for p in project.get_patches(FITS_PATH)] == ["0001", "0002"]
+
+
+def test_extra_keys_survive_reload(tmp_path):
+    project = _project(tmp_path)
+    patches = project.get_patches(FITS_PATH)
+    patches[2].update(file="shards/shard_00000.tar", offset=1536, nbytes=5760)
+    project.record_patches_updated(FITS_PATH, [patches[2]])
+
+    patch = _reload(project).get_patches(FITS_PATH)[2]
+    assert (patch["file"], patch["offset"], patch["nbytes"]) == ("shards/shard_00000.tar", 1536, 5760)
+
+
+def test_import_json_keeps_patches_and_order(tmp_path):
+    source = Project().create("p", str(tmp_path / "json"), [FITS_PATH])
+    patches = source.get_patches(FITS_PATH)
+    for patch_id in ("0003", "0001", "0002"):
+        patches.append(dict(_patch(patch_id), file=f"patch_{patch_id}.fits"))
+        source.record_patch_added(FITS_PATH, patches[-1])
+
+    project = SqliteProject.import_json(source.project_file_path, str(tmp_path / "project.sqlite"))
+    imported = project.get_patches(FITS_PATH)
+    assert [p["patch_id"] for p in imported] == ["0003", "0001", "0002"]
+    assert [p["file"] for p in imported] == [p["file"] for p in patches]
+    assert project.files == source.files
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+from slicer.stretch import StretchEngine
+
+
+def _equalize_hist(image, nbins=256):
+    # skimage.exposure.equalize_hist for float images: the CDF of a
+    # 256-bin histogram over the data range, interpolated at bin centres.
+    hist, edges = np.histogram(image.ravel(), bins=nbins)
+    centres = (edges[:-1] + edges[1:]) / 2
+    cdf = hist.cumsum() / hist.sum()
+    return np.interp(image.ravel(), centres, cdf).reshape(image.shape)
+
+
+def _reference(data):
+    # The Hist. Eq. path the LUT replaced: nan_to_num, min-max rescale,
+    # equalize_hist, 8-bit.
+    data = np.nan_to_num(data)
+    lo, hi = data.min(), data.max()
+    scaled = (data - lo) / (hi - lo) if hi > lo else data
+    return (np.clip(_equalize_hist(scaled), 0, 1) * 255).astype(np.uint8)
+
+
+def _images():
+    rng = np.random.default_rng(0)
+    return {
+        "float32": rng.normal(1000.0, 20.0, (512, 512)).astype(np.float32),
+        "float64": rng.normal(0.0, 1.0, (300, 400)),
+        "int16": rng.normal(1000.0, 200.0, (512, 512)).astype(np.int16),
+        "exponential": (rng.exponential(50.0, (512, 512)) + 100.0).astype(np.float32),
+        "constant": np.full((64, 64), 7.0, dtype=np.float32),
+        "zeros": np.zeros((64, 64), dtype=np.float32),
+    }
+
+
+@pytest.mark.parametrize("name", list(_images()))
+def test_histeq_matches_equalize_hist(name):
+    data = _images()[name]
+    out = StretchEngine().render(data, "histeq")
+    assert out.dtype == np.uint8
+    diff = np.abs(out.astype(int) - _reference(data).astype(int))
+    assert diff.max() <= 1
+
+
+def test_histeq_ignores_nans():
+    # NaNs are left out of the limits and histogram, so finite pixels map as
+    # if the NaNs were absent; NaN pixels are drawn like a zero-valued pixel,
+    # which is black when zero lies below the data.
+    data = _images()["float32"]
+    data[:16, :64] = np.nan
+    finite = np.isfinite(data)
+    out = StretchEngine().render(data, "histeq")
+    expected = _reference(np.where(finite, data, np.nanmin(data)))
+    assert np.abs(out[finite].astype(int) - expected[finite].astype(int)).max() <= 1
+    assert (out[~finite] == 0).all()